@@ -0,0 +1,230 @@
+import csv
+import os
+import re
+import sys
+import argparse
+import numpy as np
+import csv_utils_helpers
+from spatial_index import GEOGRAPHIC_COLUMNS, detect_coordinate_columns, looks_geographic
+
+# Increase CSV field size limit
+csv_utils_helpers.increase_csv_field_size_limit()
+
+INPUT_FILE = 'p3_points_classified.csv'
+OUTPUT_DIR = 'Burned_Rock_Bins'
+DEFAULT_CELL_SIZES = [1000.0, 5000.0]
+# Defaults for --units degrees (about 1 and 5 km in latitude)
+DEFAULT_DEGREE_CELL_SIZES = [0.01, 0.05]
+
+FLAG_COLUMNS = [
+    ('class_1', 'Class_1_Found'),
+    ('class_2', 'Class_2_Found'),
+    ('class_3', 'Class_3_Found'),
+    ('burned_clay', 'Burned_Clay_Found'),
+]
+
+SQRT3 = np.sqrt(3.0)
+
+def period_field_name(label):
+    """Turns a period label into an ArcPro-safe field name."""
+    return 'period_' + re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')
+
+def read_points(input_file, x_col=None, y_col=None):
+    """
+    Streams the classified export and returns the coordinate, flag and period
+    columns as NumPy arrays. Rows without usable coordinates are skipped.
+    """
+    xs = []
+    ys = []
+    flags = {name: [] for name, _ in FLAG_COLUMNS}
+    period_ids = []
+    period_index = {}
+    period_labels = []
+    skipped = 0
+
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
+        reader = csv.DictReader(fin)
+        fieldnames = reader.fieldnames if reader.fieldnames else []
+
+        if x_col is None or y_col is None:
+            x_col, y_col = detect_coordinate_columns(fieldnames)
+        if x_col not in fieldnames or y_col not in fieldnames:
+            raise ValueError(f"Coordinate columns not found in {input_file}. Use --x-col/--y-col.")
+
+        for row in reader:
+            try:
+                x = float(row[x_col])
+                y = float(row[y_col])
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            if not (np.isfinite(x) and np.isfinite(y)):
+                skipped += 1
+                continue
+
+            xs.append(x)
+            ys.append(y)
+            for name, column in FLAG_COLUMNS:
+                flags[name].append(csv_utils_helpers.clean_value(row.get(column, 'False'), lower=True) == 'true')
+
+            # Each site contributes once to every period it was assigned
+            tp = csv_utils_helpers.clean_value(row.get('Learned_Time_Period', 'Unknown'))
+            if not tp: tp = 'Unknown'
+            ids = []
+            for label in tp.split('; '):
+                if label not in period_index:
+                    period_index[label] = len(period_labels)
+                    period_labels.append(label)
+                ids.append(period_index[label])
+            period_ids.append(ids)
+
+    # Flatten periods into (point index, period id) pairs
+    lengths = np.fromiter((len(ids) for ids in period_ids), dtype=np.int64, count=len(period_ids))
+    points = {
+        'x': np.asarray(xs, dtype=np.float64),
+        'y': np.asarray(ys, dtype=np.float64),
+        'period_point': np.repeat(np.arange(len(period_ids), dtype=np.int64), lengths),
+        'period_id': np.fromiter((i for ids in period_ids for i in ids), dtype=np.int64, count=int(lengths.sum())),
+        'period_labels': period_labels,
+        'skipped': skipped,
+        'named_geographic': (x_col, y_col) in GEOGRAPHIC_COLUMNS,
+    }
+    for name, values in flags.items():
+        points[name] = np.asarray(values, dtype=bool)
+    return points
+
+def square_bin(x, y, cell_size):
+    """Returns integer (column, row) square-grid indices for each point."""
+    return np.floor(x / cell_size).astype(np.int64), np.floor(y / cell_size).astype(np.int64)
+
+def square_centers(i, j, cell_size):
+    return (i + 0.5) * cell_size, (j + 0.5) * cell_size
+
+def hex_bin(x, y, cell_size):
+    """
+    Returns integer axial (q, r) indices of the pointy-top hexagon containing
+    each point. `cell_size` is the hexagon's circumradius.
+    """
+    q = (SQRT3 / 3.0 * x - y / 3.0) / cell_size
+    r = (2.0 / 3.0 * y) / cell_size
+    s = -q - r
+
+    # Cube rounding: round each coordinate, then fix the one with the largest error
+    rq = np.round(q)
+    rr = np.round(r)
+    rs = np.round(s)
+    dq = np.abs(rq - q)
+    dr = np.abs(rr - r)
+    ds = np.abs(rs - s)
+
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+def hex_centers(q, r, cell_size):
+    return cell_size * SQRT3 * (q + r / 2.0), cell_size * 1.5 * r
+
+def aggregate_cells(points, i, j):
+    """
+    Counts sites per cell. Returns the unique cell indices and a dict of
+    per-cell count arrays keyed by output column name.
+    """
+    keys = np.stack([i, j], axis=1)
+    cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    n_cells = len(cells)
+
+    counts = {'total': np.bincount(inverse, minlength=n_cells)}
+    for name, _ in FLAG_COLUMNS:
+        counts[name] = np.bincount(inverse, weights=points[name], minlength=n_cells).astype(np.int64)
+
+    # Per-period counts from one bincount over combined (cell, period) codes
+    n_periods = len(points['period_labels'])
+    if n_periods:
+        combined = inverse[points['period_point']] * n_periods + points['period_id']
+        matrix = np.bincount(combined, minlength=n_cells * n_periods).reshape(n_cells, n_periods)
+        for pid, label in enumerate(points['period_labels']):
+            counts[period_field_name(label)] = matrix[:, pid]
+
+    return cells, counts
+
+def write_bins(output_path, grid, cell_size, cells, centers, counts):
+    count_columns = list(counts.keys())
+    fieldnames = ['grid', 'cell_size', 'cell_i', 'cell_j', 'center_x', 'center_y'] + count_columns
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as fout:
+        writer = csv.writer(fout)
+        writer.writerow(fieldnames)
+        center_x, center_y = centers
+        for k in range(len(cells)):
+            writer.writerow(
+                [grid, cell_size, int(cells[k, 0]), int(cells[k, 1]), f"{center_x[k]:.6f}", f"{center_y[k]:.6f}"]
+                + [int(counts[c][k]) for c in count_columns]
+            )
+
+def bin_points(points, grid, cell_size):
+    if grid == 'hex':
+        i, j = hex_bin(points['x'], points['y'], cell_size)
+        cells, counts = aggregate_cells(points, i, j)
+        centers = hex_centers(cells[:, 0], cells[:, 1], cell_size)
+    else:
+        i, j = square_bin(points['x'], points['y'], cell_size)
+        cells, counts = aggregate_cells(points, i, j)
+        centers = square_centers(cells[:, 0], cells[:, 1], cell_size)
+    return cells, centers, counts
+
+def main(input_file=INPUT_FILE, output_dir=OUTPUT_DIR, grid='hex', cell_sizes=None, x_col=None, y_col=None,
+         units='auto'):
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+
+    print(f"Reading {input_file}...")
+    try:
+        points = read_points(input_file, x_col, y_col)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Loaded {len(points['x'])} sites ({points['skipped']} skipped without coordinates).")
+    if len(points['x']) == 0:
+        print("No sites with coordinates to bin.")
+        return []
+
+    # Cells are in coordinate units, so metre-sized defaults on degrees
+    # would put every site in one cell
+    if units == 'auto' and (points['named_geographic'] or looks_geographic(points['x'], points['y'])):
+        print("Error: The coordinates look like longitude/latitude in degrees. Re-run with --units degrees "
+              "(cell sizes in degrees, default 0.01 and 0.05) or --units projected.")
+        sys.exit(1)
+    if cell_sizes is None:
+        cell_sizes = DEFAULT_DEGREE_CELL_SIZES if units == 'degrees' else DEFAULT_CELL_SIZES
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    outputs = []
+    for cell_size in cell_sizes:
+        cells, centers, counts = bin_points(points, grid, cell_size)
+        output_path = os.path.join(output_dir, f"bins_{grid}_{cell_size:g}.csv")
+        write_bins(output_path, grid, cell_size, cells, centers, counts)
+        print(f"Wrote {len(cells)} {grid} cells at size {cell_size:g} to {output_path}")
+        outputs.append(output_path)
+    return outputs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate classified sites into square or hexagonal grid cells for ArcPro.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Path to the classified CSV file.")
+    parser.add_argument("--output-dir", "-o", default=OUTPUT_DIR, help="Directory for the binned CSV files.")
+    parser.add_argument("--grid", choices=['square', 'hex'], default='hex', help="Cell shape.")
+    parser.add_argument("--units", choices=['auto', 'projected', 'degrees'], default='auto',
+                        help="Coordinate units. 'auto' stops with an error if the coordinates look like degrees.")
+    parser.add_argument("--cell-size", type=float, nargs="+", default=None,
+                        help="One or more cell sizes in coordinate units (hex: circumradius, square: side).")
+    parser.add_argument("--x-col", help="X / longitude column (auto-detected if omitted).")
+    parser.add_argument("--y-col", help="Y / latitude column (auto-detected if omitted).")
+    args = parser.parse_args()
+
+    main(args.input, args.output_dir, args.grid, args.cell_size, args.x_col, args.y_col, args.units)
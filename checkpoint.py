@@ -0,0 +1,86 @@
+import os
+import pickle
+
+# Rows between checkpoints when --resume is given without --checkpoint-every
+DEFAULT_CHECKPOINT_EVERY = 50000
+
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+class OffsetLineReader:
+    """
+    Iterates the decoded lines of a file opened in binary mode while tracking
+    the byte offset just past the last line returned. csv.reader only pulls
+    the lines a record needs, so after each row `offset` is the exact input
+    position to resume from.
+    """
+    def __init__(self, fbin, encoding='utf-8', errors='replace'):
+        self.f = fbin
+        self.encoding = encoding
+        self.errors = errors
+        self.offset = fbin.tell()
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        # Lines end in b'\n', which never occurs inside a UTF-8 sequence
+        return line.decode(self.encoding, self.errors)
+
+def checkpoint_path(output_file):
+    return output_file + CHECKPOINT_SUFFIX
+
+def input_signature(input_file):
+    st = os.stat(input_file)
+    return {'path': os.path.abspath(input_file), 'size': st.st_size, 'mtime': st.st_mtime}
+
+def save_checkpoint(path, fout, state):
+    """
+    Flushes `fout` to disk, records its position as `output_offset` and
+    atomically replaces the checkpoint file with `state`.
+    """
+    fout.flush()
+    os.fsync(fout.fileno())
+    state = dict(state, output_offset=fout.tell())
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path, input_file):
+    """
+    Returns the saved state if a checkpoint exists for this exact input file,
+    otherwise None.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Warning: Could not load checkpoint {path}: {e}")
+        return None
+
+    if state.get('input_signature') != input_signature(input_file):
+        print(f"Warning: Checkpoint {path} was written for a different or modified input file. Starting over.")
+        return None
+    return state
+
+def truncate_output(output_file, offset):
+    """Drops anything written after the last consistent checkpoint."""
+    with open(output_file, 'r+b') as f:
+        f.truncate(offset)
+
+def remove_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
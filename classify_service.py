@@ -0,0 +1,177 @@
+import json
+import queue
+import argparse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import classify_sites
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_INSTANCES = 2
+# Descriptions per HTTP request sent by the client
+DEFAULT_CLIENT_BATCH_SIZE = 500
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# Output fields returned for each description (Normalized_Text onwards)
+RESULT_FIELDS = classify_sites.NEW_COLUMNS
+
+class ClassifierPool:
+    """
+    Holds warm SiteClassifier instances, each with its own classification
+    cache. Each batch checks one out, so concurrent requests never share an
+    instance mid-batch.
+    """
+    def __init__(self, instances=DEFAULT_INSTANCES, artifact_db=None, cache_size=classify_sites.DEFAULT_CACHE_SIZE):
+        if artifact_db is None:
+            artifact_db = classify_sites.load_artifact_db()
+        self._pool = queue.Queue()
+        for _ in range(max(1, instances)):
+            cache = classify_sites.ClassificationCache(cache_size) if cache_size > 0 else None
+            self._pool.put((classify_sites.SiteClassifier(artifact_db=artifact_db), cache))
+
+    def classify_rows(self, rows):
+        classifier, cache = self._pool.get()
+        try:
+            results = []
+            for row in rows:
+                clean_row, _ = classify_sites.process_single_row(row, classifier, cache=cache)
+                results.append({field: clean_row[field] for field in RESULT_FIELDS})
+            return results
+        finally:
+            self._pool.put((classifier, cache))
+
+def parse_request(payload):
+    """
+    Returns the input rows of a /classify payload, or raises ValueError if
+    it is not {"descriptions": [text, ...]} or {"rows": [{...}, ...]} with
+    text (or null) values.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('expected a JSON object')
+    if 'rows' in payload:
+        rows = payload['rows']
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('"rows" must be a list of objects')
+        if not all(value is None or isinstance(value, str) for row in rows for value in row.values()):
+            raise ValueError('row values must be strings or null')
+        return rows
+    if 'descriptions' in payload:
+        descriptions = payload['descriptions']
+        if not isinstance(descriptions, list) or not all(isinstance(text, str) for text in descriptions):
+            raise ValueError('"descriptions" must be a list of strings')
+        return [{'Concat_site_variables': text} for text in descriptions]
+    raise ValueError('expected "descriptions" or "rows"')
+
+class ClassificationHandler(BaseHTTPRequestHandler):
+    """
+    POST /classify with {"descriptions": [...]} (Concat_site_variables text)
+    or {"rows": [{...}, ...]} (full input rows). GET /health for a liveness
+    check. Each request is classified as it arrives on one pooled instance;
+    batching large inputs into requests is up to the client.
+    """
+    pool = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError('negative Content-Length')
+            if length > MAX_REQUEST_BYTES:
+                self._send_json(413, {'error': 'request too large'})
+                return
+            rows = parse_request(json.loads(self.rfile.read(length).decode('utf-8')))
+        except ValueError as e:
+            self._send_json(400, {'error': f'invalid request: {e}'})
+            return
+
+        try:
+            results = self.pool.classify_rows(rows)
+        except Exception as e:
+            self._send_json(500, {'error': f'classification failed: {e}'})
+            return
+        self._send_json(200, {'results': results})
+
+    def log_message(self, format, *args):
+        # Keep interactive lookups quiet
+        pass
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, instances=DEFAULT_INSTANCES, artifact_db=None):
+    handler = type('BoundClassificationHandler', (ClassificationHandler,), {
+        'pool': ClassifierPool(instances, artifact_db)
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+class ClassificationClient:
+    """Small client for a running classification service."""
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, batch_size=DEFAULT_CLIENT_BATCH_SIZE, timeout=60):
+        self.base_url = f"http://{host}:{port}"
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _post(self, payload):
+        request = urllib.request.Request(
+            self.base_url + '/classify',
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['results']
+
+    def is_alive(self):
+        try:
+            with urllib.request.urlopen(self.base_url + '/health', timeout=self.timeout) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def classify(self, descriptions):
+        """Classifies Concat_site_variables texts. Returns one record per text."""
+        results = []
+        for i in range(0, len(descriptions), self.batch_size):
+            results.extend(self._post({'descriptions': list(descriptions[i:i + self.batch_size])}))
+        return results
+
+    def classify_rows(self, rows):
+        """Classifies full input rows (dicts). Returns one record per row."""
+        results = []
+        for i in range(0, len(rows), self.batch_size):
+            results.extend(self._post({'rows': list(rows[i:i + self.batch_size])}))
+        return results
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, instances=DEFAULT_INSTANCES):
+    print("Preparing word banks and artifact DB...")
+    server = create_server(host, port, instances)
+    print(f"Classification service listening on http://{host}:{server.server_address[1]} ({instances} warm classifiers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve warm site classification over localhost HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind (keep on localhost).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_argument("--instances", type=int, default=DEFAULT_INSTANCES, help="Number of warm SiteClassifier instances.")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.instances)
@@ -5,28 +5,26 @@ import json
 import os
 import difflib
 import argparse
+import bisect
 import functools
-from collections import Counter
+import hashlib
+import time
+import contextlib
+from collections import Counter, OrderedDict
 import csv_utils_helpers
+import checkpoint
+import keyword_codes
+import match_spans
+import rule_profiler
 
 # Increase CSV field size limit
 csv_utils_helpers.increase_csv_field_size_limit()
-max_int = sys.maxsize
-while True:
-    try:
-        csv.field_size_limit(max_int)
-        break
-    except OverflowError:
-        max_int = int(max_int/10)
-import csv_utils
-
-# Increase CSV field size limit
-csv_utils.increase_field_size_limit()
 
 INPUT_FILE = 'p3_points_concatenated.csv'
 OUTPUT_FILE = 'p3_points_classified.csv'
 SYNONYMS_FILE = 'potential_synonyms.txt'
 ARTIFACT_DB_FILE = 'extracted_artifacts.json'
+CORRECTIONS_FILE = 'typo_corrections.json'
 
 # --- 1. Keywords Definitions ---
 
@@ -78,10 +76,6 @@ EXCLUSION_TERMS = {
     "hearth": ["fireplace", "chimney"]
 }
 
-EXCLUSION_REGEXES = {
-    base_kw: re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b')
-    for base_kw, terms in EXCLUSION_TERMS.items() if terms
-}
 EXCLUSION_REGEXES = {}
 for base_kw, exclusion_list in EXCLUSION_TERMS.items():
     if not exclusion_list:
@@ -92,6 +86,14 @@ for base_kw, exclusion_list in EXCLUSION_TERMS.items():
 
 NEGATION_TERMS = ["no", "not", "non", "lack", "absence", "negative"]
 
+# A match is negated when a negation term is among the NEGATION_WORDS words
+# in the NEGATION_CHARS characters before it. Exclusion terms are looked for
+# within EXCLUSION_CONTEXT_CHARS of either end of a match. (sweep_rules.py
+# scores alternatives against the expert labels.)
+NEGATION_CHARS = 30
+NEGATION_WORDS = 5
+EXCLUSION_CONTEXT_CHARS = 50
+
 TIME_PERIOD_KEYWORDS = {
     "mexican republic": "Historic - Mexican Republic",
     "republic of texas": "Historic - Republic of Texas",
@@ -146,46 +148,90 @@ CLASS_3_SET = generate_variations(CLASS_3_KEYWORDS)
 BURNED_CLAY_SET = generate_variations(BURNED_CLAY_KEYWORDS)
 ROCK_MATERIAL_SET = generate_variations(ROCK_MATERIAL_KEYWORDS)
 
-BURNED_CLAY_RE = None
-CLASS_1_RE_LIST = []
-CLASS_2_RE_LIST = []
-CLASS_3_RE_LIST = []
-ROCK_MATERIAL_RE_LIST = []
+# Legacy module-level pattern lists used by determine_time_period() when no
+# lists are injected. SiteClassifier compiles its own.
 TIME_PERIOD_RE_LIST = []
 ARTIFACT_RE_LIST = []
+
 def clean_value(val):
     if val is None: return ""
     return str(val).replace('\r', ' ').replace('\n', ' ').replace('"', "'").strip()
 
+# Normalized tokens are the maximal runs of [a-z0-9] in the lowercased text
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+TOKEN_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789')
+
+# Texts longer than this are lowercased and tokenized a chunk at a time
+TOKENIZE_CHUNK_CHARS = 1 << 20
+
+def tokenize(text):
+    if not text: return []
+    if len(text) <= TOKENIZE_CHUNK_CHARS:
+        return TOKEN_RE.findall(text.lower())
+
+    # Avoid a full lowercased copy of very large texts. A token cut by a
+    # chunk boundary is rejoined with its continuation in the next chunk.
+    tokens = []
+    open_token = False
+    for i in range(0, len(text), TOKENIZE_CHUNK_CHARS):
+        chunk = text[i:i + TOKENIZE_CHUNK_CHARS].lower()
+        chunk_tokens = TOKEN_RE.findall(chunk)
+        if open_token and chunk_tokens and chunk[0] in TOKEN_CHARS:
+            tokens[-1] += chunk_tokens[0]
+            chunk_tokens = chunk_tokens[1:]
+        tokens.extend(chunk_tokens)
+        open_token = chunk[-1] in TOKEN_CHARS
+    return tokens
+
 def normalize_text(text):
-    if not text: return ""
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return " ".join(tokenize(text))
+
+TYPO_CUTOFF = 0.85
+TYPO_TARGET_SET = set(TYPO_TARGETS)
+
+# Persistent word -> correction table. When installed (see
+# set_corrections_table), corrections are plain dictionary lookups and
+# newly resolved words are added so the table can be saved and reused.
+CORRECTIONS_TABLE = None
+
+def needs_correction(word):
+    return len(word) >= 4 and word not in TYPO_TARGET_SET
+
+def resolve_correction(word):
+    matches = difflib.get_close_matches(word, TYPO_TARGETS, n=1, cutoff=TYPO_CUTOFF)
+    return matches[0] if matches else word
 
 @functools.lru_cache(maxsize=32768)
 def _get_correction_cached(word):
-    matches = difflib.get_close_matches(word, TYPO_TARGETS, n=1, cutoff=0.85)
-    return matches[0] if matches else word
+    return resolve_correction(word)
 
-def correct_typos(text):
-    words = text.split()
+def correct_tokens(words):
     corrected_words = []
+    table = CORRECTIONS_TABLE
     
     for word in words:
         if len(word) < 4: 
             corrected_words.append(word)
             continue
-        if word in TYPO_TARGETS:
+        if word in TYPO_TARGET_SET:
             corrected_words.append(word)
             continue
 
-        corrected_words.append(_get_correction_cached(word))
+        if table is not None:
+            corrected = table.get(word)
+            if corrected is None:
+                corrected = _get_correction_cached(word)
+                table[word] = corrected
+            corrected_words.append(corrected)
+        else:
+            corrected_words.append(_get_correction_cached(word))
             
-    return " ".join(corrected_words)
+    return corrected_words
 
-def is_negated(text_before, window=5):
+def correct_typos(text):
+    return " ".join(correct_tokens(text.split()))
+
+def is_negated(text_before, window=NEGATION_WORDS):
     words = text_before.split()
     check_window = words[-window:] if len(words) >= window else words
     for word in check_window:
@@ -193,6 +239,79 @@ def is_negated(text_before, window=5):
             return True
     return False
 
+class Document:
+    """
+    One description, tokenized once and shared by every classification step.
+
+    - normalized: lowercased, punctuation-free text (the cache key)
+    - tokens: normalized tokens
+    - corrected_tokens / text: typo-corrected tokens and their joined text,
+      which all keyword, period and evidence matching runs on
+    - starts: character offset of each corrected token in `text`
+    """
+    __slots__ = ('normalized', 'tokens', 'corrected_tokens', 'text', 'starts')
+
+    def __init__(self, tokens, corrected_tokens=None):
+        self.tokens = tokens
+        self.normalized = " ".join(tokens)
+        self.corrected_tokens = correct_tokens(tokens) if corrected_tokens is None else corrected_tokens
+        self.text = " ".join(self.corrected_tokens)
+
+        starts = []
+        offset = 0
+        for token in self.corrected_tokens:
+            starts.append(offset)
+            offset += len(token) + 1
+        self.starts = starts
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(tokenize(text))
+
+    @classmethod
+    def from_corrected_text(cls, corrected_text):
+        """Wraps text that is already normalized and typo-corrected."""
+        tokens = corrected_text.split()
+        return cls(tokens, tokens)
+
+    def is_negated_at(self, char_start, chars=NEGATION_CHARS, window=NEGATION_WORDS):
+        """
+        Token-based equivalent of is_negated(text[char_start-chars:char_start]):
+        checks the last `window` words of that slice, including a partial
+        word cut by the slice start, without re-splitting the text.
+        """
+        return self.negation_rank(char_start, chars, window) is not None
+
+    def negation_rank(self, char_start, chars=NEGATION_CHARS, window=NEGATION_WORDS):
+        """
+        Position (0 = the word just before char_start) of the nearest negation
+        term is_negated_at finds, or None. The match is negated for every
+        smaller word window that still reaches that position.
+        """
+        lo = max(0, char_start - chars)
+        tokens = self.corrected_tokens
+        starts = self.starts
+        # Last token starting before char_start
+        k = bisect.bisect_left(starts, char_start) - 1
+        checked = 0
+        while k >= 0 and checked < window:
+            token_start = starts[k]
+            token = tokens[k]
+            token_end = token_start + len(token)
+            if token_end <= lo:
+                break
+            visible = token[max(lo - token_start, 0):min(token_end, char_start) - token_start]
+            if visible in NEGATION_TERMS:
+                return checked
+            if token_start <= lo:
+                break
+            checked += 1
+            k -= 1
+        return None
+
+def _substring_in(text, sub, start, end):
+    return text.find(sub, start, end) != -1
+
 def is_excluded_context(text_around, keyword):
     for base_kw, regex in EXCLUSION_REGEXES.items():
         if base_kw in keyword:
@@ -200,17 +319,210 @@ def is_excluded_context(text_around, keyword):
                 return True
     return False
 
-def get_ngrams(text, n):
-    words = text.split()
+def get_token_ngrams(words, n):
     if len(words) < n: return []
     return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
 
+def get_ngrams(text, n):
+    return get_token_ngrams(text.split(), n)
+
+# --- Persistent Typo Corrections ---
+
+def _corrections_signature():
+    # A table is only valid for the targets and cutoff it was resolved with
+    return {'targets': sorted(TYPO_TARGETS), 'cutoff': TYPO_CUTOFF}
+
+def load_corrections_table(path):
+    """
+    Loads a saved corrections table. Returns an empty table if the file is
+    missing, unreadable or was built for different typo targets/cutoff.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Could not load corrections table: {e}")
+        return {}
+    if data.get('signature') != _corrections_signature():
+        print(f"Corrections table {path} was built for different typo targets. Rebuilding.")
+        return {}
+    return data.get('corrections', {})
+
+def save_corrections_table(path, table):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': _corrections_signature(), 'corrections': table}, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def set_corrections_table(table):
+    """Installs (or with None, removes) the table used by correct_tokens."""
+    global CORRECTIONS_TABLE
+    CORRECTIONS_TABLE = table
+
+def collect_vocabulary(input_file):
+    """First pass: distinct description words that need a correction decision."""
+    vocabulary = set()
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
+        for row in csv.DictReader(fin):
+            vocabulary.update(tokenize(row.get('Concat_site_variables') or ''))
+    return {word for word in vocabulary if needs_correction(word)}
+
+def build_corrections(words, table, workers=1):
+    """
+    Resolves every word not yet in `table` and adds it. With workers > 1 the
+    fuzzy matching is spread over a process pool. Returns the number added.
+    """
+    missing = sorted(word for word in words if word not in table)
+    if not missing:
+        return 0
+
+    if workers > 1 and len(missing) > 1000:
+        import multiprocessing
+        with multiprocessing.Pool(workers) as pool:
+            resolved = pool.map(resolve_correction, missing, chunksize=max(1, len(missing) // (workers * 8)))
+    else:
+        resolved = [resolve_correction(word) for word in missing]
+
+    table.update(zip(missing, resolved))
+    return len(missing)
+
+# --- 3. Time Period Hierarchy ---
+
+_PERIOD_SUBDIVISION_RE = re.compile(r'^(.+?)\s+(?:I|II|III|IV|V)$')
+
+def _reduce_period_label(label):
+    """
+    Returns the next more general form of a period label, or None.
+    e.g. "Late Prehistoric I (Austin Phase)" -> "Late Prehistoric I" -> "Late Prehistoric",
+         "Paleoindian - Early" -> "Paleoindian".
+    """
+    if label.endswith(')') and ' (' in label:
+        return label[:label.rindex(' (')]
+    if ' - ' in label:
+        return label.rsplit(' - ', 1)[0]
+    match = _PERIOD_SUBDIVISION_RE.match(label)
+    if match:
+        return match.group(1)
+    return None
+
+class PeriodHierarchy:
+    """
+    Compiles a set of period labels into integer ids with precomputed ancestor
+    bitmasks, so the most specific non-redundant periods of a site can be
+    resolved with a few bit operations.
+
+    A label's parent is the nearest more general form of it (see
+    _reduce_period_label) that is itself a known label. Labels without a known
+    parent are roots.
+    """
+    def __init__(self, labels):
+        self.labels = sorted(set(labels))
+        self.ids = {label: i for i, label in enumerate(self.labels)}
+        self.parents = {}
+        for label in self.labels:
+            reduced = _reduce_period_label(label)
+            while reduced is not None and reduced not in self.ids:
+                reduced = _reduce_period_label(reduced)
+            self.parents[label] = reduced
+
+        # ancestor_masks[i] has a bit set for every strict ancestor of label i
+        self.ancestor_masks = []
+        for label in self.labels:
+            mask = 0
+            parent = self.parents[label]
+            while parent is not None:
+                mask |= 1 << self.ids[parent]
+                parent = self.parents[parent]
+            self.ancestor_masks.append(mask)
+
+    def bit(self, label):
+        return 1 << self.ids[label]
+
+    def resolve_mask(self, mask):
+        """
+        Drops every label in `mask` that is an ancestor of another label in
+        `mask`. Returns the remaining labels in sorted order.
+        """
+        covered = 0
+        remaining = mask
+        while remaining:
+            low = remaining & -remaining
+            covered |= self.ancestor_masks[low.bit_length() - 1]
+            remaining ^= low
+        mask &= ~covered
+
+        resolved = []
+        while mask:
+            low = mask & -mask
+            resolved.append(self.labels[low.bit_length() - 1])
+            mask ^= low
+        return resolved
+
+    def resolve(self, found_periods):
+        """
+        Resolves an iterable of period labels. Labels unknown to the hierarchy
+        are kept as-is.
+        """
+        mask = 0
+        unknown = set()
+        for label in found_periods:
+            if label in self.ids:
+                mask |= 1 << self.ids[label]
+            else:
+                unknown.add(label)
+        return sorted(unknown.union(self.resolve_mask(mask)))
+
+PERIOD_HIERARCHY = PeriodHierarchy(TIME_PERIOD_KEYWORDS.values())
+
+def determine_time_period(normalized_text, artifact_db, is_prehistoric, time_period_re_list=None, artifact_re_list=None, hierarchy=None):
+    if time_period_re_list is None:
+        time_period_re_list = TIME_PERIOD_RE_LIST
+    if artifact_re_list is None:
+        artifact_re_list = ARTIFACT_RE_LIST
+    if hierarchy is None:
+        hierarchy = PERIOD_HIERARCHY
+
+    found_periods = set()
+    
+    for period_name, regex in time_period_re_list:
+        if regex.search(normalized_text):
+            found_periods.add(period_name)
+    
+    for period_name, regex in artifact_re_list:
+        if regex.search(normalized_text):
+            found_periods.add(period_name)
+    
+    if found_periods:
+        return "; ".join(hierarchy.resolve(found_periods))
+
+    if is_prehistoric:
+        return "Inferred: Prehistoric"
+
+    if "historic" in normalized_text:
+        return "Inferred: Historic"
+
+    return "Unknown"
+
+# --- 4. Classifier ---
+
+# Corrected texts longer than this are scanned in overlapping windows
+SCAN_WINDOW_CHARS = 65536
+
+# Descriptions longer than this are truncated before classification (0 disables)
+DEFAULT_MAX_TEXT_CHARS = 2000000
+
 class SiteClassifier:
-    def __init__(self, artifact_db=None):
+    def __init__(self, artifact_db=None, window_chars=SCAN_WINDOW_CHARS, max_text_chars=DEFAULT_MAX_TEXT_CHARS):
         if artifact_db is None:
             self.artifact_db = load_artifact_db()
         else:
             self.artifact_db = artifact_db
+        self.window_chars = window_chars
+        self.max_text_chars = max_text_chars
+        # Optional rule_profiler.RuleProfiler (see --profile-rules)
+        self.profiler = None
 
         # Normalize sets and compile regexes
         self.class_1_re_list = self._compile_regex_list(CLASS_1_SET)
@@ -221,76 +533,178 @@ class SiteClassifier:
         normalized_burned_clay = {normalize_text(k) for k in BURNED_CLAY_SET}
         self.burned_clay_re = re.compile(r'\b(?:' + '|'.join(re.escape(kw) for kw in normalized_burned_clay) + r')\b')
 
+        # Period patterns are (label bit in the period hierarchy, regex, keyword)
+        self.period_hierarchy = PeriodHierarchy(list(TIME_PERIOD_KEYWORDS.values()) + list(self.artifact_db.values()))
+
         sorted_tp_keywords = sorted(TIME_PERIOD_KEYWORDS.keys(), key=len, reverse=True)
-        self.time_period_re_list = [(TIME_PERIOD_KEYWORDS[kw], re.compile(r'\b' + re.escape(normalize_text(kw)) + r'\b')) for kw in sorted_tp_keywords]
+        self.time_period_re_list = [(self.period_hierarchy.bit(TIME_PERIOD_KEYWORDS[kw]), re.compile(r'\b' + re.escape(normalize_text(kw)) + r'\b'), kw) for kw in sorted_tp_keywords]
 
         sorted_artifacts = sorted(self.artifact_db.keys(), key=len, reverse=True)
-        self.artifact_re_list = [(self.artifact_db[art], re.compile(r'\b' + re.escape(normalize_text(art)) + r'\b')) for art in sorted_artifacts]
+        self.artifact_re_list = [(self.period_hierarchy.bit(self.artifact_db[art]), re.compile(r'\b' + re.escape(normalize_text(art)) + r'\b'), art) for art in sorted_artifacts]
+
+        # Stable keyword dictionary for the bitmask encoding of keyword columns
+        self.keyword_dictionary = {
+            'Class_1_Keywords': sorted(kw for kw, _ in self.class_1_re_list),
+            'Class_2_Keywords': sorted(kw for kw, _ in self.class_2_re_list),
+            'Class_3_Keywords': sorted(kw for kw, _ in self.class_3_re_list),
+            'Prehistoric_Evidence': sorted(PREHISTORIC_KEYWORDS),
+        }
+        self.keyword_bit_index = {col: keyword_codes.build_bit_index(kws) for col, kws in self.keyword_dictionary.items()}
+
+        # Keywords that have context exclusion rules (e.g. anything containing "oven")
+        all_keywords = {kw for re_list in (self.class_1_re_list, self.class_2_re_list, self.class_3_re_list) for kw, _ in re_list}
+        self.exclusion_keywords = {kw for kw in all_keywords if any(base_kw in kw for base_kw in EXCLUSION_REGEXES)}
+
+        # Windows overlap by the longest pattern plus one character, so every
+        # match starting inside a window is found whole and its trailing word
+        # boundary is judged on real text. Negation and exclusion context is
+        # read from the full document by offset, not from the window.
+        longest = max(len(normalize_text(kw)) for kw in (
+            list(all_keywords) + list(ROCK_MATERIAL_SET) + list(BURNED_CLAY_SET) + PREHISTORIC_KEYWORDS
+            + list(TIME_PERIOD_KEYWORDS) + list(self.artifact_db)
+        ))
+        self.window_overlap = longest + 1
 
     def _compile_regex_list(self, keyword_set):
         normalized = {normalize_text(k) for k in keyword_set}
         return [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in normalized]
 
-    def find_classes_robust(self, normalized_text):
+    def scan_windows(self, text):
+        """
+        Returns (start, end, endpos) windows covering `text`. A match belongs
+        to the window its start falls in ([start, end)); patterns search up
+        to `endpos`. Short texts are a single window.
+        """
+        length = len(text)
+        if length <= self.window_chars:
+            return [(0, length, length)]
+        return [(start, min(start + self.window_chars, length), min(start + self.window_chars + self.window_overlap, length))
+                for start in range(0, length, self.window_chars)]
+
+    def truncate(self, text):
+        """
+        Applies the max_text_chars cap, cutting at the last space before it.
+        Returns the text unchanged if it is within the cap.
+        """
+        cap = self.max_text_chars
+        if not cap or len(text) <= cap:
+            return text
+        cut = text.rfind(' ', 0, cap + 1)
+        return text[:cut if cut > 0 else cap]
+
+    def _match_outcome(self, kw, start, end, document, class_id, rock_present, stats=None):
+        """
+        Runs the negation, exclusion and dependency checks on one match.
+        Returns match_spans.ACCEPTED or the outcome of the check that
+        rejected it.
+        """
+        text = document.text
+
+        # 1. Negation Check
+        if document.is_negated_at(start):
+            return match_spans.NEGATED
+
+        # 2. Context Exclusion
+        if kw in self.exclusion_keywords:
+            context = EXCLUSION_CONTEXT_CHARS
+            text_around = text[max(0, start-context):min(len(text), end+context)]
+            if stats is None:
+                excluded = is_excluded_context(text_around, kw)
+            else:
+                excluded = self.profiler.check_exclusions(text_around, kw, EXCLUSION_REGEXES)
+            if excluded:
+                return match_spans.EXCLUDED
+
+        # 3. Dependency Check (Specific to Class 2 'hearth')
+        if class_id == 2:
+            if (kw == "hearth" or kw == "hearths") and not rock_present:
+                return match_spans.DEPENDENCY
+
+        return match_spans.ACCEPTED
+
+    def _accept_keyword(self, kw, regex, document, window, class_id, rock_present, stats=None):
+        """
+        Returns True if `kw` has a match starting in `window` that survives
+        the negation, exclusion and dependency checks. With `stats` (a
+        rule_profiler.RuleStats) the outcome of every match is counted.
+        """
+        win_start, win_end, endpos = window
+        for match in regex.finditer(document.text, win_start, endpos):
+            start, end = match.span()
+            if start >= win_end:
+                break
+            outcome = self._match_outcome(kw, start, end, document, class_id, rock_present, stats)
+            if outcome == match_spans.ACCEPTED:
+                if stats is not None:
+                    stats.matches += 1
+                return True
+            if stats is not None:
+                stats.matches += 1
+                if outcome == match_spans.NEGATED:
+                    stats.negated += 1
+                elif outcome == match_spans.EXCLUDED:
+                    stats.excluded += 1
+                else:
+                    stats.dependency += 1
+        return False
+
+    def _accept_keyword_profiled(self, kind, kw, regex, document, window, class_id, rock_present):
+        stats = self.profiler.rule(kind, kw)
+        start = time.perf_counter()
+        accepted = self._accept_keyword(kw, regex, document, window, class_id, rock_present, stats)
+        stats.seconds += time.perf_counter() - start
+        stats.scans += 1
+        if accepted:
+            stats.accepted += 1
+        return accepted
+
+    def find_classes_robust(self, document, spans=None):
         """
         Robust classification handling negation, context exclusion, and dependencies.
-        Runs on pre-corrected text.
+        Runs on a Document (or pre-corrected text). If `spans` is a list,
+        every rock material and class keyword match is appended to it (see
+        find_match_spans).
         """
+        if isinstance(document, str):
+            document = Document.from_corrected_text(document)
+        text = document.text
+        profiler = self.profiler
+
+        # Oversized texts are scanned window by window so each window stays
+        # cache-resident while every pattern runs over it
+        windows = self.scan_windows(text)
+
+        if spans is not None:
+            return self.find_match_spans(document, windows, spans)
+
         c1_found = set()
         c2_found = set()
         c3_found = set()
 
-        # Check Rock Presence with Negation Check
+        # Check Rock Presence with Negation Check. Rock terms have no
+        # exclusion rules, so only negation applies.
         rock_present = False
-        for kw, regex in self.rock_material_re_list:
-            for match in regex.finditer(normalized_text):
-                start = match.start()
-                # Check negation for this rock match
-                text_before = normalized_text[max(0, start-30):start]
-                if not is_negated(text_before):
-                    rock_present = True
-                    break # Found at least one non-negated rock term
+        for window in windows:
+            for kw, regex in self.rock_material_re_list:
+                if profiler is None:
+                    rock_present = self._accept_keyword(kw, regex, document, window, 0, False)
+                else:
+                    rock_present = self._accept_keyword_profiled('rock', kw, regex, document, window, 0, False)
+                if rock_present: break # Found at least one non-negated rock term
             if rock_present: break
                 
         def process_set(regex_list, target_set, class_id):
-            for kw, regex in regex_list:
-                for match in regex.finditer(normalized_text):
-                    start, end = match.span()
-                    
-                    # 1. Negation Check
-                    text_before = normalized_text[max(0, start-30):start]
-                    if is_negated(text_before):
-                        continue
-
-                    # 2. Context Exclusion
-                    text_around = normalized_text[max(0, start-50):min(len(normalized_text), end+50)]
-                    if is_excluded_context(text_around, kw):
+            kind = f'class_{class_id}'
+            for window in windows:
+                for kw, regex in regex_list:
+                    if kw in target_set:
                         continue
-
-                    # 3. Dependency Check (Specific to Class 2 'hearth')
-                    if class_id == 2:
-                        if (kw == "hearth" or kw == "hearths") and not rock_present:
-                             continue
-
-def determine_time_period(normalized_text, artifact_db, is_prehistoric, time_period_re_list=None, artifact_re_list=None):
-    if time_period_re_list is None:
-        time_period_re_list = TIME_PERIOD_RE_LIST
-    if artifact_re_list is None:
-        artifact_re_list = ARTIFACT_RE_LIST
-
-    found_periods = set()
-    
-    for period_name, regex in time_period_re_list:
-        if regex.search(normalized_text):
-            found_periods.add(period_name)
-    
-    for period_name, regex in artifact_re_list:
-        if regex.search(normalized_text):
-            found_periods.add(period_name)
-    
-    if found_periods:
-        return "; ".join(sorted(list(found_periods)))
-                    target_set.add(kw)
+                    if profiler is None:
+                        accepted = self._accept_keyword(kw, regex, document, window, class_id, rock_present)
+                    else:
+                        accepted = self._accept_keyword_profiled(kind, kw, regex, document, window, class_id, rock_present)
+                    if accepted:
+                        target_set.add(kw)
 
         process_set(self.class_1_re_list, c1_found, 1)
         process_set(self.class_2_re_list, c2_found, 2)
@@ -298,123 +712,274 @@ def determine_time_period(normalized_text, artifact_db, is_prehistoric, time_per
 
         return c1_found, c2_found, c3_found
 
-    def determine_time_period(self, normalized_text, is_prehistoric):
-        found_periods = set()
-
-        for period_name, regex in self.time_period_re_list:
-            if regex.search(normalized_text):
-                found_periods.add(period_name)
-        
-        for period_name, regex in self.artifact_re_list:
-            if regex.search(normalized_text):
-                found_periods.add(period_name)
-
-        if found_periods:
-            return "; ".join(sorted(list(found_periods)))
-
-# --- Module Level Initialization ---
+    def find_match_spans(self, document, windows, spans):
+        """
+        Examines every match instead of stopping at the first accepted one,
+        appending (class id, keyword, start, end, outcome) to `spans` with
+        class id 0 for rock material. Returns the same class keyword sets as
+        find_classes_robust: a keyword is found when one of its matches is
+        accepted.
+        """
+        # Class 0 (rock material) runs first; its accepted matches set
+        # rock_present for the Class 2 dependency check
+        found = {0: set(), 1: set(), 2: set(), 3: set()}
+        for class_id, regex_list in ((0, self.rock_material_re_list), (1, self.class_1_re_list),
+                                     (2, self.class_2_re_list), (3, self.class_3_re_list)):
+            rock_present = bool(found[0])
+            for win_start, win_end, endpos in windows:
+                for kw, regex in regex_list:
+                    for match in regex.finditer(document.text, win_start, endpos):
+                        start, end = match.span()
+                        if start >= win_end:
+                            break
+                        outcome = self._match_outcome(kw, start, end, document, class_id, rock_present)
+                        spans.append((class_id, kw, start, end, outcome))
+                        if outcome == match_spans.ACCEPTED:
+                            found[class_id].add(kw)
+        return found[1], found[2], found[3]
+
+    def _search_window(self, regex, text, window):
+        win_start, win_end, endpos = window
+        match = regex.search(text, win_start, endpos)
+        return match is not None and match.start() < win_end
+
+    def has_burned_clay(self, document):
+        text = document if isinstance(document, str) else document.text
+        for window in self.scan_windows(text):
+            if self.profiler is None:
+                found = self._search_window(self.burned_clay_re, text, window)
+            else:
+                found = self.profiler.timed_search('burned_clay', 'burned clay terms', self._search_window, self.burned_clay_re, text, window)
+            if found:
+                return True
+        return False
+
+    def find_prehistoric_evidence(self, document):
+        """Prehistoric keywords occurring anywhere in the text (substring match), in keyword order."""
+        text = document if isinstance(document, str) else document.text
+        found = set()
+        for win_start, win_end, _ in self.scan_windows(text):
+            for kw in PREHISTORIC_KEYWORDS:
+                if kw in found:
+                    continue
+                if self.profiler is None:
+                    hit = text.find(kw, win_start, win_end + len(kw) - 1) != -1
+                else:
+                    hit = self.profiler.timed_search('prehistoric', kw, _substring_in, text, kw, win_start, win_end + len(kw) - 1)
+                if hit:
+                    found.add(kw)
+        return [kw for kw in PREHISTORIC_KEYWORDS if kw in found]
+
+    def determine_time_period(self, document, is_prehistoric):
+        text = document if isinstance(document, str) else document.text
+        windows = self.scan_windows(text)
+        profiler = self.profiler
+        found_mask = 0
+
+        for window in windows:
+            for kind, re_list in (('period', self.time_period_re_list), ('artifact', self.artifact_re_list)):
+                for period_bit, regex, name in re_list:
+                    if found_mask & period_bit:
+                        continue
+                    if profiler is None:
+                        found = self._search_window(regex, text, window)
+                    else:
+                        found = profiler.timed_search(kind, name, self._search_window, regex, text, window)
+                    if found:
+                        found_mask |= period_bit
 
-print("Preparing word banks and artifact DB...")
-ARTIFACT_DB = load_artifact_db()
+        if found_mask:
+            return "; ".join(self.period_hierarchy.resolve_mask(found_mask))
 
-CLASS_1_SET = {normalize_text(k) for k in CLASS_1_SET}
-CLASS_2_SET = {normalize_text(k) for k in CLASS_2_SET}
-CLASS_3_SET = {normalize_text(k) for k in CLASS_3_SET}
-BURNED_CLAY_SET = {normalize_text(k) for k in BURNED_CLAY_SET}
-BURNED_CLAY_RE = re.compile(r'\b(?:' + '|'.join(re.escape(kw) for kw in BURNED_CLAY_SET) + r')\b')
-ROCK_MATERIAL_SET = {normalize_text(k) for k in ROCK_MATERIAL_SET}
         if is_prehistoric:
             return "Inferred: Prehistoric"
 
-        if "historic" in normalized_text:
+        if "historic" in text:
             return "Inferred: Historic"
 
         return "Unknown"
 
-def parse_arguments():
-    parser = argparse.ArgumentParser(description='Classify site data.')
-    parser.add_argument('--input', '-i', default='p3_points_concatenated.csv', help='Input CSV file path')
-    parser.add_argument('--output', '-o', default='p3_points_classified.csv', help='Output CSV file path')
-    parser.add_argument('--generate-synonyms', action='store_true', help='Generate synonyms file analysis')
-    return parser.parse_args()
-
-def main():
-    args = parse_arguments()
-    input_file = args.input
-    output_file = args.output
-
-    if not os.path.exists(input_file):
-        print(f"Error: Input file '{input_file}' not found.")
-        sys.exit(1)
-
-def setup_globals(artifact_db):
-    global CLASS_1_SET, CLASS_2_SET, CLASS_3_SET, BURNED_CLAY_SET, ROCK_MATERIAL_SET
-    global BURNED_CLAY_RE, CLASS_1_RE_LIST, CLASS_2_RE_LIST, CLASS_3_RE_LIST, ROCK_MATERIAL_RE_LIST
-    global TIME_PERIOD_RE_LIST, ARTIFACT_RE_LIST
-
-    CLASS_1_SET = {normalize_text(k) for k in CLASS_1_SET}
-    CLASS_2_SET = {normalize_text(k) for k in CLASS_2_SET}
-    CLASS_3_SET = {normalize_text(k) for k in CLASS_3_SET}
-    BURNED_CLAY_SET = {normalize_text(k) for k in BURNED_CLAY_SET}
+# --- 5. Pipeline ---
 
-    BURNED_CLAY_RE = re.compile(r'\b(?:' + '|'.join(re.escape(kw) for kw in BURNED_CLAY_SET) + r')\b')
-    ROCK_MATERIAL_SET = {normalize_text(k) for k in ROCK_MATERIAL_SET}
-
-    CLASS_1_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_1_SET]
-    CLASS_2_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_2_SET]
-    CLASS_3_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_3_SET]
-    ROCK_MATERIAL_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in ROCK_MATERIAL_SET]
-
-    sorted_tp_keywords = sorted(TIME_PERIOD_KEYWORDS.keys(), key=len, reverse=True)
-    TIME_PERIOD_RE_LIST = [(TIME_PERIOD_KEYWORDS[kw], re.compile(r'\b' + re.escape(normalize_text(kw)) + r'\b')) for kw in sorted_tp_keywords]
-
-    sorted_artifacts = sorted(artifact_db.keys(), key=len, reverse=True)
-    ARTIFACT_RE_LIST = [(artifact_db[art], re.compile(r'\b' + re.escape(normalize_text(art)) + r'\b')) for art in sorted_artifacts]
-    print("Preparing word banks and artifact DB...")
-    
-    classifier = SiteClassifier()
+NEW_COLUMNS = [
+    'Normalized_Text', 
+    'Class_1_Found', 'Class_1_Keywords',
+    'Class_2_Found', 'Class_2_Keywords',
+    'Class_3_Found', 'Class_3_Keywords',
+    'Burned_Clay_Found', 'Burned_Clay_Only', 
+    'Is_Prehistoric', 'Learned_Time_Period', 'Prehistoric_Evidence'
+]
 
-def process_single_row(row, artifact_db):
-    clean_row = {k: clean_value(v) for k, v in row.items()}
+# Entries kept by the duplicate-description cache (0 disables it), and the
+# total description characters they may hold, since one description can be
+# up to --max-text-chars long
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_CHARS = 20_000_000
+CACHE_POLICIES = ['lru', 'fifo']
+
+class ClassificationCache:
+    """
+    Bounded cache of classification records keyed by a content hash of the
+    normalized description, so boilerplate descriptions shared by many sites
+    are classified once. Evicts the least recently used ('lru') or oldest
+    ('fifo') entries when it holds more than `maxsize` entries or more than
+    `max_chars` characters of text; a record larger than `max_chars` on its
+    own is not cached.
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, policy='lru', max_chars=DEFAULT_CACHE_CHARS):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}'. Expected one of {CACHE_POLICIES}.")
+        self.maxsize = maxsize
+        self.max_chars = max_chars
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(normalized_text):
+        return hashlib.blake2b(normalized_text.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == 'lru':
+            self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, record, chars=0):
+        """Caches `record`, which holds `chars` characters of text."""
+        if self.maxsize <= 0 or chars > self.max_chars:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.chars -= previous[1]
+        self.entries[key] = (record, chars)
+        self.chars += chars
+        while len(self.entries) > self.maxsize or self.chars > self.max_chars:
+            _, (_, evicted_chars) = self.entries.popitem(last=False)
+            self.chars -= evicted_chars
+            self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"Classification cache ({self.policy}, size {self.maxsize}): "
+                f"{self.hits} hits / {self.hits + self.misses} lookups ({self.hit_rate()*100:.1f}%), "
+                f"{len(self.entries)} entries ({self.chars} chars), {self.evictions} evictions")
+
+def _stage(classifier, name):
+    """Times a pipeline stage when the classifier has a rule profiler attached."""
+    if classifier.profiler is None:
+        return contextlib.nullcontext()
+    return classifier.profiler.stage(name)
+
+def process_single_row(row, classifier, keyword_bitmasks=False, cache=None, spans=None):
+    """
+    Cleans and classifies one input row. Returns the output row and the
+    typo-corrected tokens of its description (for n-gram counting). With a
+    `spans` list, the row's keyword match spans are appended to it.
+    """
+    clean_row = {k: csv_utils_helpers.clean_value(v) for k, v in row.items()}
     original_text = clean_row.get('Concat_site_variables', '')
-    normalized_text = normalize_text(original_text)
 
-    corrected_text = correct_typos(normalized_text)
-    c1_kws, c2_kws, c3_kws = find_classes_robust(corrected_text)
+    truncated_text = classifier.truncate(original_text)
+    if len(truncated_text) < len(original_text):
+        site = clean_row.get('trinomial') or 'unknown site'
+        print(f"Warning: Description of {site} has {len(original_text)} characters; "
+              f"classifying the first {len(truncated_text)} (--max-text-chars {classifier.max_text_chars}).")
+        original_text = truncated_text
+
+    with _stage(classifier, 'tokenize'):
+        tokens = tokenize(original_text)
+
+    if cache is None:
+        with _stage(classifier, 'correct'):
+            document = Document(tokens)
+        record = classify_document(document, classifier, keyword_bitmasks, spans)
+        corrected_tokens = document.corrected_tokens
+    else:
+        key = cache.key(" ".join(tokens))
+        entry = cache.get(key)
+        if entry is None:
+            with _stage(classifier, 'correct'):
+                document = Document(tokens)
+            row_spans = None if spans is None else []
+            entry = (classify_document(document, classifier, keyword_bitmasks, row_spans), row_spans)
+            # Only the output record (and spans) is kept; its Normalized_Text
+            # is the corrected description, so hits rebuild the tokens from it
+            cache.put(key, entry, len(document.text))
+            corrected_tokens = document.corrected_tokens
+        else:
+            corrected_tokens = entry[0]['Normalized_Text'].split()
+        record, cached_spans = entry
+        if spans is not None:
+            spans.extend(cached_spans)
+
+    clean_row.update(record)
+    return clean_row, corrected_tokens
+
+def classify_document(document, classifier, keyword_bitmasks=False, spans=None):
+    """
+    Classifies one Document. Returns the record of output fields
+    (NEW_COLUMNS), starting with the typo-corrected Normalized_Text.
+    """
+    corrected_text = document.text
+    with _stage(classifier, 'classes'):
+        c1_kws, c2_kws, c3_kws = classifier.find_classes_robust(document, spans)
 
     c1 = len(c1_kws) > 0
     c2 = len(c2_kws) > 0
     c3 = len(c3_kws) > 0
 
-    burned_clay_found = bool(BURNED_CLAY_RE.search(corrected_text))
+    with _stage(classifier, 'burned_clay'):
+        burned_clay_found = classifier.has_burned_clay(document)
 
     burned_clay_only = False
     if burned_clay_found and not c1 and not c2 and not c3:
         burned_clay_only = True
 
-    prehist_evidence = []
-    for kw in PREHISTORIC_KEYWORDS:
-        if kw in corrected_text:
-            prehist_evidence.append(kw)
+    with _stage(classifier, 'prehistoric'):
+        prehist_evidence = classifier.find_prehistoric_evidence(document)
 
     is_prehistoric = len(prehist_evidence) > 0
 
-    time_period = determine_time_period(corrected_text, artifact_db, is_prehistoric)
-
-    clean_row['Normalized_Text'] = corrected_text
-    clean_row['Class_1_Found'] = c1
-    clean_row['Class_1_Keywords'] = "; ".join(c1_kws)
-    clean_row['Class_2_Found'] = c2
-    clean_row['Class_2_Keywords'] = "; ".join(c2_kws)
-    clean_row['Class_3_Found'] = c3
-    clean_row['Class_3_Keywords'] = "; ".join(c3_kws)
-    clean_row['Burned_Clay_Found'] = burned_clay_found
-    clean_row['Burned_Clay_Only'] = burned_clay_only
-    clean_row['Is_Prehistoric'] = is_prehistoric
-    clean_row['Learned_Time_Period'] = time_period
-    clean_row['Prehistoric_Evidence'] = "; ".join(prehist_evidence)
+    with _stage(classifier, 'time_period'):
+        time_period = classifier.determine_time_period(document, is_prehistoric)
 
-    return clean_row, corrected_text
+    if keyword_bitmasks:
+        bits = classifier.keyword_bit_index
+        c1_value = keyword_codes.encode_keywords(c1_kws, bits['Class_1_Keywords'])
+        c2_value = keyword_codes.encode_keywords(c2_kws, bits['Class_2_Keywords'])
+        c3_value = keyword_codes.encode_keywords(c3_kws, bits['Class_3_Keywords'])
+        prehist_value = keyword_codes.encode_keywords(prehist_evidence, bits['Prehistoric_Evidence'])
+    else:
+        c1_value = "; ".join(sorted(c1_kws))
+        c2_value = "; ".join(sorted(c2_kws))
+        c3_value = "; ".join(sorted(c3_kws))
+        prehist_value = "; ".join(prehist_evidence)
+
+    return {
+        'Normalized_Text': corrected_text,
+        'Class_1_Found': c1,
+        'Class_1_Keywords': c1_value,
+        'Class_2_Found': c2,
+        'Class_2_Keywords': c2_value,
+        'Class_3_Found': c3,
+        'Class_3_Keywords': c3_value,
+        'Burned_Clay_Found': burned_clay_found,
+        'Burned_Clay_Only': burned_clay_only,
+        'Is_Prehistoric': is_prehistoric,
+        'Learned_Time_Period': time_period,
+        'Prehistoric_Evidence': prehist_value,
+    }
 
 def analyze_frequencies(unigrams, bigrams, trigrams):
     print("Analyzing frequencies for potential synonyms...")
@@ -446,159 +1011,230 @@ def analyze_frequencies(unigrams, bigrams, trigrams):
 
     print(f"Frequency analysis written to {SYNONYMS_FILE}")
 
-def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
-    print("Preparing word banks and artifact DB...")
-    artifact_db = load_artifact_db()
-
-    setup_globals(artifact_db)
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE, generate_synonyms=False, checkpoint_every=0, resume=False,
+         keyword_bitmasks=False, cache_size=DEFAULT_CACHE_SIZE, cache_policy='lru',
+         corrections_file=None, vocab_pass=False, workers=1, max_text_chars=DEFAULT_MAX_TEXT_CHARS,
+         profile_rules=None, profile_dump=None, mine_synonyms=False, write_spans=False,
+         prehistoric_model=None):
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+    if prehistoric_model and not os.path.exists(prehistoric_model):
+        print(f"Error: Model file '{prehistoric_model}' not found.")
+        sys.exit(1)
+    if write_spans and (checkpoint_every or resume):
+        print("Error: --match-spans is not supported with --checkpoint-every/--resume.")
+        sys.exit(1)
 
-CLASS_1_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_1_SET]
-CLASS_2_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_2_SET]
-CLASS_3_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in CLASS_3_SET]
-ROCK_MATERIAL_RE_LIST = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in ROCK_MATERIAL_SET]
+    if resume and not checkpoint_every:
+        checkpoint_every = checkpoint.DEFAULT_CHECKPOINT_EVERY
+    ckpt_path = checkpoint.checkpoint_path(output_file)
 
-sorted_tp_keywords = sorted(TIME_PERIOD_KEYWORDS.keys(), key=len, reverse=True)
-TIME_PERIOD_RE_LIST = [(TIME_PERIOD_KEYWORDS[kw], re.compile(r'\b' + re.escape(normalize_text(kw)) + r'\b')) for kw in sorted_tp_keywords]
+    state = None
+    if resume:
+        state = checkpoint.load_checkpoint(ckpt_path, input_file)
+        if state is not None and not os.path.exists(output_file):
+            print(f"Warning: Output file '{output_file}' is missing. Starting over.")
+            state = None
+        if state is None:
+            print("No usable checkpoint found. Starting from the beginning.")
 
-sorted_artifacts = sorted(ARTIFACT_DB.keys(), key=len, reverse=True)
-ARTIFACT_RE_LIST = [(ARTIFACT_DB[art], re.compile(r'\b' + re.escape(normalize_text(art)) + r'\b')) for art in sorted_artifacts]
+    print("Preparing word banks and artifact DB...")
+    classifier = SiteClassifier(max_text_chars=max_text_chars)
+    if profile_dump and not profile_rules:
+        profile_rules = rule_profiler.DEFAULT_REPORT_FILE
+    if profile_rules:
+        classifier.profiler = rule_profiler.RuleProfiler(cprofile_dir=profile_dump)
+        print("Profiling classification rules (timings include profiling overhead).")
+
+    if vocab_pass and corrections_file is None:
+        corrections_file = CORRECTIONS_FILE
+    corrections = None
+    if corrections_file:
+        corrections = load_corrections_table(corrections_file)
+        known = len(corrections)
+        if vocab_pass:
+            print(f"Collecting vocabulary from {input_file}...")
+            vocabulary = collect_vocabulary(input_file)
+            added = build_corrections(vocabulary, corrections, workers)
+            print(f"Vocabulary: {len(vocabulary)} candidate words, {added} newly resolved.")
+            save_corrections_table(corrections_file, corrections)
+            known = len(corrections)
+        set_corrections_table(corrections)
+
+    sidecar = keyword_codes.sidecar_path(output_file)
+    if keyword_bitmasks:
+        keyword_codes.write_sidecar(sidecar, classifier.keyword_dictionary)
+        print(f"Keyword columns will be written as bitmasks. Dictionary: {sidecar}")
+    elif os.path.exists(sidecar):
+        # A stale dictionary would make the text keyword columns look encoded
+        os.remove(sidecar)
+
+    if profile_rules and cache_size > 0:
+        # Cached rows would skip the rules, so they would look cheaper and
+        # rarer than they are in an uncached run
+        print("Classification cache disabled while profiling rules.")
+        cache_size = 0
+    cache = ClassificationCache(cache_size, cache_policy) if cache_size > 0 else None
+
+    span_writer = None
+    if write_spans:
+        span_keywords = {kw for re_list in (classifier.rock_material_re_list, classifier.class_1_re_list,
+                                            classifier.class_2_re_list, classifier.class_3_re_list) for kw, _ in re_list}
+        span_writer = match_spans.SpanWriter(output_file, span_keywords)
+        print(f"Keyword match spans will be written to {match_spans.spans_path(output_file)} (+ .idx, .json).")
+    else:
+        # Stale spans would no longer line up with the rows
+        for path in (match_spans.spans_path(output_file), match_spans.index_path(output_file),
+                     match_spans.dictionary_path(output_file)):
+            if os.path.exists(path):
+                os.remove(path)
 
-def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     unigrams = Counter()
     bigrams = Counter()
     trigrams = Counter()
+    row_count = 0
 
     print(f"Reading {input_file}...")
     
-    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-        reader = csv.DictReader(fin)
-        fieldnames = reader.fieldnames if reader.fieldnames else []
-        
-        new_cols = [
-            'Normalized_Text', 
-            'Class_1_Found', 'Class_1_Keywords',
-            'Class_2_Found', 'Class_2_Keywords',
-            'Class_3_Found', 'Class_3_Keywords',
-            'Burned_Clay_Found', 'Burned_Clay_Only', 
-            'Is_Prehistoric', 'Learned_Time_Period', 'Prehistoric_Evidence'
-        ]
+    # Read through a byte-offset tracking line reader so runs can be resumed
+    with open(input_file, 'rb') as fin_bin:
+        lines = checkpoint.OffsetLineReader(fin_bin)
+
+        if state is not None:
+            lines.seek(state['input_offset'])
+            reader = csv.DictReader(lines, fieldnames=state['input_fieldnames'])
+            new_fieldnames = state['output_fieldnames']
+            unigrams, bigrams, trigrams = state['unigrams'], state['bigrams'], state['trigrams']
+            row_count = state['row_count']
+
+            checkpoint.truncate_output(output_file, state['output_offset'])
+            print(f"Resuming {output_file} after row {row_count}...")
+            fout = open(output_file, 'a', encoding='utf-8', newline='')
+            writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
+        else:
+            reader = csv.DictReader(lines)
+            fieldnames = reader.fieldnames if reader.fieldnames else []
         
-        base_fieldnames = [f for f in fieldnames if f not in new_cols]
-        new_fieldnames = base_fieldnames + new_cols
+            base_fieldnames = [f for f in fieldnames if f not in NEW_COLUMNS]
+            new_fieldnames = base_fieldnames + NEW_COLUMNS
         
-        print(f"Writing to {output_file}...")
-        with open(output_file, 'w', encoding='utf-8', newline='') as fout:
+            print(f"Writing to {output_file}...")
+            fout = open(output_file, 'w', encoding='utf-8', newline='')
             writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
             writer.writeheader()
-            
-            row_count = 0
-            
-            for row in reader:
-                clean_row, corrected_text = process_single_row(row, artifact_db)
-                clean_row = {k: csv_utils_helpers.clean_value(v) for k, v in row.items()}
-                original_text = clean_row.get('Concat_site_variables', '')
-                normalized_text = normalize_text(original_text)
-                
-                corrected_text = correct_typos(normalized_text)
-                c1_kws, c2_kws, c3_kws = classifier.find_classes_robust(corrected_text)
-                
-                c1 = len(c1_kws) > 0
-                c2 = len(c2_kws) > 0
-                c3 = len(c3_kws) > 0
-                
-                burned_clay_found = bool(classifier.burned_clay_re.search(corrected_text))
-
-                burned_clay_only = False
-                if burned_clay_found and not c1 and not c2 and not c3:
-                    burned_clay_only = True
 
-                prehist_evidence = []
-                for kw in PREHISTORIC_KEYWORDS:
-                    if kw in corrected_text:
-                        prehist_evidence.append(kw)
-                
-                is_prehistoric = len(prehist_evidence) > 0
-                
-                time_period = determine_time_period(corrected_text, ARTIFACT_DB, is_prehistoric)
-                time_period = determine_time_period(corrected_text, artifact_db, is_prehistoric, TIME_PERIOD_RE_LIST, ARTIFACT_RE_LIST)
-                time_period = classifier.determine_time_period(corrected_text, is_prehistoric)
-                
-                clean_row['Normalized_Text'] = corrected_text
-                clean_row['Class_1_Found'] = c1
-                clean_row['Class_1_Keywords'] = "; ".join(c1_kws)
-                clean_row['Class_2_Found'] = c2
-                clean_row['Class_2_Keywords'] = "; ".join(c2_kws)
-                clean_row['Class_3_Found'] = c3
-                clean_row['Class_3_Keywords'] = "; ".join(c3_kws)
-                clean_row['Burned_Clay_Found'] = burned_clay_found
-                clean_row['Burned_Clay_Only'] = burned_clay_only
-                clean_row['Is_Prehistoric'] = is_prehistoric
-                clean_row['Learned_Time_Period'] = time_period
-                clean_row['Prehistoric_Evidence'] = "; ".join(prehist_evidence)
-                
+        with fout:
+            for row in reader:
+                row_spans = None if span_writer is None else []
+                clean_row, words = process_single_row(row, classifier, keyword_bitmasks, cache, row_spans)
                 writer.writerow(clean_row)
+                if span_writer is not None:
+                    span_writer.write_row(row_spans)
                 
-                words = corrected_text.split()
                 clean_words = [w for w in words if w not in STOPWORDS and len(w) > 2]
                 unigrams.update(clean_words)
                 
-                bg = get_ngrams(corrected_text, 2)
+                bg = get_token_ngrams(words, 2)
                 bigrams.update(bg)
                 
-                tg = get_ngrams(corrected_text, 3)
+                tg = get_token_ngrams(words, 3)
                 trigrams.update(tg)
                 
                 row_count += 1
                 if row_count % 1000 == 0:
                     print(f"Processed {row_count} rows...")
 
+                if checkpoint_every and row_count % checkpoint_every == 0:
+                    checkpoint.save_checkpoint(ckpt_path, fout, {
+                        'input_signature': checkpoint.input_signature(input_file),
+                        'input_offset': lines.offset,
+                        'input_fieldnames': reader.fieldnames,
+                        'output_fieldnames': new_fieldnames,
+                        'row_count': row_count,
+                        'unigrams': unigrams,
+                        'bigrams': bigrams,
+                        'trigrams': trigrams,
+                    })
+
     print(f"Finished processing {row_count} rows.")
+    if span_writer is not None:
+        span_writer.close()
+    if cache is not None:
+        print(cache.summary())
+
+    if corrections is not None:
+        set_corrections_table(None)
+        if len(corrections) > known:
+            save_corrections_table(corrections_file, corrections)
+        print(f"Corrections table {corrections_file}: {len(corrections)} words ({len(corrections) - known} added this run).")
+
+    if classifier.profiler is not None:
+        classifier.profiler.write_report(profile_rules)
+        print(classifier.profiler.summary())
+        print(f"Rule profile written to {profile_rules}")
+        for path in classifier.profiler.dump_stages():
+            print(f"Stage profile written to {path}")
     
-    if output_file == OUTPUT_FILE: 
+    # Generate synonyms if explicitly requested OR if we are using the default
+    # output name (implying a standard run)
+    if generate_synonyms or output_file == OUTPUT_FILE:
         analyze_frequencies(unigrams, bigrams, trigrams)
-    # Logic to decide whether to generate synonyms
-    # If explicit flag is present OR if we are using the default output name (implying standard run)
-    is_default_output = (output_file == 'p3_points_classified.csv')
-    if args.generate_synonyms or is_default_output:
-        print("Analyzing frequencies for potential synonyms...")
-        with open(SYNONYMS_FILE, 'w', encoding='utf-8') as f_syn:
-            f_syn.write("Potential Synonyms / High Frequency Terms Analysis\n")
-            f_syn.write("================================================\n\n")
-            f_syn.write("Top 50 Unigrams (excluding common stopwords):\n")
-            for word, count in unigrams.most_common(50):
-                f_syn.write(f"{word}: {count}\n")
-            f_syn.write("\n")
-            
-            f_syn.write("Top 50 Bigrams (2-word phrases):\n")
-            interesting_terms = ['rock', 'stone', 'fire', 'thermal', 'burned', 'burnt', 'heat', 'ash', 'charcoal', 'hearth', 'midden', 'oven', 'pit', 'scatter']
-            count_shown = 0
-            for phrase, count in bigrams.most_common(1000):
-                if count_shown >= 50: break
-                if any(term in phrase for term in interesting_terms):
-                     f_syn.write(f"{phrase}: {count}\n")
-                     count_shown += 1
-            f_syn.write("\n")
-            
-            f_syn.write("Top 50 Trigrams (3-word phrases):\n")
-            count_shown = 0
-            for phrase, count in trigrams.most_common(1000):
-                if count_shown >= 50: break
-                if any(term in phrase for term in interesting_terms):
-                     f_syn.write(f"{phrase}: {count}\n")
-                     count_shown += 1
-                     
-        print(f"Frequency analysis written to {SYNONYMS_FILE}")
+
+    if mine_synonyms:
+        # Imported here: synonym_miner reads the keyword lists from this module
+        import synonym_miner
+        synonym_miner.main(output_file)
+
+    if prehistoric_model:
+        # Imported here: prehistoric_model imports this module
+        import prehistoric_model as learned
+        scored, rate = learned.score_file(output_file, output_file, learned.PrehistoricModel.load(prehistoric_model))
+        print(f"Scored {scored} rows with {prehistoric_model} ({rate:,.0f} rows/s); "
+              f"{learned.SCORE_COLUMN} written next to Is_Prehistoric.")
+
+    checkpoint.remove_checkpoint(ckpt_path)
 
 if __name__ == "__main__":
-    import argparse
     parser = argparse.ArgumentParser(description="Classify archaeological sites based on text descriptions.")
     parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Path to the input concatenated CSV file.")
     parser.add_argument("output", nargs="?", default=OUTPUT_FILE, help="Path to the output classified CSV file.")
+    parser.add_argument("--generate-synonyms", action="store_true", help="Generate synonyms file analysis.")
+    parser.add_argument("--mine-synonyms", action="store_true",
+                        help="After classifying, rank synonym candidates for each class by PMI (potential_synonyms.csv).")
+    parser.add_argument("--match-spans", action="store_true",
+                        help="Write every keyword match (offsets into Normalized_Text and its outcome) to a binary <output>.spans sidecar with a per-row index.")
+    parser.add_argument("--prehistoric-model", metavar="MODEL",
+                        help="After classifying, add a learned Prehistoric_Score column from a model trained with prehistoric_model.py --train.")
     parser.add_argument("--test", action="store_true", help="Run in test mode with dummy data.")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Write a resumable checkpoint every N rows (0 disables).")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint of this output file.")
+    parser.add_argument("--keyword-bitmasks", action="store_true",
+                        help="Write keyword columns as integer bitmasks over a dictionary saved to <output>.keywords.json.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Distinct descriptions whose classification is cached (0 disables).")
+    parser.add_argument("--cache-policy", choices=CACHE_POLICIES, default='lru', help="Cache eviction policy.")
+    parser.add_argument("--corrections-table", nargs="?", const=CORRECTIONS_FILE, default=None,
+                        help=f"Reuse and extend a persistent typo corrections table (default path: {CORRECTIONS_FILE}).")
+    parser.add_argument("--vocab-pass", action="store_true",
+                        help="Resolve typo corrections once per distinct word before classifying.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to resolve corrections in the vocabulary pass.")
+    parser.add_argument("--profile-rules", nargs="?", const=rule_profiler.DEFAULT_REPORT_FILE, default=None,
+                        help=f"Record time and outcomes per keyword/artifact/exclusion rule and write a sorted CSV report (default path: {rule_profiler.DEFAULT_REPORT_FILE}).")
+    parser.add_argument("--profile-dump", metavar="DIR",
+                        help="With --profile-rules, also run each stage under cProfile and dump <DIR>/<stage>.prof.")
+    parser.add_argument("--max-text-chars", type=int, default=DEFAULT_MAX_TEXT_CHARS,
+                        help="Truncate descriptions longer than this many characters, with a warning (0 disables).")
     args = parser.parse_args()
 
     if args.test:
         main('test_edge_cases.csv', 'test_results.csv')
     else:
-        main(args.input, args.output)
-    main()
+        main(args.input, args.output, generate_synonyms=args.generate_synonyms,
+             checkpoint_every=args.checkpoint_every, resume=args.resume, keyword_bitmasks=args.keyword_bitmasks,
+             cache_size=args.cache_size, cache_policy=args.cache_policy,
+             corrections_file=args.corrections_table, vocab_pass=args.vocab_pass, workers=args.workers,
+             max_text_chars=args.max_text_chars, profile_rules=args.profile_rules, profile_dump=args.profile_dump,
+             mine_synonyms=args.mine_synonyms, write_spans=args.match_spans,
+             prehistoric_model=args.prehistoric_model)
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import math
+import hashlib
+
+# Streaming data-quality profile of the columns of an export, built while
+# process_sites concatenates it. Every column keeps a fixed amount of state
+# however many rows are read, and profiles from parallel workers merge.
+
+PROFILE_SUFFIX = '.profile.json'
+
+# HyperLogLog registers per column are 2**HLL_PRECISION bytes (about 1.6%
+# standard error on distinct counts at 12)
+HLL_PRECISION = 12
+
+# Misra-Gries counters per column, the top values reported from them, and
+# the characters of a value kept as its key
+HEAVY_HITTER_COUNTERS = 32
+TOP_VALUES = 10
+TOP_VALUE_CHARS = 100
+
+# Length histogram buckets: 0, 1, 2-3, 4-7, ... and a last one for 64K+
+# (counted per bit length, folded into the last bucket in the summary)
+LENGTH_BUCKETS = 18
+
+# Top values must have been counted at least this often (after the
+# Misra-Gries decrements) to be reported
+TOP_VALUE_MIN_COUNT = 2
+
+# A column looks truncated when at least this share of its values (and
+# TRUNCATION_MIN_VALUES of them) are exactly as long as the longest value,
+# not counting repeats of its most common values
+TRUNCATION_SHARE = 0.05
+TRUNCATION_MIN_VALUES = 10
+TRUNCATION_MIN_LENGTH = 20
+
+# Drift between two runs: absolute change in fill or skip rate, factor of
+# change in mean length and distinct count, share of a new most common value
+DRIFT_RATE = 0.2
+DRIFT_FACTOR = 2.0
+DRIFT_MIN_LENGTH = 5
+DRIFT_MIN_DISTINCT = 20
+DRIFT_TOP_SHARE = 0.5
+
+def profile_path(output_file):
+    return output_file + PROFILE_SUFFIX
+
+def bucket_label(i):
+    if i == 0:
+        return '0'
+    low = 1 << (i - 1)
+    if i == LENGTH_BUCKETS - 1:
+        return f'{low}+'
+    high = (1 << i) - 1
+    return str(low) if low == high else f'{low}-{high}'
+
+class HyperLogLog:
+    """Approximate distinct count in 2**precision one-byte registers."""
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        # A keyed hash would differ between worker processes; blake2b does not
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+        rest_bits = 64 - self.precision
+        index = h >> rest_bits
+        rank = rest_bits - (h & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * math.log(m / zeros)
+        return raw
+
+class HeavyHitters:
+    """
+    Misra-Gries frequent values: at most `size` counters, each an
+    undercount of its value's frequency by at most rows / (size + 1).
+    """
+    __slots__ = ('size', 'counts')
+
+    def __init__(self, size=HEAVY_HITTER_COUNTERS):
+        self.size = size
+        self.counts = {}
+
+    def add(self, key):
+        """Counts `key`; returns True if it was already being counted."""
+        counts = self.counts
+        count = counts.get(key)
+        if count is not None:
+            counts[key] = count + 1
+            return True
+        self.add_new(key)
+        return False
+
+    def add_new(self, key):
+        """Counts a `key` that is not being counted yet."""
+        counts = self.counts
+        if len(counts) < self.size:
+            counts[key] = 1
+        else:
+            for other in list(counts):
+                if counts[other] == 1:
+                    del counts[other]
+                else:
+                    counts[other] -= 1
+
+    def merge(self, other):
+        merged = dict(self.counts)
+        for key, count in other.counts.items():
+            merged[key] = merged.get(key, 0) + count
+        if len(merged) > self.size:
+            # Subtracting the (size + 1)-th largest count keeps the error bound
+            cut = sorted(merged.values(), reverse=True)[self.size]
+            merged = {key: count - cut for key, count in merged.items() if count > cut}
+        self.counts = merged
+
+    def top(self, n=TOP_VALUES, min_count=1):
+        items = [item for item in self.counts.items() if item[1] >= min_count]
+        return sorted(items, key=lambda item: (-item[1], item[0]))[:n]
+
+class ColumnProfile:
+    __slots__ = ('filled', 'skipped', 'total_length', 'max_length', 'at_max_length', 'lengths', 'distinct', 'top')
+
+    def __init__(self):
+        self.filled = 0
+        self.skipped = 0
+        self.total_length = 0
+        self.max_length = 0
+        self.at_max_length = 0
+        self.lengths = [0] * 64
+        self.distinct = HyperLogLog()
+        self.top = HeavyHitters()
+
+    def add(self, value, skip_values, skip_chars):
+        if not value:
+            self.lengths[0] += 1
+            self.skipped += 1
+            return
+        self.filled += 1
+        n = len(value)
+        self.lengths[n.bit_length()] += 1
+        self.total_length += n
+        if n >= self.max_length:
+            if n > self.max_length:
+                self.max_length = n
+                self.at_max_length = 0
+            self.at_max_length += 1
+        if n <= skip_chars and value.lower() in skip_values:
+            self.skipped += 1
+        # A short value already being counted was added to the distinct
+        # sketch when it was first seen
+        key = value if n <= TOP_VALUE_CHARS else value[:TOP_VALUE_CHARS]
+        counts = self.top.counts
+        count = counts.get(key)
+        if count is None:
+            self.top.add_new(key)
+        else:
+            counts[key] = count + 1
+            if key is value:
+                return
+        self.distinct.add(value)
+
+    def merge(self, other):
+        self.filled += other.filled
+        self.skipped += other.skipped
+        self.total_length += other.total_length
+        if other.max_length > self.max_length:
+            self.max_length, self.at_max_length = other.max_length, other.at_max_length
+        elif other.max_length == self.max_length:
+            self.at_max_length += other.at_max_length
+        self.lengths = [a + b for a, b in zip(self.lengths, other.lengths)]
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+
+    def summary(self, rows):
+        top = self.top.top(min_count=TOP_VALUE_MIN_COUNT)
+        # The same value repeated at the longest length is not truncation
+        varied = self.at_max_length - sum(count for value, count in self.top.top(len(self.top.counts))
+                                          if len(value) == self.max_length)
+        truncated = (self.max_length >= TRUNCATION_MIN_LENGTH and varied >= TRUNCATION_MIN_VALUES
+                     and varied >= TRUNCATION_SHARE * self.filled)
+        lengths = self.lengths[:LENGTH_BUCKETS - 1] + [sum(self.lengths[LENGTH_BUCKETS - 1:])]
+        return {
+            'filled': self.filled,
+            'fill_rate': round(self.filled / rows, 4) if rows else 0.0,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / rows, 4) if rows else 0.0,
+            'mean_length': round(self.total_length / self.filled, 1) if self.filled else 0.0,
+            'max_length': self.max_length,
+            'at_max_length': self.at_max_length,
+            'possible_truncation': truncated,
+            'length_histogram': {bucket_label(i): count for i, count in enumerate(lengths) if count},
+            'distinct': int(round(self.distinct.estimate())),
+            'top_values': [[value, count] for value, count in top],
+        }
+
+class DataProfiler:
+    """
+    Per-column fill rate, skip rate (values process_sites.should_skip
+    drops), length histogram, approximate distinct count and top values
+    over the rows passed to add_row. `skip_values` are the lowercase
+    values counted as skipped besides the empty string.
+    """
+    def __init__(self, skip_values=()):
+        self.skip_values = frozenset(skip_values)
+        self.skip_chars = max(map(len, self.skip_values), default=0)
+        self.rows = 0
+        self.columns = {}
+
+    def add_row(self, row):
+        """Profiles one row dict of cleaned values and returns it unchanged."""
+        self.rows += 1
+        columns = self.columns
+        skip_values, skip_chars = self.skip_values, self.skip_chars
+        for name, value in row.items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = ColumnProfile()
+                # Columns first seen late were empty in the earlier rows
+                column.lengths[0] = column.skipped = self.rows - 1
+            column.add(value, skip_values, skip_chars)
+        return row
+
+    def merge(self, other):
+        """Adds the rows profiled by `other` (e.g. a worker's byte range) to this profile."""
+        for name, column in other.columns.items():
+            mine = self.columns.get(name)
+            if mine is None:
+                mine = self.columns[name] = ColumnProfile()
+                mine.lengths[0] = mine.skipped = self.rows
+            mine.merge(column)
+        for name, column in self.columns.items():
+            if name not in other.columns:
+                column.lengths[0] += other.rows
+                column.skipped += other.rows
+        self.rows += other.rows
+
+    def summary(self):
+        return {
+            'rows': self.rows,
+            'columns': {name: column.summary(self.rows) for name, column in self.columns.items()},
+        }
+
+def load_profile(path):
+    """A profile written by write_profile, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_profile(path, profile):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+def _outside(current, previous, factor=DRIFT_FACTOR):
+    return current > previous * factor or current * factor < previous
+
+def compare_profiles(previous, current):
+    """Returns a message for every column whose profile drifted between two runs."""
+    drift = []
+    before, after = previous.get('columns', {}), current.get('columns', {})
+    growth = current['rows'] / previous['rows'] if previous.get('rows') else 1.0
+
+    for name in before:
+        if name not in after:
+            drift.append(f"{name}: column is missing")
+    for name, cur in after.items():
+        prev = before.get(name)
+        if prev is None:
+            drift.append(f"{name}: new column")
+            continue
+        if cur['skip_rate'] == 1 and prev['skip_rate'] < 1:
+            drift.append(f"{name}: every value is now empty or skipped (was {prev['skip_rate']:.0%})")
+        elif abs(cur['skip_rate'] - prev['skip_rate']) >= DRIFT_RATE:
+            drift.append(f"{name}: skipped values {prev['skip_rate']:.0%} -> {cur['skip_rate']:.0%}")
+        if abs(cur['fill_rate'] - prev['fill_rate']) >= DRIFT_RATE:
+            drift.append(f"{name}: filled values {prev['fill_rate']:.0%} -> {cur['fill_rate']:.0%}")
+        if prev['mean_length'] >= DRIFT_MIN_LENGTH and cur['filled'] and _outside(cur['mean_length'], prev['mean_length']):
+            drift.append(f"{name}: mean length {prev['mean_length']:g} -> {cur['mean_length']:g} characters")
+        if cur['possible_truncation'] and not (prev['possible_truncation'] and prev['max_length'] == cur['max_length']):
+            drift.append(f"{name}: {cur['at_max_length']} values are exactly {cur['max_length']} characters long "
+                         f"(truncated?)")
+        low, high = prev['distinct'] * min(growth, 1.0), prev['distinct'] * max(growth, 1.0)
+        if prev['distinct'] >= DRIFT_MIN_DISTINCT and (cur['distinct'] * DRIFT_FACTOR < low or
+                                                        cur['distinct'] > high * DRIFT_FACTOR):
+            drift.append(f"{name}: about {prev['distinct']} -> {cur['distinct']} distinct values")
+        if cur['top_values'] and current['rows']:
+            value, count = cur['top_values'][0]
+            share = count / current['rows']
+            prev_top = prev['top_values'][0][0] if prev['top_values'] else None
+            if share >= DRIFT_TOP_SHARE and value != prev_top:
+                was = f", was {prev_top!r}" if prev_top is not None else ""
+                drift.append(f"{name}: most common value is now {value!r} ({share:.0%} of rows{was})")
+    return drift
+
+def report_drift(drift, baseline):
+    if drift:
+        print(f"Warning: The data profile drifted from {baseline}:")
+        for message in drift:
+            print(f"  - {message}")
+    else:
+        print(f"No data profile drift from {baseline}.")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare two data profiles written by process_sites.py --profile.")
+    parser.add_argument("previous", help="Profile of the earlier run.")
+    parser.add_argument("current", help="Profile of the later run.")
+    args = parser.parse_args()
+
+    profiles = []
+    for path in (args.previous, args.current):
+        profile = load_profile(path)
+        if profile is None:
+            print(f"Error: Profile '{path}' not found or unreadable.")
+            sys.exit(1)
+        profiles.append(profile)
+    report_drift(compare_profiles(*profiles), args.previous)
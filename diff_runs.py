@@ -0,0 +1,276 @@
+import os
+import csv
+import heapq
+import argparse
+import tempfile
+from collections import Counter
+from operator import itemgetter
+import csv_utils_helpers
+import keyword_codes
+
+# Increase CSV field size limit to handle large fields
+csv_utils_helpers.increase_csv_field_size_limit()
+
+DEFAULT_KEY = 'trinomial'
+DEFAULT_OUTPUT_DIR = 'Run_Diff'
+
+# Rows sorted in memory at once; larger files are sorted in runs spilled to
+# temporary files and merged
+DEFAULT_CHUNK_ROWS = 200000
+
+DEFAULT_COMPARE_COLUMNS = [
+    'Class_1_Found', 'Class_2_Found', 'Class_3_Found',
+    'Burned_Clay_Found', 'Burned_Clay_Only', 'Is_Prehistoric',
+    'Learned_Time_Period',
+    'Class_1_Keywords', 'Class_2_Keywords', 'Class_3_Keywords', 'Prehistoric_Evidence',
+]
+
+CHANGES_FILE = 'Changed_Sites.csv'
+TRANSITIONS_FILE = 'Transitions.csv'
+SUMMARY_FILE = 'Diff_Summary.txt'
+
+def normalize_value(val):
+    """Cleans a value for comparison. Booleans compare case-insensitively."""
+    val = csv_utils_helpers.clean_value(val)
+    lowered = val.lower()
+    if lowered in ('true', 'false'):
+        return lowered.capitalize()
+    return val
+
+def normalize_keywords(val):
+    """Sorts a '; '-joined keyword list so sets in any order compare equal."""
+    keywords = (kw.strip() for kw in normalize_value(val).split(';'))
+    return "; ".join(sorted(kw for kw in keywords if kw))
+
+def read_records(path, key, columns):
+    """
+    Streams (key, value, ...) tuples holding only the key and compared
+    columns. Keyword bitmask columns (see keyword_codes) are decoded to the
+    text form, and keyword lists are sorted, so runs written in either format
+    or keyword order compare equal. Rows without a key are skipped and
+    counted in the returned `skipped` list.
+    """
+    sidecar = keyword_codes.sidecar_path(path)
+    dictionary = keyword_codes.load_sidecar(sidecar) if os.path.exists(sidecar) else {}
+    skipped = [0]
+
+    def records():
+        with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            reader = csv.DictReader(f)
+            missing = [c for c in [key] + columns if c not in (reader.fieldnames or [])]
+            if missing:
+                print(f"Warning: {path} has no column(s) {missing}; they compare as empty.")
+            for row in reader:
+                site = csv_utils_helpers.clean_value(row.get(key))
+                if not site:
+                    skipped[0] += 1
+                    continue
+                values = [site]
+                for col in columns:
+                    value = row.get(col) or ''
+                    if col in dictionary:
+                        value = "; ".join(keyword_codes.decode_keywords(value or 0, dictionary[col]))
+                    if col in keyword_codes.KEYWORD_COLUMNS:
+                        values.append(normalize_keywords(value))
+                    else:
+                        values.append(normalize_value(value))
+                yield tuple(values)
+
+    return records(), skipped
+
+def _write_run(tmp_dir, index, records):
+    path = os.path.join(tmp_dir, f"run_{index}.csv")
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(records)
+    return path
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for record in csv.reader(f):
+            yield tuple(record)
+
+def sorted_records(records, tmp_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yields records sorted by key. Inputs that fit in one chunk are sorted in
+    memory; larger inputs are sorted chunk by chunk into run files under
+    `tmp_dir` and streamed back through a k-way merge. Sorting is stable, so
+    duplicate keys keep their file order.
+    """
+    chunk = []
+    runs = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            chunk.sort(key=itemgetter(0))
+            runs.append(_write_run(tmp_dir, len(runs), chunk))
+            chunk = []
+
+    chunk.sort(key=itemgetter(0))
+    if not runs:
+        yield from chunk
+        return
+
+    if chunk:
+        runs.append(_write_run(tmp_dir, len(runs), chunk))
+        chunk = []
+    yield from heapq.merge(*(_read_run(path) for path in runs), key=itemgetter(0))
+
+def _groups(records):
+    """Groups consecutive records of a sorted stream by key."""
+    group = []
+    for record in records:
+        if group and record[0] != group[0][0]:
+            yield group[0][0], group
+            group = []
+        group.append(record)
+    if group:
+        yield group[0][0], group
+
+def merge_join(old_records, new_records):
+    """
+    Full outer sort-merge join of two key-sorted streams. Yields (key, old,
+    new) with None for a side that has no record. Duplicate keys are paired
+    in file order.
+    """
+    old_groups = _groups(old_records)
+    new_groups = _groups(new_records)
+    old_item = next(old_groups, None)
+    new_item = next(new_groups, None)
+
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            for record in old_item[1]:
+                yield old_item[0], record, None
+            old_item = next(old_groups, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            for record in new_item[1]:
+                yield new_item[0], None, record
+            new_item = next(new_groups, None)
+        else:
+            old_group, new_group = old_item[1], new_item[1]
+            for i in range(max(len(old_group), len(new_group))):
+                yield (old_item[0],
+                       old_group[i] if i < len(old_group) else None,
+                       new_group[i] if i < len(new_group) else None)
+            old_item = next(old_groups, None)
+            new_item = next(new_groups, None)
+
+def diff_runs(old_file, new_file, output_dir=DEFAULT_OUTPUT_DIR, key=DEFAULT_KEY, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Joins two classified CSVs on `key` and writes every changed, added and
+    removed site to Changed_Sites.csv. Returns a summary with per-column
+    transition counts.
+    """
+    if columns is None:
+        columns = DEFAULT_COMPARE_COLUMNS
+    os.makedirs(output_dir, exist_ok=True)
+
+    summary = {
+        'old_file': old_file, 'new_file': new_file, 'columns': list(columns),
+        'matched': 0, 'changed': 0, 'added': 0, 'removed': 0,
+        'transitions': {col: Counter() for col in columns},
+    }
+
+    old_records, old_skipped = read_records(old_file, key, columns)
+    new_records, new_skipped = read_records(new_file, key, columns)
+
+    changes_path = os.path.join(output_dir, CHANGES_FILE)
+    with tempfile.TemporaryDirectory(prefix='diff_runs_') as tmp_dir, \
+            open(changes_path, 'w', encoding='utf-8', newline='') as fout:
+        old_dir = os.path.join(tmp_dir, 'old')
+        new_dir = os.path.join(tmp_dir, 'new')
+        os.makedirs(old_dir)
+        os.makedirs(new_dir)
+
+        writer = csv.writer(fout)
+        writer.writerow([key, 'Change', 'Column', 'Old', 'New'])
+
+        joined = merge_join(sorted_records(old_records, old_dir, chunk_rows),
+                            sorted_records(new_records, new_dir, chunk_rows))
+        for site, old, new in joined:
+            if new is None:
+                summary['removed'] += 1
+                writer.writerow([site, 'removed', '', '', ''])
+                continue
+            if old is None:
+                summary['added'] += 1
+                writer.writerow([site, 'added', '', '', ''])
+                continue
+
+            summary['matched'] += 1
+            site_changed = False
+            for i, col in enumerate(columns, start=1):
+                if old[i] != new[i]:
+                    site_changed = True
+                    summary['transitions'][col][(old[i], new[i])] += 1
+                    writer.writerow([site, 'changed', col, old[i], new[i]])
+            if site_changed:
+                summary['changed'] += 1
+
+    summary['skipped'] = old_skipped[0] + new_skipped[0]
+    return summary
+
+def write_transitions(summary, output_dir):
+    path = os.path.join(output_dir, TRANSITIONS_FILE)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Column', 'Old', 'New', 'Sites'])
+        for col in summary['columns']:
+            for (old, new), count in summary['transitions'][col].most_common():
+                writer.writerow([col, old, new, count])
+
+def write_summary(summary, output_dir, top=10):
+    path = os.path.join(output_dir, SUMMARY_FILE)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("CLASSIFIED RUN COMPARISON\n")
+        f.write("=========================\n\n")
+        f.write(f"   - Old run: {summary['old_file']}\n")
+        f.write(f"   - New run: {summary['new_file']}\n")
+        f.write(f"   - Sites in both runs: {summary['matched']}\n")
+        f.write(f"   - Sites with changes: {summary['changed']}\n")
+        f.write(f"   - Sites only in new run: {summary['added']}\n")
+        f.write(f"   - Sites only in old run: {summary['removed']}\n")
+        if summary['skipped']:
+            f.write(f"   - Rows without a site key (skipped): {summary['skipped']}\n")
+        f.write("\nTRANSITIONS BY COLUMN\n")
+        for col in summary['columns']:
+            transitions = summary['transitions'][col]
+            if not transitions:
+                continue
+            f.write(f"\n   {col}: {sum(transitions.values())} sites\n")
+            for (old, new), count in transitions.most_common(top):
+                f.write(f"   - {old or '(empty)'} -> {new or '(empty)'}: {count}\n")
+    return path
+
+def main(old_file, new_file, output_dir=DEFAULT_OUTPUT_DIR, key=DEFAULT_KEY, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    for path in (old_file, new_file):
+        if not os.path.exists(path):
+            print(f"Error: Input file '{path}' not found.")
+            return None
+
+    print(f"Comparing {old_file} -> {new_file} on '{key}'...")
+    summary = diff_runs(old_file, new_file, output_dir, key, columns, chunk_rows)
+    write_transitions(summary, output_dir)
+    summary_path = write_summary(summary, output_dir)
+
+    print(f"{summary['matched']} sites in both runs, {summary['changed']} changed, "
+          f"{summary['added']} added, {summary['removed']} removed.")
+    for col in summary['columns']:
+        changed = sum(summary['transitions'][col].values())
+        if changed:
+            print(f"  {col}: {changed} sites changed")
+    print(f"Diff written to {os.path.abspath(output_dir)} ({CHANGES_FILE}, {TRANSITIONS_FILE}, {os.path.basename(summary_path)})")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two classified CSV runs site by site.")
+    parser.add_argument("old", help="Earlier classified CSV (e.g. p3_points_classified.csv).")
+    parser.add_argument("new", help="Later classified CSV (e.g. p4_points_classify.csv).")
+    parser.add_argument("--output-dir", "-o", default=DEFAULT_OUTPUT_DIR, help="Directory for the diff outputs.")
+    parser.add_argument("--key", default=DEFAULT_KEY, help="Column identifying a site.")
+    parser.add_argument("--columns", nargs="+", help="Columns to compare (default: class flags, period and keyword columns).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Rows sorted in memory at once; larger files are sorted through temporary files.")
+    args = parser.parse_args()
+
+    main(args.old, args.new, args.output_dir, args.key, args.columns, args.chunk_rows)
@@ -0,0 +1,342 @@
+import csv
+import os
+import sys
+import math
+import struct
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+import csv_utils_helpers
+import keyword_codes
+from spatial_index import detect_coordinate_columns, GEOGRAPHIC_COLUMNS
+
+# Increase CSV field size limit
+csv_utils_helpers.increase_csv_field_size_limit()
+
+INPUT_FILE = 'p3_points_classified.csv'
+OUTPUT_FILE = 'p3_points_classified.gpkg'
+DEFAULT_TABLE = 'burned_rock_sites'
+GEOMETRY_COLUMN = 'geom'
+
+# Rows inserted per executemany batch (all inside one transaction)
+DEFAULT_BATCH_SIZE = 10000
+
+# GeoPackage 1.3 file identification
+GPKG_APPLICATION_ID = 0x47504B47  # 'GPKG'
+GPKG_USER_VERSION = 10300
+
+BOOLEAN_COLUMNS = [
+    'Class_1_Found', 'Class_2_Found', 'Class_3_Found',
+    'Burned_Clay_Found', 'Burned_Clay_Only', 'Is_Prehistoric',
+]
+
+# Large free-text columns left out unless --include-text is given
+TEXT_BLOB_COLUMNS = ['Concat_site_variables', 'Normalized_Text']
+
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+    'AUTHORITY["EPSG","4326"]]'
+)
+
+# Rows every GeoPackage must carry in gpkg_spatial_ref_sys
+REQUIRED_SRS = [
+    ('WGS 84 geodetic', 4326, 'EPSG', 4326, WGS84_WKT, 'longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid'),
+    ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', 'undefined cartesian coordinate reference system'),
+    ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', 'undefined geographic coordinate reference system'),
+]
+
+def _timestamp():
+    now = datetime.now(timezone.utc)
+    return now.strftime('%Y-%m-%dT%H:%M:%S.') + f"{now.microsecond // 1000:03d}Z"
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def gpkg_point(x, y, srs_id):
+    """
+    Encodes a point as GeoPackage binary: the 'GP' header (version 0,
+    little-endian, no envelope) followed by a little-endian WKB point.
+    """
+    return struct.pack('<2sBBi', b'GP', 0, 0x01, srs_id) + struct.pack('<BIdd', 1, 1, x, y)
+
+def parse_boolean(val):
+    val = csv_utils_helpers.clean_value(val, lower=True)
+    if val == 'true':
+        return 1
+    if val == 'false':
+        return 0
+    return None
+
+def parse_double(val):
+    try:
+        number = float(val)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def column_types(fieldnames, x_col, y_col, include_text=False):
+    """Returns [(column, GeoPackage type)] for the attribute columns written."""
+    columns = []
+    for name in fieldnames:
+        if not include_text and name in TEXT_BLOB_COLUMNS:
+            continue
+        if name in BOOLEAN_COLUMNS:
+            columns.append((name, 'BOOLEAN'))
+        elif name in (x_col, y_col):
+            columns.append((name, 'DOUBLE'))
+        else:
+            columns.append((name, 'TEXT'))
+    return columns
+
+def layer_column_names(columns):
+    """
+    Returns the SQLite column name for each (column, type) pair. Columns that
+    clash with the feature id or geometry get a 'src_' prefix, and since SQLite
+    identifiers are case-insensitive, a name matching an earlier one ignoring
+    case (e.g. 'x' after 'X') gets a _2, _3, ... suffix.
+    """
+    used = {'fid', GEOMETRY_COLUMN.lower()}
+    names = []
+    for name, _ in columns:
+        base = 'src_' + name if name.lower() in ('fid', GEOMETRY_COLUMN.lower()) else name
+        candidate, n = base, 1
+        while candidate.lower() in used:
+            n += 1
+            candidate = f"{base}_{n}"
+        used.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+def create_core_tables(conn):
+    conn.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+    conn.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+    conn.execute("""
+        CREATE TABLE gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL PRIMARY KEY,
+            organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL,
+            definition TEXT NOT NULL,
+            description TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY,
+            data_type TEXT NOT NULL,
+            identifier TEXT UNIQUE,
+            description TEXT DEFAULT '',
+            last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+            srs_id INTEGER,
+            CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id)
+        )""")
+    conn.execute("""
+        CREATE TABLE gpkg_geometry_columns (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL,
+            z TINYINT NOT NULL,
+            m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+            CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+            CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id)
+        )""")
+    conn.execute("""
+        CREATE TABLE gpkg_extensions (
+            table_name TEXT,
+            column_name TEXT,
+            extension_name TEXT NOT NULL,
+            definition TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name)
+        )""")
+    conn.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", REQUIRED_SRS)
+
+def create_rtree_triggers(conn, table, column='geom', id_column='fid'):
+    """
+    The standard GeoPackage R-tree maintenance triggers. They call the
+    ST_* SQL functions that GeoPackage-aware clients (ArcGIS Pro, GDAL)
+    provide, so they are created after the bulk load.
+    """
+    t, c, i = table, column, id_column
+    rtree = quote_identifier(f"rtree_{t}_{c}")
+    qt, qc = quote_identifier(t), quote_identifier(c)
+    bounds = f"NEW.{qc}"
+    insert_new = (f"INSERT OR REPLACE INTO {rtree} VALUES (NEW.{i}, ST_MinX({bounds}), ST_MaxX({bounds}), "
+                  f"ST_MinY({bounds}), ST_MaxY({bounds}));")
+    triggers = {
+        'insert': (f"AFTER INSERT ON {qt} WHEN (NEW.{qc} NOT NULL AND NOT ST_IsEmpty(NEW.{qc}))",
+                   insert_new),
+        'update1': (f"AFTER UPDATE OF {qc} ON {qt} WHEN OLD.{i} = NEW.{i} AND (NEW.{qc} NOTNULL AND NOT ST_IsEmpty(NEW.{qc}))",
+                    insert_new),
+        'update2': (f"AFTER UPDATE OF {qc} ON {qt} WHEN OLD.{i} = NEW.{i} AND (NEW.{qc} ISNULL OR ST_IsEmpty(NEW.{qc}))",
+                    f"DELETE FROM {rtree} WHERE id = OLD.{i};"),
+        'update3': (f"AFTER UPDATE ON {qt} WHEN OLD.{i} != NEW.{i} AND (NEW.{qc} NOTNULL AND NOT ST_IsEmpty(NEW.{qc}))",
+                    f"DELETE FROM {rtree} WHERE id = OLD.{i}; " + insert_new),
+        'update4': (f"AFTER UPDATE ON {qt} WHEN OLD.{i} != NEW.{i} AND (NEW.{qc} ISNULL OR ST_IsEmpty(NEW.{qc}))",
+                    f"DELETE FROM {rtree} WHERE id IN (OLD.{i}, NEW.{i});"),
+        'delete': (f"AFTER DELETE ON {qt} WHEN OLD.{qc} NOT NULL",
+                   f"DELETE FROM {rtree} WHERE id = OLD.{i};"),
+    }
+    for name, (when, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER {quote_identifier(f'rtree_{t}_{c}_{name}')} {when} BEGIN {body} END")
+
+def write_geopackage(input_file, output_file=OUTPUT_FILE, table=DEFAULT_TABLE, x_col=None, y_col=None,
+                     srs_id=None, include_text=False, batch_size=DEFAULT_BATCH_SIZE, srs_wkt=None):
+    """
+    Writes the classified CSV as a GeoPackage point layer with an R-tree
+    spatial index. The file is built under a temporary name and moved into
+    place when complete. Returns {'features', 'no_geometry', 'srs_id'}.
+    """
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
+        reader = csv.DictReader(fin)
+        fieldnames = reader.fieldnames if reader.fieldnames else []
+
+        if x_col is None or y_col is None:
+            x_col, y_col = detect_coordinate_columns(fieldnames)
+        if x_col not in fieldnames or y_col not in fieldnames:
+            raise ValueError(f"Coordinate columns not found in {input_file}. Use --x-col/--y-col.")
+
+        if srs_id is None:
+            if (x_col, y_col) in GEOGRAPHIC_COLUMNS:
+                srs_id = 4326
+            else:
+                srs_id = -1
+                print("Warning: Projected coordinates without --epsg; the layer gets an undefined cartesian SRS.")
+
+        # Keyword columns hold bitmasks when classify_sites wrote a dictionary sidecar
+        sidecar = keyword_codes.sidecar_path(input_file)
+        dictionary = keyword_codes.load_sidecar(sidecar) if os.path.exists(sidecar) else {}
+
+        columns = column_types(fieldnames, x_col, y_col, include_text)
+        names = layer_column_names(columns)
+
+        tmp_path = output_file + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            # A fresh file that is only moved into place when complete
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            create_core_tables(conn)
+
+            if srs_id not in (4326, -1, 0):
+                if not srs_wkt:
+                    print(f"Warning: No WKT given for EPSG:{srs_id} (use --prj); clients must resolve it by code.")
+                conn.execute("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, 'EPSG', ?, ?, ?)",
+                             (f"EPSG:{srs_id}", srs_id, srs_id, srs_wkt or 'undefined', f"EPSG:{srs_id}"))
+
+            qt = quote_identifier(table)
+            column_sql = ", ".join(f"{quote_identifier(name)} {sql_type}" for name, (_, sql_type) in zip(names, columns))
+            conn.execute(f"CREATE TABLE {qt} (fid INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         f"{quote_identifier(GEOMETRY_COLUMN)} POINT, {column_sql})")
+            conn.execute(f"CREATE VIRTUAL TABLE {quote_identifier(f'rtree_{table}_{GEOMETRY_COLUMN}')} "
+                         f"USING rtree(id, minx, maxx, miny, maxy)")
+
+            insert_sql = (f"INSERT INTO {qt} (fid, {quote_identifier(GEOMETRY_COLUMN)}, "
+                          f"{', '.join(quote_identifier(name) for name in names)}) "
+                          f"VALUES ({', '.join('?' * (len(names) + 2))})")
+            rtree_sql = f"INSERT INTO {quote_identifier(f'rtree_{table}_{GEOMETRY_COLUMN}')} VALUES (?, ?, ?, ?, ?)"
+
+            features = 0
+            no_geometry = 0
+            min_x = min_y = math.inf
+            max_x = max_y = -math.inf
+            rows = []
+            boxes = []
+
+            def flush():
+                conn.executemany(insert_sql, rows)
+                conn.executemany(rtree_sql, boxes)
+                rows.clear()
+                boxes.clear()
+
+            for row in reader:
+                features += 1
+                x = parse_double(row.get(x_col))
+                y = parse_double(row.get(y_col))
+                if x is None or y is None:
+                    geom = None
+                    no_geometry += 1
+                else:
+                    geom = gpkg_point(x, y, srs_id)
+                    boxes.append((features, x, x, y, y))
+                    min_x, max_x = min(min_x, x), max(max_x, x)
+                    min_y, max_y = min(min_y, y), max(max_y, y)
+
+                values = [features, geom]
+                for name, sql_type in columns:
+                    val = row.get(name)
+                    if sql_type == 'BOOLEAN':
+                        values.append(parse_boolean(val))
+                    elif sql_type == 'DOUBLE':
+                        values.append(parse_double(val))
+                    elif name in dictionary:
+                        values.append("; ".join(keyword_codes.decode_keywords(val or 0, dictionary[name])))
+                    else:
+                        values.append(csv_utils_helpers.clean_value(val))
+                rows.append(values)
+
+                if len(rows) >= batch_size:
+                    flush()
+            flush()
+
+            has_extent = features > no_geometry
+            conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, description, last_change, "
+                         "min_x, min_y, max_x, max_y, srs_id) VALUES (?, 'features', ?, ?, ?, ?, ?, ?, ?, ?)", (
+                table, table, f"Classified burned rock sites from {os.path.basename(input_file)}",
+                _timestamp(),
+                min_x if has_extent else None, min_y if has_extent else None,
+                max_x if has_extent else None, max_y if has_extent else None, srs_id))
+            conn.execute("INSERT INTO gpkg_geometry_columns VALUES (?, ?, 'POINT', ?, 0, 0)", (table, GEOMETRY_COLUMN, srs_id))
+            conn.execute("INSERT INTO gpkg_extensions VALUES (?, ?, 'gpkg_rtree_index', "
+                         "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (table, GEOMETRY_COLUMN))
+            create_rtree_triggers(conn, table, GEOMETRY_COLUMN)
+            conn.commit()
+        finally:
+            conn.close()
+
+    os.replace(tmp_path, output_file)
+    return {'features': features, 'no_geometry': no_geometry, 'srs_id': srs_id}
+
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE, table=DEFAULT_TABLE, x_col=None, y_col=None,
+         srs_id=None, include_text=False, prj_file=None):
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+
+    srs_wkt = None
+    if prj_file:
+        with open(prj_file, 'r', encoding='utf-8') as f:
+            srs_wkt = f.read().strip()
+
+    print(f"Writing {input_file} to GeoPackage {output_file} (layer '{table}')...")
+    try:
+        result = write_geopackage(input_file, output_file, table, x_col, y_col, srs_id, include_text, srs_wkt=srs_wkt)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Wrote {result['features']} sites ({result['no_geometry']} without coordinates) "
+          f"with an R-tree spatial index, SRS {result['srs_id']}.")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export classified sites as a spatially indexed GeoPackage for ArcPro.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Path to the classified CSV file.")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE, help="Path to the GeoPackage to write.")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help="Layer (table) name.")
+    parser.add_argument("--x-col", help="X / longitude column (auto-detected if omitted).")
+    parser.add_argument("--y-col", help="Y / latitude column (auto-detected if omitted).")
+    parser.add_argument("--epsg", type=int,
+                        help="EPSG code of projected coordinates (lat/long exports default to 4326).")
+    parser.add_argument("--prj", help="ArcGIS .prj file holding the WKT definition of the --epsg coordinate system.")
+    parser.add_argument("--include-text", action="store_true",
+                        help="Also write the Concat_site_variables and Normalized_Text columns.")
+    args = parser.parse_args()
+
+    main(args.input, args.output, args.table, args.x_col, args.y_col, args.epsg, args.include_text, args.prj)
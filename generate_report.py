@@ -1,37 +1,105 @@
 import csv
 import sys
 import os
+import io
+import re
+import importlib.util
+from array import array
+import random
 from collections import Counter
 import csv_utils_helpers
-import csv_utils
+import keyword_codes
+import sampling
+import svg_report
+
+# matplotlib is standard in ArcPro/Anaconda but slow to import, so it is only
+# loaded when PNG charts are drawn. Without it the charts are written as SVG.
+PLOTTING_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+plt = None
+if not PLOTTING_AVAILABLE:
+    print("Warning: matplotlib not found. Charts will be written as SVG.")
+
+# The spatial co-occurrence section and the class x period matrices need
+# NumPy (standard in ArcPro/Anaconda)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
-# Try to import plotting libraries (standard in ArcPro/Anaconda)
 try:
-    import matplotlib.pyplot as plt
-    PLOTTING_AVAILABLE = True
+    import spatial_index
+    SPATIAL_AVAILABLE = True
 except ImportError:
-    PLOTTING_AVAILABLE = False
-    print("Warning: matplotlib not found. Charts will not be generated.")
+    SPATIAL_AVAILABLE = False
 
 # Increase CSV field size limit for Windows/Large fields
 csv_utils_helpers.increase_csv_field_size_limit()
 
-DEFAULT_INPUT_FILE = 'p3_points_classified.csv'
-csv_utils.increase_field_size_limit()
-
-DEFAULT_INPUT_FILE = 'p3_points_classified.csv'
-DEFAULT_INPUT_FILE = r'J:/Physical Share Copy/Stephanie/Southgate Output/p4_points_classify.csv'
 DEFAULT_INPUT_FILE = os.environ.get('BURNED_ROCK_INPUT_FILE', 'classified_sites.csv')
 REPORT_DIR = 'Burned_Rock_Report'
 
+# Neighbour search radii for the spatial co-occurrence section, in metres for
+# geographic exports and coordinate units otherwise
+DEFAULT_NEIGHBOR_RADII = [1000.0]
+
+SPATIAL_CLASSES = [('c1', 'Class 1'), ('c2', 'Class 2'), ('c3', 'Class 3')]
+
+# Per-site flag bits used to cross-tabulate classes against time periods
+FLAG_C1, FLAG_C2, FLAG_C3, FLAG_BC, FLAG_BC_ONLY = 1, 2, 4, 8, 16
+FLAG_CODES = 32
+CLASS_MATRIX_ROWS = [('Class 1', FLAG_C1), ('Class 2', FLAG_C2), ('Class 3', FLAG_C3)]
+BURNED_CLAY_MATRIX_ROWS = [('Burned Clay', FLAG_BC), ('Burned Clay Only', FLAG_BC_ONLY)]
+HEATMAP_TOP_PERIODS = 25
+
+# Site counts estimated by --sample / --sample-fraction, each with a 95% CI
+ESTIMATED_COUNTS = ['c1', 'c2', 'c3', 'c1_only', 'c2_only', 'c3_only', 'prehistoric',
+                    'c3_prehistoric', 'c3_historic_only', 'burned_clay', 'burned_clay_only',
+                    'bc_with_c1', 'bc_with_c2', 'bc_with_c3', 'bc_prehistoric']
+# Shares reported within a subgroup: (numerator, denominator)
+ESTIMATED_RATIOS = [('c3_only', 'c3'), ('bc_with_c1', 'burned_clay'), ('bc_with_c2', 'burned_clay'),
+                    ('bc_with_c3', 'burned_clay'), ('bc_prehistoric', 'burned_clay')]
+
+# --group-by value for the county code of the trinomial (e.g. 41AN) rather
+# than a column
+COUNTY_GROUP = 'county'
+
+# Per-group counts in the group summary CSV, in column order
+GROUP_SUMMARY_FIELDS = [('prehistoric', 'Prehistoric'), ('c1', 'Class_1'), ('c2', 'Class_2'), ('c3', 'Class_3'),
+                        ('c1_only', 'Class_1_Only'), ('c2_only', 'Class_2_Only'), ('c3_only', 'Class_3_Only'),
+                        ('c3_prehistoric', 'Class_3_Prehistoric'), ('c3_historic_only', 'Class_3_Historic_Only'),
+                        ('burned_clay', 'Burned_Clay'), ('burned_clay_only', 'Burned_Clay_Only'),
+                        ('bc_with_c1', 'Burned_Clay_With_Class_1'), ('bc_with_c2', 'Burned_Clay_With_Class_2'),
+                        ('bc_with_c3', 'Burned_Clay_With_Class_3'), ('bc_prehistoric', 'Burned_Clay_Prehistoric')]
+
+def clean_value(val):
+    if not val:
+        return ""
+    return val.strip().lower()
+
 def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def analyze_data(input_file):
+def analyze_data(input_file, group_by=None):
     print(f"Reading data from {input_file}...")
-    
-    stats = {
+
+    # Keyword columns hold bitmasks when classify_sites wrote a dictionary sidecar
+    keyword_dictionary = None
+    sidecar = keyword_codes.sidecar_path(input_file)
+    if os.path.exists(sidecar):
+        keyword_dictionary = keyword_codes.load_sidecar(sidecar)
+
+    try:
+        with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
+            reader = csv.DictReader(fin)
+            return analyze_rows(reader, reader.fieldnames or [], keyword_dictionary, group_by)
+    except FileNotFoundError:
+        print(f"Error: File {input_file} not found.")
+        sys.exit(1)
+
+def new_stats():
+    return {
         'total': 0,
         'c1': 0, 'c2': 0, 'c3': 0,
         'c1_only': 0, 'c2_only': 0, 'c3_only': 0,
@@ -44,68 +112,484 @@ def analyze_data(input_file):
         'bc_with_c2': 0,
         'bc_with_c3': 0,
         'bc_prehistoric': 0,
-        'time_periods': Counter()
+        'time_periods': Counter(),
+        'keyword_hits': {col: Counter() for col in keyword_codes.KEYWORD_COLUMNS}
     }
+
+def _count_site(stats, c1, c2, c3, bc, bc_only, is_pre, tp, n=1):
+    stats['total'] += n
+    stats['time_periods'][tp] += n
+
+    if c1: stats['c1'] += n
+    if c2: stats['c2'] += n
+    if c3: stats['c3'] += n
     
-    try:
-        with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-            reader = csv.DictReader(fin)
+    if c1 and not c2 and not c3: stats['c1_only'] += n
+    if c2 and not c1 and not c3: stats['c2_only'] += n
+    if c3 and not c1 and not c2: stats['c3_only'] += n
+    
+    if is_pre:
+        stats['prehistoric'] += n
+    
+    if c3:
+        if is_pre:
+            stats['c3_prehistoric'] += n
+        else:
+            stats['c3_historic_only'] += n
             
-            for row in reader:
-                stats['total'] += 1
-                
-                # Check Booleans case-insensitively for robustness
-                c1 = csv_utils_helpers.clean_value(row.get('Class_1_Found', 'False'), lower=True) == 'true'
-                c2 = csv_utils_helpers.clean_value(row.get('Class_2_Found', 'False'), lower=True) == 'true'
-                c3 = csv_utils_helpers.clean_value(row.get('Class_3_Found', 'False'), lower=True) == 'true'
-                bc = csv_utils_helpers.clean_value(row.get('Burned_Clay_Found', 'False'), lower=True) == 'true'
-                bc_only = csv_utils_helpers.clean_value(row.get('Burned_Clay_Only', 'False'), lower=True) == 'true'
-                
-                is_pre = csv_utils_helpers.clean_value(row.get('Is_Prehistoric', 'False'), lower=True) == 'true'
-                
-                # Time Period
-                tp = csv_utils_helpers.clean_value(row.get('Learned_Time_Period', 'Unknown'))
-                if not tp: tp = 'Unknown'
-                stats['time_periods'][tp] += 1
-
-                if c1: stats['c1'] += 1
-                if c2: stats['c2'] += 1
-                if c3: stats['c3'] += 1
-                
-                if c1 and not c2 and not c3: stats['c1_only'] += 1
-                if c2 and not c1 and not c3: stats['c2_only'] += 1
-                if c3 and not c1 and not c2: stats['c3_only'] += 1
-                
-                if is_pre:
-                    stats['prehistoric'] += 1
-                
-                if c3:
-                    if is_pre:
-                        stats['c3_prehistoric'] += 1
-                    else:
-                        stats['c3_historic_only'] += 1
-                        
-                if bc:
-                    stats['burned_clay'] += 1
-                    if c1: stats['bc_with_c1'] += 1
-                    if c2: stats['bc_with_c2'] += 1
-                    if c3: stats['bc_with_c3'] += 1
-                    if is_pre: stats['bc_prehistoric'] += 1
+    if bc:
+        stats['burned_clay'] += n
+        if c1: stats['bc_with_c1'] += n
+        if c2: stats['bc_with_c2'] += n
+        if c3: stats['bc_with_c3'] += n
+        if is_pre: stats['bc_prehistoric'] += n
+    
+    if bc_only:
+        stats['burned_clay_only'] += n
+
+def _count_keywords(stats, keyword_masks, row, keyword_dictionary, n=1):
+    for col in keyword_codes.KEYWORD_COLUMNS:
+        value = row.get(col) or ''
+        if keyword_dictionary is not None:
+            keyword_masks[col][int(value or 0)] += n
+        else:
+            for kw in value.split('; '):
+                if kw:
+                    stats['keyword_hits'][col][kw] += n
+
+def group_key_function(group_by, fieldnames):
+    """
+    Returns (label, row -> group key). COUNTY_GROUP groups by the county code
+    of the trinomial; anything else names a column.
+    """
+    if group_by == COUNTY_GROUP:
+        if 'trinomial' not in fieldnames:
+            print("Warning: No 'trinomial' column to group by county; all sites are in one group.")
+        return 'County', lambda row: sampling.county_code(row.get('trinomial'))
+    if group_by not in fieldnames:
+        print(f"Warning: No '{group_by}' column to group by; all sites are in one group.")
+    return group_by, lambda row: csv_utils_helpers.clean_value(row.get(group_by)) or 'Unknown'
+
+def analyze_rows(rows, fieldnames, keyword_dictionary=None, group_by=None):
+    """
+    Counts classes, periods and keywords over an iterable of row dicts.
+
+    With `group_by` (COUNTY_GROUP or a column name), the same counts are
+    also kept per group in the same pass, in stats['groups']. Each group
+    holds only counters, so memory grows with the number of groups rather
+    than the number of rows.
+    """
+    stats = new_stats()
+    stats['sites_xy'] = []
+
+    keyword_masks = {col: Counter() for col in keyword_codes.KEYWORD_COLUMNS}
+
+    # Compact per-site flag codes and Learned_Time_Period ids for the class x
+    # period matrices
+    row_flags = array('B')
+    row_periods = array('I')
+    period_field_ids = {}
+
+    # Per group: sites per (flag code, Is_Prehistoric, period id) and per
+    # tuple of keyword column values; every count is derived from these at
+    # the end
+    groups = {}
+    group_label, group_key = group_key_function(group_by, fieldnames) if group_by else (None, None)
+    
+    x_col, y_col = (None, None)
+    if SPATIAL_AVAILABLE:
+        x_col, y_col = spatial_index.detect_coordinate_columns(fieldnames)
+        stats['geographic'] = (x_col, y_col) in spatial_index.GEOGRAPHIC_COLUMNS
+    
+    for row in rows:
+        # Check Booleans case-insensitively for robustness
+        c1 = csv_utils_helpers.clean_value(row.get('Class_1_Found', 'False'), lower=True) == 'true'
+        c2 = csv_utils_helpers.clean_value(row.get('Class_2_Found', 'False'), lower=True) == 'true'
+        c3 = csv_utils_helpers.clean_value(row.get('Class_3_Found', 'False'), lower=True) == 'true'
+        bc = csv_utils_helpers.clean_value(row.get('Burned_Clay_Found', 'False'), lower=True) == 'true'
+        bc_only = csv_utils_helpers.clean_value(row.get('Burned_Clay_Only', 'False'), lower=True) == 'true'
+        
+        is_pre = csv_utils_helpers.clean_value(row.get('Is_Prehistoric', 'False'), lower=True) == 'true'
+        
+        # Time Period
+        tp = csv_utils_helpers.clean_value(row.get('Learned_Time_Period', 'Unknown'))
+        if not tp: tp = 'Unknown'
+
+        flags = c1 * FLAG_C1 | c2 * FLAG_C2 | c3 * FLAG_C3 | bc * FLAG_BC | bc_only * FLAG_BC_ONLY
+        row_flags.append(flags)
+        tp_id = period_field_ids.get(tp)
+        if tp_id is None:
+            tp_id = period_field_ids[tp] = len(period_field_ids)
+        row_periods.append(tp_id)
+
+        _count_site(stats, c1, c2, c3, bc, bc_only, is_pre, tp)
+        _count_keywords(stats, keyword_masks, row, keyword_dictionary)
+
+        if group_key:
+            key = group_key(row)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (Counter(), Counter())
+            group[0][flags, is_pre, tp_id] += 1
+            group[1][tuple(row.get(col) or '' for col in keyword_codes.KEYWORD_COLUMNS)] += 1
+
+        if x_col:
+            try:
+                stats['sites_xy'].append((float(row[x_col]), float(row[y_col]), c1, c2, c3))
+            except (TypeError, ValueError):
+                pass
                 
-                if bc_only:
-                    stats['burned_clay_only'] += 1
-                        
+    if keyword_dictionary is not None:
+        for col, mask_counts in keyword_masks.items():
+            stats['keyword_hits'][col] = keyword_codes.count_mask_bits(mask_counts, keyword_dictionary[col])
+
+    period_fields = list(period_field_ids)
+    stats['period_matrix'] = build_period_matrix(row_flags, row_periods, period_fields)
+
+    if group_key:
+        stats['group_by'] = group_label
+        stats['groups'] = {}
+        for key, (cells, keyword_values) in groups.items():
+            group_stats = new_stats()
+            period_cells = Counter()
+            for (flags, is_pre, tp_id), n in cells.items():
+                _count_site(group_stats, flags & FLAG_C1, flags & FLAG_C2, flags & FLAG_C3, flags & FLAG_BC,
+                            flags & FLAG_BC_ONLY, is_pre, period_fields[tp_id], n)
+                period_cells[flags, tp_id] += n
+            masks = {col: Counter() for col in keyword_codes.KEYWORD_COLUMNS}
+            for values, n in keyword_values.items():
+                _count_keywords(group_stats, masks, dict(zip(keyword_codes.KEYWORD_COLUMNS, values)), keyword_dictionary, n)
+            if keyword_dictionary is not None:
+                for col, mask_counts in masks.items():
+                    group_stats['keyword_hits'][col] = keyword_codes.count_mask_bits(mask_counts, keyword_dictionary[col])
+            group_stats['period_matrix'] = build_group_period_matrix(period_cells, period_fields)
+            stats['groups'][key] = group_stats
+        stats['groups'] = dict(sorted(stats['groups'].items(), key=lambda item: (-item[1]['total'], item[0])))
+        
+    return stats
+
+def build_period_matrix(row_flags, row_periods, period_fields):
+    """
+    Cross-tabulates site flags against individual time periods in one
+    vectorized pass.
+
+    Sites are counted with a single bincount over combined (flag code,
+    Learned_Time_Period id) codes. Each distinct "; "-joined period field is
+    split once into integer period codes, and a membership matrix spreads the
+    counts onto individual periods, so a site listing two periods counts
+    towards both.
+
+    Returns {'periods': [...], 'sites': [...], 'rows': {label: [...]}} with
+    periods ordered by site count, or None without NumPy or data.
+    """
+    if not NUMPY_AVAILABLE or not len(row_flags):
+        return None
+
+    flags = np.frombuffer(row_flags, dtype=np.uint8).astype(np.int64)
+    field_ids = np.frombuffer(row_periods, dtype=np.uint32).astype(np.int64)
+    n_fields = len(period_fields)
+    counts = np.bincount(flags * n_fields + field_ids, minlength=FLAG_CODES * n_fields).reshape(FLAG_CODES, n_fields)
+    return _period_matrix(counts, period_fields)
+
+def build_group_period_matrix(cells, period_fields):
+    """
+    build_period_matrix for one group, from a Counter of sites per (flag
+    code, Learned_Time_Period id). Only the period fields the group uses
+    are expanded.
+    """
+    if not NUMPY_AVAILABLE or not cells:
+        return None
+
+    used = sorted({field_id for _, field_id in cells})
+    column = {field_id: i for i, field_id in enumerate(used)}
+    counts = np.zeros((FLAG_CODES, len(used)), dtype=np.int64)
+    for (flags, field_id), n in cells.items():
+        counts[flags, column[field_id]] = n
+    return _period_matrix(counts, [period_fields[field_id] for field_id in used])
+
+def _period_matrix(counts, period_fields):
+    period_codes = {}
+    member_fields = []
+    member_periods = []
+    for field_id, field in enumerate(period_fields):
+        for period in dict.fromkeys(p.strip() for p in field.split(';')):
+            if period:
+                member_fields.append(field_id)
+                member_periods.append(period_codes.setdefault(period, len(period_codes)))
+    membership = np.zeros((len(period_fields), len(period_codes)), dtype=np.int64)
+    membership[member_fields, member_periods] = 1
+
+    # flags x periods, then collapse flag codes onto each row's bit
+    by_flags = counts @ membership
+    codes = np.arange(FLAG_CODES)
+    sites = by_flags.sum(axis=0)
+    order = np.argsort(-sites, kind='stable')
+    periods = list(period_codes)
+
+    rows = {}
+    for label, bit in CLASS_MATRIX_ROWS + BURNED_CLAY_MATRIX_ROWS:
+        rows[label] = by_flags[(codes & bit) != 0].sum(axis=0)[order].tolist()
+
+    return {
+        'periods': [periods[i] for i in order],
+        'sites': sites[order].tolist(),
+        'rows': rows,
+    }
+
+def read_sample(input_file, sample_size=None, fraction=None, stratify=False, seed=None):
+    """
+    Samples raw records of a CSV without parsing the rows that are passed
+    over. Returns (fieldnames, {stratum: [row dicts]}, {stratum: population}).
+    Without `stratify` everything is one stratum sampled by reservoir
+    (fixed size) or Bernoulli (fraction) sampling; with it, sites are
+    stratified by the county code of their trinomial.
+    """
+    rng = random.Random(seed)
+
+    def open_records():
+        with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
+            for raw in sampling.iter_raw_records(fin):
+                if raw.strip():
+                    yield raw
+
+    header = next(open_records(), None)
+    if header is None:
+        return [], {}, {}
+    fieldnames = sampling.parse_record(header)
+
+    def data_records():
+        records = open_records()
+        next(records)
+        return records
+
+    key_index = fieldnames.index('trinomial') if 'trinomial' in fieldnames else None
+    if stratify and key_index is None:
+        print("Warning: No 'trinomial' column to stratify by county; sampling without strata.")
+        stratify = False
+
+    if stratify:
+        samples, populations = sampling.stratified_sample(
+            data_records, lambda raw: sampling.county_code(sampling.record_field(raw, key_index)),
+            sample_size, fraction, rng)
+    else:
+        if sample_size is not None:
+            sample, seen = sampling.reservoir_sample(data_records(), sample_size, rng)
+        else:
+            sample, seen = sampling.bernoulli_sample(data_records(), fraction, rng)
+        samples, populations = {'All': sample}, {'All': seen}
+
+    rows = {}
+    for h, records in samples.items():
+        rows[h] = [dict(zip(fieldnames, sampling.parse_record(raw))) for raw in records]
+    return fieldnames, rows, populations
+
+def analyze_sample(input_file, sample_size=None, fraction=None, stratify=False, seed=None, classify=False):
+    """
+    Estimates the report statistics from a sample of the rows. Counts are
+    scaled to the full file (stratum by stratum when stratified) and each
+    comes with a 95% confidence interval in stats['intervals']. With
+    `classify`, the input is an unclassified export and only the sampled
+    rows are run through classify_sites.
+    """
+    method = 'stratified by county' if stratify else ('reservoir' if sample_size is not None else 'Bernoulli')
+    print(f"Sampling {input_file} ({method})...")
+    try:
+        fieldnames, samples, populations = read_sample(input_file, sample_size, fraction, stratify, seed)
     except FileNotFoundError:
         print(f"Error: File {input_file} not found.")
         sys.exit(1)
-        
+
+    keyword_dictionary = None
+    if classify:
+        import classify_sites
+        print(f"Classifying {sum(len(rows) for rows in samples.values())} sampled rows...")
+        classifier = classify_sites.SiteClassifier()
+        samples = {h: [classify_sites.process_single_row(row, classifier)[0] for row in rows]
+                   for h, rows in samples.items()}
+    else:
+        sidecar = keyword_codes.sidecar_path(input_file)
+        if os.path.exists(sidecar):
+            keyword_dictionary = keyword_codes.load_sidecar(sidecar)
+
+    # Spatial statistics are not estimated: neighbour counts shrink with the sample
+    strata = [(analyze_rows(samples.get(h, []), [], keyword_dictionary), populations[h]) for h in populations]
+    return combine_strata(strata, {
+        'method': method,
+        'size': sum(sub['total'] for sub, _ in strata),
+        'population': sum(populations.values()),
+        'strata': len(populations),
+        'classified': classify,
+    })
+
+def combine_strata(strata, sample_info):
+    """
+    Combines per-stratum sample statistics [(stats, population)] into
+    estimated full-file statistics with confidence intervals.
+    """
+    def totals(get):
+        return sampling.estimate_total([(get(sub), sub['total'], N) for sub, N in strata])
+
+    stats = {
+        'total': sum(N for _, N in strata),
+        'time_periods': Counter(),
+        'sites_xy': [],
+        'keyword_hits': {col: Counter() for col in keyword_codes.KEYWORD_COLUMNS},
+        'period_matrix': None,
+        'intervals': {},
+        'period_intervals': {},
+        'ratio_intervals': {},
+        'sample': sample_info,
+    }
+
+    for key in ESTIMATED_COUNTS:
+        estimate, low, high = totals(lambda sub: sub[key])
+        stats[key] = int(round(estimate))
+        stats['intervals'][key] = (low, high)
+
+    periods = set()
+    for sub, _ in strata:
+        periods.update(sub['time_periods'])
+    for period in periods:
+        estimate, low, high = totals(lambda sub: sub['time_periods'][period])
+        stats['time_periods'][period] = int(round(estimate))
+        stats['period_intervals'][period] = (low, high)
+
+    for col in keyword_codes.KEYWORD_COLUMNS:
+        keywords = set()
+        for sub, _ in strata:
+            keywords.update(sub['keyword_hits'][col])
+        for kw in keywords:
+            estimate, _, _ = totals(lambda sub: sub['keyword_hits'][col][kw])
+            stats['keyword_hits'][col][kw] = int(round(estimate))
+
+    for num, den in ESTIMATED_RATIOS:
+        ratio = sampling.estimate_ratio([(sub[num], sub[den], sub['total'], N) for sub, N in strata])
+        if ratio is not None:
+            stats['ratio_intervals'][num] = ratio
+
     return stats
 
-def generate_charts(stats, output_dir):
-    if not PLOTTING_AVAILABLE:
+def analyze_spatial(stats, radii=None, units='auto'):
+    """
+    Nearest-neighbour co-occurrence between classes. One spatial index is
+    built per class and reused for every query, so this stays near
+    O(n log n) on statewide data.
+    """
+    if radii is None:
+        radii = DEFAULT_NEIGHBOR_RADII
+
+    sites = stats.get('sites_xy')
+    if not SPATIAL_AVAILABLE or not sites:
+        return None
+
+    np = spatial_index.np
+    data = np.array(sites, dtype=np.float64)
+    data = data[np.isfinite(data[:, 0]) & np.isfinite(data[:, 1])]
+    x, y = data[:, 0], data[:, 1]
+    geographic = stats.get('geographic')
+    if units != 'auto':
+        geographic = units == 'degrees'
+    elif not geographic and spatial_index.looks_geographic(x, y):
+        print("Warning: Every coordinate is within +/-180 / +/-90, so they are treated as longitude/latitude "
+              "in degrees. Use --units projected if they are not.")
+        geographic = True
+    stats['geographic'] = geographic
+    if geographic:
+        x, y = spatial_index.project_to_metres(x, y)
+    units = 'm' if geographic else 'units'
+
+    extent_area = (x.max() - x.min()) * (y.max() - y.min()) if len(x) else 0
+    masks = {key: data[:, col].astype(bool) for col, (key, _) in enumerate(SPATIAL_CLASSES, start=2)}
+    indexes = {key: spatial_index.SpatialIndex(x[mask], y[mask], extent_area) for key, mask in masks.items()}
+
+    spatial = {'sites': len(x), 'units': units, 'radii': list(radii), 'nearest': {}, 'within': {}}
+    for src, _ in SPATIAL_CLASSES:
+        qx, qy = x[masks[src]], y[masks[src]]
+        if not len(qx):
+            continue
+        for dst, _ in SPATIAL_CLASSES:
+            if dst == src or not masks[dst].any():
+                continue
+            d = indexes[dst].nearest_distance(qx, qy)
+            spatial['nearest'][(src, dst)] = {
+                'n': len(qx),
+                'median': float(np.median(d)),
+                'mean': float(np.mean(d)),
+            }
+            for radius in radii:
+                counts = indexes[dst].count_within(qx, qy, radius)
+                spatial['within'][(src, dst, radius)] = {
+                    'n': len(qx),
+                    'with_any': int((counts > 0).sum()),
+                    'mean_count': float(counts.mean()),
+                }
+
+    stats['spatial'] = spatial
+    return spatial
+
+def _load_pyplot():
+    global plt
+    if plt is None:
+        # Charts are only saved to files, and run_pipeline draws them on a
+        # worker thread, where interactive backends such as TkAgg fail
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot
+        plt = matplotlib.pyplot
+    return plt
+
+def _heatmap_data(stats):
+    matrix = stats.get('period_matrix')
+    if not matrix or not matrix['periods']:
+        return None
+    periods = matrix['periods'][:HEATMAP_TOP_PERIODS]
+    labels = [label for label, _ in CLASS_MATRIX_ROWS + BURNED_CLAY_MATRIX_ROWS]
+    values = [[matrix['rows'][label][i] for label in labels] for i in range(len(periods))]
+    return periods, labels, values
+
+def svg_charts(stats):
+    """The same charts as generate_charts, as (filename, title, svg) without matplotlib."""
+    charts = []
+    if 'c1' not in stats:
+        return charts
+    title = 'Distribution of Burned Rock Features by Class'
+    charts.append(('class_distribution.svg', title, svg_report.bar_chart(
+        ['Class 1\n(Scatter)', 'Class 2\n(Hearth)', 'Class 3\n(Oven)'], [stats['c1'], stats['c2'], stats['c3']],
+        title, ylabel='Number of Sites', colors=['skyblue', '#ff9999', '#99ff99'])))
+    if stats['c3'] > 0:
+        title = 'Prehistoric Evidence in Class 3 (Oven) Sites'
+        charts.append(('class3_prehistoric_breakdown.svg', title, svg_report.pie_chart(
+            ['Prehistoric Evidence Found', 'No Prehistoric Evidence'],
+            [stats['c3_prehistoric'], stats['c3_historic_only']], title, colors=['#ffcc99', '#d3d3d3'])))
+    most_common = stats['time_periods'].most_common(15)
+    if most_common:
+        labels, values = zip(*most_common)
+        title = 'Top Identified Time Periods / Cultures'
+        charts.append(('time_period_distribution.svg', title,
+                       svg_report.hbar_chart(labels, values, title, xlabel='Number of Sites')))
+    heatmap = _heatmap_data(stats)
+    if heatmap:
+        periods, labels, values = heatmap
+        title = 'Burned Rock Classes and Burned Clay by Time Period'
+        charts.append(('class_period_heatmap.svg', title, svg_report.heatmap(periods, labels, values, title)))
+    return charts
+
+def write_svg_charts(stats, output_dir):
+    for filename, _, svg in svg_charts(stats):
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(svg)
+
+def generate_charts(stats, output_dir, backend='auto'):
+    """Draw the report charts: PNG with matplotlib, or SVG with svg_report ('auto' picks matplotlib if installed)."""
+    if backend == 'matplotlib' and not PLOTTING_AVAILABLE:
+        print("Warning: matplotlib not found. Writing SVG charts instead.")
+    if backend == 'svg' or not PLOTTING_AVAILABLE:
+        print("Generating SVG charts...")
+        write_svg_charts(stats, output_dir)
         return
 
     print("Generating charts...")
+    plt = _load_pyplot()
     
     # 1. Class Distribution Bar Chart
     classes = ['Class 1\n(Scatter)', 'Class 2\n(Hearth)', 'Class 3\n(Oven)']
@@ -155,92 +639,265 @@ def generate_charts(stats, output_dir):
         plt.savefig(os.path.join(output_dir, 'time_period_distribution.png'))
         plt.close()
 
+    # 4. Class x Time Period Heatmap (Top periods)
+    heatmap = _heatmap_data(stats)
+    if heatmap:
+        periods, labels, values = heatmap
+        plt.figure(figsize=(10, max(4, 0.45 * len(periods) + 2)))
+        plt.imshow(values, aspect='auto', cmap='YlOrRd')
+        plt.colorbar(label='Number of Sites')
+        plt.xticks(range(len(labels)), labels, rotation=30, ha='right')
+        plt.yticks(range(len(periods)), periods)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                plt.text(j, i, str(value), ha='center', va='center', fontsize=8)
+        plt.title('Burned Rock Classes and Burned Clay by Time Period')
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, 'class_period_heatmap.png'))
+        plt.close()
 
-def write_text_report(stats, output_dir):
-    report_path = os.path.join(output_dir, 'Burned_Rock_Analysis_Report.txt')
-    print(f"Writing report to {report_path}...")
-    
+
+def _ci(stats, key):
+    interval = stats.get('intervals', {}).get(key)
+    if interval is None:
+        return ""
+    return f" [95% CI {interval[0]:.0f}-{interval[1]:.0f}]"
+
+def _period_ci(stats, period):
+    interval = stats.get('period_intervals', {}).get(period)
+    if interval is None:
+        return ""
+    return f" [95% CI {interval[0]:.0f}-{interval[1]:.0f}]"
+
+def _ratio_ci(stats, key):
+    ratio = stats.get('ratio_intervals', {}).get(key)
+    if ratio is None:
+        return ""
+    return f" [95% CI {ratio[1]*100:.1f}-{ratio[2]*100:.1f}%]"
+
+def _top_period(stats):
+    """The individual time period with the most sites ('; '-joined fields split when NumPy is available)."""
+    matrix = stats.get('period_matrix')
+    if matrix and matrix['periods']:
+        return matrix['periods'][0]
+    top = stats['time_periods'].most_common(1)
+    return top[0][0] if top else ''
+
+def format_text_report(stats):
     total = stats['total']
     if total == 0: total = 1 
     
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write("BURNED ROCK ANALYSIS REPORT\n")
-        f.write("===========================\n\n")
-        
-        f.write("1. DATASET OVERVIEW\n")
-        f.write(f"   - Total Sites Processed: {stats['total']}\n")
-        f.write(f"   - Sites with Prehistoric Evidence: {stats['prehistoric']} ({stats['prehistoric']/total*100:.1f}%)\n\n")
-        
-        f.write("2. BURNED ROCK CLASSIFICATION RESULTS\n")
-        f.write(f"   - Class 1 (Scatters): {stats['c1']} sites ({stats['c1']/total*100:.1f}%)\n")
-        f.write(f"   - Class 2 (Hearths):  {stats['c2']} sites ({stats['c2']/total*100:.1f}%)\n")
-        f.write(f"   - Class 3 (Ovens):    {stats['c3']} sites ({stats['c3']/total*100:.1f}%)\n\n")
-        
-        f.write("3. FEATURE ISOLATION (Sites containing ONLY one type)\n")
-        f.write(f"   - Pure Scatters (Class 1 only): {stats['c1_only']}\n")
-        f.write(f"   - Discrete Hearths (Class 2 only): {stats['c2_only']}\n")
-        f.write(f"   - Discrete Ovens (Class 3 only): {stats['c3_only']}\n")
-        if stats['c3'] > 0:
-            c3_discrete_pct = stats['c3_only'] / stats['c3'] * 100
-            f.write(f"     * Observation: {c3_discrete_pct:.1f}% of Class 3 features appear without associated scatters or hearths description.\n\n")
-        else:
-            f.write("\n")
+    f = io.StringIO()
+    f.write("BURNED ROCK ANALYSIS REPORT\n")
+    f.write("===========================\n\n")
 
-        f.write("4. TEMPORAL ANALYSIS (Top 25 Identified Groups)\n")
-        f.write("   --------------------------------------------\n")
-        for period, count in stats['time_periods'].most_common(25):
-            pct = (count / total) * 100
-            f.write(f"   - {period}: {count} ({pct:.1f}%)\n")
+    sample = stats.get('sample')
+    if sample:
+        classified = ", classified on the fly" if sample['classified'] else ""
+        f.write(f"   SAMPLED ESTIMATE: {sample['size']} of {sample['population']} rows ({sample['method']}{classified}).\n")
+        f.write("   Counts are scaled to the full file; brackets give 95% confidence intervals.\n\n")
+    
+    f.write("1. DATASET OVERVIEW\n")
+    f.write(f"   - Total Sites Processed: {stats['total']}\n")
+    f.write(f"   - Sites with Prehistoric Evidence: {stats['prehistoric']} ({stats['prehistoric']/total*100:.1f}%){_ci(stats, 'prehistoric')}\n\n")
+    
+    f.write("2. BURNED ROCK CLASSIFICATION RESULTS\n")
+    f.write(f"   - Class 1 (Scatters): {stats['c1']} sites ({stats['c1']/total*100:.1f}%){_ci(stats, 'c1')}\n")
+    f.write(f"   - Class 2 (Hearths):  {stats['c2']} sites ({stats['c2']/total*100:.1f}%){_ci(stats, 'c2')}\n")
+    f.write(f"   - Class 3 (Ovens):    {stats['c3']} sites ({stats['c3']/total*100:.1f}%){_ci(stats, 'c3')}\n\n")
+    
+    f.write("3. FEATURE ISOLATION (Sites containing ONLY one type)\n")
+    f.write(f"   - Pure Scatters (Class 1 only): {stats['c1_only']}{_ci(stats, 'c1_only')}\n")
+    f.write(f"   - Discrete Hearths (Class 2 only): {stats['c2_only']}{_ci(stats, 'c2_only')}\n")
+    f.write(f"   - Discrete Ovens (Class 3 only): {stats['c3_only']}{_ci(stats, 'c3_only')}\n")
+    if stats['c3'] > 0:
+        c3_discrete_pct = stats['c3_only'] / stats['c3'] * 100
+        f.write(f"     * Observation: {c3_discrete_pct:.1f}%{_ratio_ci(stats, 'c3_only')} of Class 3 features appear without associated scatters or hearths description.\n\n")
+    else:
         f.write("\n")
 
-        f.write("5. CULTURAL OBSERVATIONS\n")
-        f.write(f"   - Prehistoric Class 3 Sites: {stats['c3_prehistoric']}\n")
-        f.write(f"   - Potential Historic/Unclassified Class 3 Sites: {stats['c3_historic_only']}\n")
-        
-        f.write("\n6. BURNED CLAY ANALYSIS\n")
-        f.write(f"   - Total Sites with Burned Clay: {stats['burned_clay']}\n")
-        f.write(f"   - Burned Clay ONLY (No Burned Rock): {stats['burned_clay_only']}\n")
-        if stats['burned_clay'] > 0:
-            bc_total = stats['burned_clay']
-            f.write(f"   - Co-occurrence with Class 1 (Scatters): {stats['bc_with_c1']} ({stats['bc_with_c1']/bc_total*100:.1f}%)\n")
-            f.write(f"   - Co-occurrence with Class 2 (Hearths): {stats['bc_with_c2']} ({stats['bc_with_c2']/bc_total*100:.1f}%)\n")
-            f.write(f"   - Co-occurrence with Class 3 (Ovens): {stats['bc_with_c3']} ({stats['bc_with_c3']/bc_total*100:.1f}%)\n")
-            f.write(f"   - Burned Clay in Prehistoric Context: {stats['bc_prehistoric']} ({stats['bc_prehistoric']/bc_total*100:.1f}%)\n")
-        else:
-            f.write("   - No Burned Clay sites identified.\n")
+    f.write("4. TEMPORAL ANALYSIS (Top 25 Identified Groups)\n")
+    f.write("   --------------------------------------------\n")
+    for period, count in stats['time_periods'].most_common(25):
+        pct = (count / total) * 100
+        f.write(f"   - {period}: {count} ({pct:.1f}%){_period_ci(stats, period)}\n")
+    f.write("\n")
 
-        f.write("\n7. KEY FINDINGS & RECOMMENDATIONS\n")
-        
-        # Dynamic Observations
-        if stats['c1'] > stats['c2'] and stats['c1'] > stats['c3']:
-            f.write("   - PREVALENCE: Dispersed scatters (Class 1) are the most common manifestation of burned rock in this dataset.\n")
-            
-        if stats['c3_historic_only'] > stats['c3_prehistoric']:
-             f.write("   - POTENTIAL BIAS: A majority of Class 3 (Oven) sites do NOT contain explicit prehistoric keywords.\n")
-             f.write("     * Recommendation: Review 'Class 3' sites manually to ensure Historic trash pits or fireplaces are not being misclassified.\n")
-        else:
-             f.write("   - PREHISTORIC CONTEXT: A majority of Class 3 sites contain prehistoric evidence, supporting the classification of earth ovens.\n")
-             
-        if stats['c2'] < stats['c3']:
-             f.write("   - FEATURE VISIBILITY: 'Ovens' (Class 3) are reported more frequently than 'Hearths' (Class 2).\n")
-             f.write("     * This may indicate that large features (middens/mounds) are more easily identified during survey than smaller hearth features.\n")
-             
-        f.write("\n   - NEXT STEPS:\n")
-        f.write("     * Use ArcPro to plot 'Class 3' sites. Perform a Hot Spot Analysis to identify intensive processing zones.\n")
-        f.write("     * Filter the dataset using the 'Is_Prehistoric' column to create a clean prehistoric distribution map.\n")
+    f.write("5. CULTURAL OBSERVATIONS\n")
+    f.write(f"   - Prehistoric Class 3 Sites: {stats['c3_prehistoric']}{_ci(stats, 'c3_prehistoric')}\n")
+    f.write(f"   - Potential Historic/Unclassified Class 3 Sites: {stats['c3_historic_only']}{_ci(stats, 'c3_historic_only')}\n")
+    
+    f.write("\n6. BURNED CLAY ANALYSIS\n")
+    f.write(f"   - Total Sites with Burned Clay: {stats['burned_clay']}{_ci(stats, 'burned_clay')}\n")
+    f.write(f"   - Burned Clay ONLY (No Burned Rock): {stats['burned_clay_only']}{_ci(stats, 'burned_clay_only')}\n")
+    if stats['burned_clay'] > 0:
+        bc_total = stats['burned_clay']
+        f.write(f"   - Co-occurrence with Class 1 (Scatters): {stats['bc_with_c1']} ({stats['bc_with_c1']/bc_total*100:.1f}%){_ratio_ci(stats, 'bc_with_c1')}\n")
+        f.write(f"   - Co-occurrence with Class 2 (Hearths): {stats['bc_with_c2']} ({stats['bc_with_c2']/bc_total*100:.1f}%){_ratio_ci(stats, 'bc_with_c2')}\n")
+        f.write(f"   - Co-occurrence with Class 3 (Ovens): {stats['bc_with_c3']} ({stats['bc_with_c3']/bc_total*100:.1f}%){_ratio_ci(stats, 'bc_with_c3')}\n")
+        f.write(f"   - Burned Clay in Prehistoric Context: {stats['bc_prehistoric']} ({stats['bc_prehistoric']/bc_total*100:.1f}%){_ratio_ci(stats, 'bc_prehistoric')}\n")
+    else:
+        f.write("   - No Burned Clay sites identified.\n")
 
-def write_methodology_report(output_dir):
-    report_path = os.path.join(output_dir, 'Methodology_Summary.txt')
-    print(f"Writing methodology summary to {report_path}...")
+    # Sections after 6 are optional, so they are numbered as they are written
+    section = 7
+    spatial = stats.get('spatial')
+    if spatial and spatial['nearest']:
+        names = dict(SPATIAL_CLASSES)
+        units = spatial['units']
+        f.write(f"\n{section}. SPATIAL CO-OCCURRENCE (Nearest Neighbour)\n")
+        section += 1
+        f.write(f"   - Sites with coordinates: {spatial['sites']}\n")
+        for (src, dst), nn in spatial['nearest'].items():
+            f.write(f"   - {names[src]} -> nearest {names[dst]}: median {nn['median']:.0f} {units}, mean {nn['mean']:.0f} {units} (n={nn['n']})\n")
+        for (src, dst, radius), within in spatial['within'].items():
+            pct = within['with_any'] / within['n'] * 100
+            f.write(f"   - {names[src]} sites with a {names[dst]} site within {radius:g} {units}: {within['with_any']} ({pct:.1f}%), avg {within['mean_count']:.2f} neighbours\n")
+
+    groups = stats.get('groups')
+    if groups:
+        label = stats['group_by']
+        width = max(len(label), *(len(str(key)) for key in groups))
+        f.write(f"\n{section}. RESULTS BY {label.upper()}\n")
+        section += 1
+        f.write(f"   {label:<{width}}  {'Sites':>7}  {'Prehist.':>8}  {'Class 1':>7}  {'Class 2':>7}  {'Class 3':>7}  {'B. Clay':>7}  Top Time Period\n")
+        for key, group in groups.items():
+            f.write(f"   {key:<{width}}  {group['total']:>7}  {group['prehistoric']:>8}  {group['c1']:>7}  {group['c2']:>7}  "
+                    f"{group['c3']:>7}  {group['burned_clay']:>7}  {_top_period(group)}\n")
+
+    f.write(f"\n{section}. KEY FINDINGS & RECOMMENDATIONS\n")
     
+    # Dynamic Observations
+    if stats['c1'] > stats['c2'] and stats['c1'] > stats['c3']:
+        f.write("   - PREVALENCE: Dispersed scatters (Class 1) are the most common manifestation of burned rock in this dataset.\n")
+        
+    if stats['c3_historic_only'] > stats['c3_prehistoric']:
+         f.write("   - POTENTIAL BIAS: A majority of Class 3 (Oven) sites do NOT contain explicit prehistoric keywords.\n")
+         f.write("     * Recommendation: Review 'Class 3' sites manually to ensure Historic trash pits or fireplaces are not being misclassified.\n")
+    else:
+         f.write("   - PREHISTORIC CONTEXT: A majority of Class 3 sites contain prehistoric evidence, supporting the classification of earth ovens.\n")
+         
+    if stats['c2'] < stats['c3']:
+         f.write("   - FEATURE VISIBILITY: 'Ovens' (Class 3) are reported more frequently than 'Hearths' (Class 2).\n")
+         f.write("     * This may indicate that large features (middens/mounds) are more easily identified during survey than smaller hearth features.\n")
+         
+    f.write("\n   - NEXT STEPS:\n")
+    f.write("     * Use ArcPro to plot 'Class 3' sites. Perform a Hot Spot Analysis to identify intensive processing zones.\n")
+    f.write("     * Filter the dataset using the 'Is_Prehistoric' column to create a clean prehistoric distribution map.\n")
+    return f.getvalue()
+
+def write_text_report(stats, output_dir):
+    report_path = os.path.join(output_dir, 'Burned_Rock_Analysis_Report.txt')
+    print(f"Writing report to {report_path}...")
+
     with open(report_path, 'w', encoding='utf-8') as f:
-        f.write("""# Burned Rock Analysis - Methodology Summary
+        f.write(format_text_report(stats))
+
+def _json_safe(value):
+    if isinstance(value, Counter):
+        return {str(key): count for key, count in value.most_common()}
+    if isinstance(value, dict):
+        return {('|'.join(str(k) for k in key) if isinstance(key, tuple) else str(key)): _json_safe(v)
+                for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if hasattr(value, 'item'):  # NumPy scalars
+        return value.item()
+    return value
+
+def report_data(stats):
+    """The aggregate statistics as JSON-safe data (per-site coordinates are left out)."""
+    return _json_safe({key: value for key, value in stats.items() if key != 'sites_xy'})
+
+def _report_sections(text):
+    """Splits the text report into header lines and ("N. TITLE", body) sections."""
+    header, sections = [], []
+    for line in text.splitlines()[2:]:
+        if line[:1].isdigit() and '. ' in line:
+            sections.append((line, []))
+        elif sections:
+            sections[-1][1].append(line)
+        elif line.strip():
+            header.append(line.strip())
+    return header, [(title, '\n'.join(lines).strip('\n')) for title, lines in sections]
+
+def write_html_report(stats, output_dir):
+    """One self-contained HTML page: text report sections, SVG charts, methodology and the aggregates as JSON."""
+    report_path = os.path.join(output_dir, 'Burned_Rock_Report.html')
+    print(f"Writing HTML report to {report_path}...")
+
+    header, sections = _report_sections(format_text_report(stats))
+    figures = [(title, svg) for _, title, svg in svg_charts(stats)]
+    page = svg_report.html_page('Burned Rock Analysis Report', header, sections, figures, report_data(stats),
+                                appendix=('Methodology Summary', METHODOLOGY_TEXT))
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(page)
+
+def write_keyword_report(stats, output_dir):
+    report_path = os.path.join(output_dir, 'Keyword_Hits.csv')
+    print(f"Writing keyword hit counts to {report_path}...")
+
+    with open(report_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Column', 'Keyword', 'Sites'])
+        for col, hits in stats.get('keyword_hits', {}).items():
+            for kw, count in hits.most_common():
+                writer.writerow([col, kw, count])
+
+def write_period_matrices(stats, output_dir):
+    matrix = stats.get('period_matrix')
+    if not matrix:
+        return
+
+    for filename, row_defs in (('Class_Period_Matrix.csv', CLASS_MATRIX_ROWS),
+                               ('Burned_Clay_Period_Matrix.csv', BURNED_CLAY_MATRIX_ROWS)):
+        report_path = os.path.join(output_dir, filename)
+        print(f"Writing period matrix to {report_path}...")
+        labels = [label for label, _ in row_defs]
+        with open(report_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Time_Period', 'Sites'] + labels)
+            for i, period in enumerate(matrix['periods']):
+                writer.writerow([period, matrix['sites'][i]] + [matrix['rows'][label][i] for label in labels])
+
+def write_group_report(stats, output_dir):
+    """<Group>_Summary.csv (every count per group) and <Group>_Period_Matrix.csv (class x period per group)."""
+    groups = stats.get('groups')
+    if not groups:
+        return
+
+    label = stats['group_by']
+    name = re.sub(r'\W+', '_', label).strip('_') or 'Group'
+    report_path = os.path.join(output_dir, f'{name}_Summary.csv')
+    print(f"Writing {label} summary to {report_path}...")
+    with open(report_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([label, 'Sites'] + [header for _, header in GROUP_SUMMARY_FIELDS] + ['Top_Time_Period'])
+        for key, group in groups.items():
+            writer.writerow([key, group['total']] + [group[field] for field, _ in GROUP_SUMMARY_FIELDS]
+                            + [_top_period(group)])
+
+    report_path = os.path.join(output_dir, f'{name}_Period_Matrix.csv')
+    print(f"Writing {label} period matrix to {report_path}...")
+    labels = [row_label for row_label, _ in CLASS_MATRIX_ROWS + BURNED_CLAY_MATRIX_ROWS]
+    with open(report_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([label, 'Time_Period', 'Sites'] + labels)
+        for key, group in groups.items():
+            matrix = group.get('period_matrix')
+            if not matrix:
+                continue
+            for i, period in enumerate(matrix['periods']):
+                writer.writerow([key, period, matrix['sites'][i]] + [matrix['rows'][row_label][i] for row_label in labels])
+
+METHODOLOGY_TEXT = """# Burned Rock Analysis - Methodology Summary
 
 ## 1. Data Preparation (`process_sites.py`)
 The raw CSV export from ArcPro/Database often contains text fields with formatting issues (embedded newlines, quotes) or Windows-specific limitations (integer overflow on field size). The processing step performs the following:
 - **Field Concatenation:** Combines relevant descriptive text fields (e.g., `Site_Description`, `Features`, `Artifacts`) into a single searchable text block (`Concat_site_variables`).
 - **Sanitization:** Removes hidden characters (carriage returns), replaces smart quotes with standard quotes, and ensures `utf-8` encoding.
 - **Handling Limits:** Automatically adjusts the CSV field size limit to handle extremely large text descriptions.
+- **Data Profile (optional):** With `--profile`, every column's fill rate, skipped ("No Data") rate, lengths, approximate distinct count and top values are recorded in the same pass and compared with the previous export's profile, flagging fields that suddenly empty out or look truncated.
 
 ## 2. Classification Logic (`classify_sites.py`)
 The core classification uses a **Keyword-Driven Approach** supplemented by **Robust Validation Rules** to ensure accuracy.
@@ -280,35 +937,53 @@ Time periods are determined using a hierarchical two-step process to ensure maxi
 
 **Hierarchy of Specificity:**
 The system prioritizes specific labels (e.g., "Paleoindian - Early") over general ones ("Paleoindian").
+When both are found, the general label is dropped, so a site mentioning "Paleoindian" and "Clovis" is reported only as "Paleoindian - Early".
 
 ## 3. Reporting (`generate_report.py`)
 The final step aggregates the site-level data to produce:
 - **Statistical Summary:** Counts and percentages for all classes and time periods.
+- **Keyword Hits:** How many sites each keyword triggered, per keyword column (`Keyword_Hits.csv`).
 - **Co-occurrence Analysis:** How often Burned Clay appears with each rock class.
-- **Visualizations:** Bar charts for class distribution and time periods, and pie charts for prehistoric context.
-""")
+- **Class x Period Matrices:** Site counts for each class and for burned clay in every individual time period (`Class_Period_Matrix.csv`, `Burned_Clay_Period_Matrix.csv`, `class_period_heatmap.png`). A site listing several periods counts towards each of them.
+- **Grouped Statistics (optional):** With `--by-county` (the county code of the trinomial, e.g. `41AN`) or `--group-by COLUMN`, every statistic above is also counted per group in the same pass (`County_Summary.csv`, `County_Period_Matrix.csv` and a section of the text report). Each group only holds counters, so memory grows with the number of groups, not the number of rows.
+- **Spatial Co-occurrence:** When the export has coordinate columns, the distance from each class's sites to the nearest site of every other class, and how many lie within fixed radii (e.g. Class 2 hearths within 1 km of Class 3 ovens).
+- **Visualizations:** Bar charts for class distribution and time periods, and pie charts for prehistoric context. PNG files with matplotlib; without it (or with `--charts svg`) the same charts are written as SVG using only the standard library.
+- **HTML Report:** `Burned_Rock_Report.html` is a single self-contained page with the text report sections, the charts as inline SVG, this summary and the aggregate counts as embedded JSON.
+- **Sampled Estimates (optional):** With `--sample N` or `--sample-fraction p`, a random sample of rows (optionally stratified by county) is counted instead and every figure in the text report is scaled to the full file with a 95% confidence interval. With `--classify-sample`, only the sampled rows of an unclassified export are classified. Spatial co-occurrence and the class x period matrices are full-run only.
+"""
+
+def write_methodology_report(output_dir):
+    report_path = os.path.join(output_dir, 'Methodology_Summary.txt')
+    print(f"Writing methodology summary to {report_path}...")
+    
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(METHODOLOGY_TEXT)
 
-def main(input_file=DEFAULT_INPUT_FILE):
+def main(input_file=None, radii=None, sample_size=None, sample_fraction=None, stratify=False, seed=None,
+         classify_sample=False, charts='auto', group_by=None, units='auto'):
     print("--- Burned Rock Analysis Tool ---")
 
     # Priority:
     # 1. Command line argument
     # 2. Environment variable
     # 3. Default relative path
-
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    elif os.environ.get('BURNED_ROCK_INPUT_FILE'):
-        input_file = os.environ['BURNED_ROCK_INPUT_FILE']
-    else:
-        input_file = DEFAULT_INPUT_FILE
+    if input_file is None:
+        input_file = os.environ.get('BURNED_ROCK_INPUT_FILE', DEFAULT_INPUT_FILE)
     
     ensure_dir(REPORT_DIR)
     
-    stats = analyze_data(input_file)
+    if sample_size is not None or sample_fraction is not None:
+        stats = analyze_sample(input_file, sample_size, sample_fraction, stratify, seed, classify_sample)
+    else:
+        stats = analyze_data(input_file, group_by)
+    analyze_spatial(stats, radii, units)
     write_text_report(stats, REPORT_DIR)
+    write_keyword_report(stats, REPORT_DIR)
+    write_period_matrices(stats, REPORT_DIR)
+    write_group_report(stats, REPORT_DIR)
     write_methodology_report(REPORT_DIR)
-    generate_charts(stats, REPORT_DIR)
+    generate_charts(stats, REPORT_DIR, charts)
+    write_html_report(stats, REPORT_DIR)
     
     print(f"\nAnalysis complete. Report and charts saved to: {os.path.abspath(REPORT_DIR)}")
 
@@ -316,6 +991,37 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Generate reports and charts from classified site data.")
     parser.add_argument("input", nargs="?", default=DEFAULT_INPUT_FILE, help="Path to the input classified CSV file.")
+    parser.add_argument("--radius", type=float, nargs="+", default=DEFAULT_NEIGHBOR_RADII,
+                        help="Neighbour search radii for spatial co-occurrence (metres for lat/long exports, coordinate units otherwise).")
+    sample_group = parser.add_mutually_exclusive_group()
+    sample_group.add_argument("--sample", type=int, metavar="N",
+                              help="Estimate the report from a random sample of N rows instead of reading every row.")
+    sample_group.add_argument("--sample-fraction", type=float, metavar="P",
+                              help="Estimate the report from a random sample of this fraction of the rows (0-1).")
+    parser.add_argument("--stratify-county", action="store_true",
+                        help="Sample each county (trinomial prefix) in proportion to its size.")
+    parser.add_argument("--seed", type=int, help="Random seed for a reproducible sample.")
+    parser.add_argument("--classify-sample", action="store_true",
+                        help="Input is an unclassified export: classify only the sampled rows.")
+    group_options = parser.add_mutually_exclusive_group()
+    group_options.add_argument("--by-county", dest="group_by", action="store_const", const=COUNTY_GROUP,
+                               help="Also report every statistic per county (trinomial prefix, e.g. 41AN).")
+    group_options.add_argument("--group-by", metavar="COLUMN",
+                               help="Also report every statistic per value of this column ('county' = trinomial county).")
+    parser.add_argument("--units", choices=['auto', 'projected', 'degrees'], default='auto',
+                        help="Coordinate units: 'degrees' (projected to metres), 'projected', or 'auto' (lat/long column "
+                             "names, or every value within +/-180 / +/-90, means degrees).")
+    parser.add_argument("--charts", choices=['auto', 'matplotlib', 'svg'], default='auto',
+                        help="Chart backend: PNG via matplotlib, or dependency-free SVG (default: matplotlib if installed).")
     args = parser.parse_args()
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample must be at least 1")
+    if args.sample_fraction is not None and not 0 < args.sample_fraction <= 1:
+        parser.error("--sample-fraction must be in (0, 1]")
+    if (args.stratify_county or args.classify_sample) and args.sample is None and args.sample_fraction is None:
+        parser.error("--stratify-county and --classify-sample need --sample or --sample-fraction")
+    if args.group_by and (args.sample is not None or args.sample_fraction is not None):
+        parser.error("--by-county and --group-by need a full run (no --sample or --sample-fraction)")
 
-    main(args.input)
+    main(args.input, args.radius, args.sample, args.sample_fraction, args.stratify_county, args.seed,
+         args.classify_sample, args.charts, args.group_by, args.units)
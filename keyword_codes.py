@@ -0,0 +1,56 @@
+import json
+from collections import Counter
+
+# Sidecar written next to a classified CSV whose keyword columns hold bitmasks
+SIDECAR_SUFFIX = '.keywords.json'
+SIDECAR_VERSION = 1
+
+KEYWORD_COLUMNS = ['Class_1_Keywords', 'Class_2_Keywords', 'Class_3_Keywords', 'Prehistoric_Evidence']
+
+def sidecar_path(csv_path):
+    return csv_path + SIDECAR_SUFFIX
+
+def build_bit_index(keywords):
+    """Maps each keyword of a sorted dictionary list to its bit."""
+    return {kw: 1 << i for i, kw in enumerate(keywords)}
+
+def encode_keywords(keywords, bit_index):
+    mask = 0
+    for kw in keywords:
+        mask |= bit_index[kw]
+    return mask
+
+def decode_keywords(mask, keywords):
+    """Returns the keywords whose bits are set in `mask`, in dictionary order."""
+    mask = int(mask)
+    decoded = []
+    while mask:
+        low = mask & -mask
+        decoded.append(keywords[low.bit_length() - 1])
+        mask ^= low
+    return decoded
+
+def write_sidecar(path, dictionary):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': SIDECAR_VERSION, 'columns': dictionary}, f, indent=4)
+
+def load_sidecar(path):
+    """Returns {column: [keyword, ...]} from a keyword sidecar file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != SIDECAR_VERSION:
+        raise ValueError(f"Unsupported keyword sidecar version in {path}: {data.get('version')}")
+    return data['columns']
+
+def count_mask_bits(mask_counts, keywords):
+    """
+    Turns a Counter of {mask: sites} into per-keyword site counts. Distinct
+    masks are few, so each is decomposed once with bit operations.
+    """
+    hits = Counter()
+    for mask, count in mask_counts.items():
+        while mask:
+            low = mask & -mask
+            hits[keywords[low.bit_length() - 1]] += count
+            mask ^= low
+    return hits
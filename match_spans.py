@@ -0,0 +1,111 @@
+import json
+import struct
+
+# Binary sidecars written next to a classified CSV with --match-spans:
+#   <csv>.spans      magic, then each row's span records back to back
+#   <csv>.spans.idx  one little-endian uint64 per row: where its spans start
+#                    in .spans, plus a final end offset
+#   <csv>.spans.json keyword and class dictionaries
+SPANS_SUFFIX = '.spans'
+INDEX_SUFFIX = '.spans.idx'
+DICTIONARY_SUFFIX = '.spans.json'
+SPANS_VERSION = 1
+MAGIC = b'BRSPANS1'
+
+# Match outcomes
+ACCEPTED, NEGATED, EXCLUDED, DEPENDENCY = 0, 1, 2, 3
+OUTCOME_NAMES = ['accepted', 'negated', 'excluded', 'dependency']
+
+# Class ids: 0 is the rock material check behind the Class 2 dependency
+CLASS_NAMES = ['Rock Material', 'Class 1', 'Class 2', 'Class 3']
+
+# keyword id, class id, outcome, start, end (offsets into Normalized_Text)
+RECORD = struct.Struct('<HBBII')
+OFFSET = struct.Struct('<Q')
+
+def spans_path(csv_path):
+    return csv_path + SPANS_SUFFIX
+
+def index_path(csv_path):
+    return csv_path + INDEX_SUFFIX
+
+def dictionary_path(csv_path):
+    return csv_path + DICTIONARY_SUFFIX
+
+class SpanWriter:
+    """
+    Appends the spans of each output row in order. Spans are
+    (class id, keyword, start, end, outcome) tuples as collected by
+    SiteClassifier.find_classes_robust.
+    """
+    def __init__(self, csv_path, keywords):
+        self.keywords = sorted(keywords)
+        self.keyword_ids = {kw: i for i, kw in enumerate(self.keywords)}
+        with open(dictionary_path(csv_path), 'w', encoding='utf-8') as f:
+            json.dump({'version': SPANS_VERSION, 'keywords': self.keywords,
+                       'classes': CLASS_NAMES, 'outcomes': OUTCOME_NAMES}, f, indent=4)
+        self.data = open(spans_path(csv_path), 'wb')
+        self.index = open(index_path(csv_path), 'wb')
+        self.data.write(MAGIC)
+        self.offset = len(MAGIC)
+        self.rows = 0
+
+    def write_row(self, spans):
+        self.index.write(OFFSET.pack(self.offset))
+        ids = self.keyword_ids
+        packed = b''.join(RECORD.pack(ids[kw], class_id, outcome, start, end)
+                          for class_id, kw, start, end, outcome in sorted(spans, key=lambda s: (s[2], s[0], s[1])))
+        self.data.write(packed)
+        self.offset += len(packed)
+        self.rows += 1
+
+    def close(self):
+        self.index.write(OFFSET.pack(self.offset))
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SpanReader:
+    """Random access to the spans of any row: two seeks and two reads."""
+    def __init__(self, csv_path):
+        with open(dictionary_path(csv_path), 'r', encoding='utf-8') as f:
+            dictionary = json.load(f)
+        if dictionary.get('version') != SPANS_VERSION:
+            raise ValueError(f"Unsupported match span sidecar version in {csv_path}: {dictionary.get('version')}")
+        self.keywords = dictionary['keywords']
+        self.data = open(spans_path(csv_path), 'rb')
+        self.index = open(index_path(csv_path), 'rb')
+        if self.data.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{spans_path(csv_path)} is not a match span file")
+        self.index.seek(0, 2)
+        self.rows = self.index.tell() // OFFSET.size - 1
+
+    def raw_spans(self, row):
+        """[(keyword id, class id, outcome, start, end)] for a 0-based data row."""
+        if not 0 <= row < self.rows:
+            raise IndexError(f"Row {row} is outside the span index (0-{self.rows - 1})")
+        self.index.seek(row * OFFSET.size)
+        start, end = struct.unpack('<QQ', self.index.read(2 * OFFSET.size))
+        self.data.seek(start)
+        return list(RECORD.iter_unpack(self.data.read(end - start)))
+
+    def spans(self, row):
+        """Decoded spans of a row: dicts with keyword, class, outcome, start and end."""
+        return [{'keyword': self.keywords[kw_id], 'class': CLASS_NAMES[class_id],
+                 'outcome': OUTCOME_NAMES[outcome], 'start': start, 'end': end}
+                for kw_id, class_id, outcome, start, end in self.raw_spans(row)]
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,356 @@
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+import itertools
+import numpy as np
+import csv_utils_helpers
+import classify_sites
+
+# Increase CSV field size limit to handle large fields
+csv_utils_helpers.increase_csv_field_size_limit()
+
+DEFAULT_INPUT_FILE = classify_sites.OUTPUT_FILE
+DEFAULT_LABELS_FILE = 'expert_classified.csv'
+DEFAULT_MODEL_FILE = 'prehistoric_model.npz'
+DEFAULT_TEXT_COLUMN = 'Normalized_Text'
+
+# Written right after the rule-based Is_Prehistoric flag
+SCORE_COLUMN = 'Prehistoric_Score'
+FLAG_COLUMN = 'Is_Prehistoric'
+
+MODEL_VERSION = 1
+
+# Features are word unigrams and bigrams hashed into 2**HASH_BITS weights
+DEFAULT_HASH_BITS = 18
+DEFAULT_NGRAMS = 2
+
+# Full-batch Adam on the L2-regularized log loss
+DEFAULT_EPOCHS = 300
+DEFAULT_LEARNING_RATE = 0.05
+DEFAULT_L2 = 1e-4
+DEFAULT_HOLDOUT = 0.2
+
+# Rows vectorized and scored together
+BATCH_ROWS = 20000
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Word hash base; odd, so it has an inverse mod 2**64
+_P = np.uint64(0x100000001B3)
+_P_INVERSE = np.uint64(pow(0x100000001B3, -1, 1 << 64))
+
+class HashingVectorizer:
+    """
+    Maps normalized texts (space-separated tokens, like Normalized_Text) to
+    hashed word n-gram features without a Python loop over tokens. Word
+    hashes are polynomial hashes of the word bytes mod 2**64, taken from a
+    running prefix sum over the whole batch; n-grams combine them with the
+    multiply-xor mix used by synonym_miner. Each document's n-gram counts
+    are scaled by 1/sqrt(its n-gram total) so long descriptions do not
+    saturate the score.
+    """
+    def __init__(self, hash_bits=DEFAULT_HASH_BITS, ngrams=DEFAULT_NGRAMS):
+        self.hash_bits = hash_bits
+        self.ngrams = ngrams
+        self.n_features = 1 << hash_bits
+        self._powers = np.ones(1, dtype=np.uint64)
+        self._inverse_powers = np.ones(1, dtype=np.uint64)
+
+    def _grow_powers(self, length):
+        # P**i and P**-i for every byte position, extended as batches grow
+        if len(self._powers) >= length:
+            return
+        length = max(length, 2 * len(self._powers))
+        self._powers = np.ones(length, dtype=np.uint64)
+        self._inverse_powers = np.ones(length, dtype=np.uint64)
+        np.cumprod(np.full(length - 1, _P, dtype=np.uint64), out=self._powers[1:])
+        np.cumprod(np.full(length - 1, _P_INVERSE, dtype=np.uint64), out=self._inverse_powers[1:])
+
+    def word_hashes(self, texts):
+        """(hash of each word, row of each word) as uint64 and int64 arrays, in text order."""
+        data = np.frombuffer('\n'.join(texts).encode('utf-8'), dtype=np.uint8)
+        if not len(data):
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        newlines = np.flatnonzero(data == 10)
+        separator = np.ones(len(data) + 2, dtype=bool)
+        separator[1:-1] = data == 32
+        separator[newlines + 1] = True
+        starts = np.flatnonzero(separator[:-2] & ~separator[1:-1])
+        ends = np.flatnonzero(~separator[1:-1] & separator[2:]) + 1
+
+        self._grow_powers(len(data))
+        prefix = np.zeros(len(data) + 1, dtype=np.uint64)
+        np.cumsum(data * self._powers[:len(data)], out=prefix[1:])
+        hashes = (prefix[ends] - prefix[starts]) * self._inverse_powers[starts]
+        rows = np.searchsorted(newlines, starts)
+        return hashes, rows
+
+    def transform(self, texts):
+        """
+        (row index, feature id, value) arrays with one entry per n-gram
+        occurrence; a row's features are the sum of its entries.
+        """
+        hashes, word_rows = self.word_hashes(texts)
+        total = len(hashes)
+        rows, features = [], []
+        for n in range(1, self.ngrams + 1):
+            span = total - n + 1
+            if span <= 0:
+                continue
+            h = np.full(span, n, dtype=np.uint64)
+            for k in range(n):
+                h = (h ^ hashes[k:k + span]) * _MIX
+            h ^= h >> np.uint64(31)
+            # An n-gram must not span two documents
+            valid = word_rows[:span] == word_rows[n - 1:n - 1 + span]
+            rows.append(word_rows[:span][valid])
+            features.append((h[valid] & np.uint64(self.n_features - 1)).astype(np.int64))
+
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows = np.concatenate(rows)
+        features = np.concatenate(features)
+        totals = np.bincount(rows, minlength=len(texts))
+        return rows, features, 1.0 / np.sqrt(totals[rows])
+
+class PrehistoricModel:
+    """Logistic regression over hashed n-gram features."""
+    def __init__(self, hash_bits=DEFAULT_HASH_BITS, ngrams=DEFAULT_NGRAMS, text_column=DEFAULT_TEXT_COLUMN):
+        self.vectorizer = HashingVectorizer(hash_bits, ngrams)
+        self.text_column = text_column
+        self.weights = np.zeros(self.vectorizer.n_features, dtype=np.float32)
+        self.bias = 0.0
+
+    def predict_proba(self, texts):
+        """Probability that each normalized text describes a prehistoric site."""
+        rows, features, values = self.vectorizer.transform(texts)
+        return _sigmoid(np.bincount(rows, weights=self.weights[features] * values, minlength=len(texts)) + self.bias)
+
+    def fit(self, texts, labels, epochs=DEFAULT_EPOCHS, learning_rate=DEFAULT_LEARNING_RATE, l2=DEFAULT_L2):
+        """
+        Trains on the whole set each epoch (Adam steps). Only features seen
+        in training get non-zero weights. Returns the final training log loss.
+        """
+        n = len(texts)
+        y = np.asarray(labels, dtype=np.float64)
+        rows, features, values = self.vectorizer.transform(texts)
+        # Optimize only the weights of features present
+        used, local = np.unique(features, return_inverse=True)
+        w = np.zeros(len(used) + 1)
+        m = np.zeros_like(w)
+        v = np.zeros_like(w)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+        def probabilities():
+            return _sigmoid(np.bincount(rows, weights=w[local] * values, minlength=n) + w[-1])
+
+        for step in range(1, epochs + 1):
+            error = (probabilities() - y) / n
+            grad = np.empty_like(w)
+            grad[:-1] = np.bincount(local, weights=error[rows] * values, minlength=len(used)) + l2 * w[:-1]
+            grad[-1] = error.sum()
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            w -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        self.weights = np.zeros(self.vectorizer.n_features, dtype=np.float32)
+        self.weights[used] = w[:-1]
+        self.bias = float(w[-1])
+        return log_loss(probabilities(), y)
+
+    def save(self, path):
+        """Stores the non-zero weights only, as uint32 ids and float32 values."""
+        nonzero = np.flatnonzero(self.weights)
+        np.savez_compressed(path, version=MODEL_VERSION, hash_bits=self.vectorizer.hash_bits,
+                            ngrams=self.vectorizer.ngrams, text_column=self.text_column, bias=self.bias,
+                            ids=nonzero.astype(np.uint32), values=self.weights[nonzero])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['version']) != MODEL_VERSION:
+                raise ValueError(f"Unsupported prehistoric model version in {path}: {int(data['version'])}")
+            model = cls(int(data['hash_bits']), int(data['ngrams']), str(data['text_column']))
+            model.bias = float(data['bias'])
+            model.weights[data['ids'].astype(np.int64)] = data['values']
+        return model
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+def log_loss(p, y):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+def _is_true(value):
+    return str(value).strip().upper() == 'TRUE'
+
+def load_labels(labels_file):
+    """{trinomial: True/False} from the expert Is_Prehistoric column (blank rows and later duplicates skipped)."""
+    labels = {}
+    with open(labels_file, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        for row in csv.DictReader(f):
+            trinomial = (row.get('trinomial') or '').strip().upper()
+            flag = (row.get('Is_Prehistoric') or '').strip().upper()
+            if trinomial and trinomial not in labels and flag in ('TRUE', 'FALSE'):
+                labels[trinomial] = flag == 'TRUE'
+    return labels
+
+def _text_column(fieldnames, text_column, input_file):
+    if text_column in fieldnames:
+        return text_column
+    print(f"Warning: {input_file} has no '{text_column}' column; using uncorrected Concat_site_variables.")
+    return 'Concat_site_variables'
+
+def read_training_set(input_file, labels, text_column=DEFAULT_TEXT_COLUMN):
+    """
+    Normalized texts, expert labels and rule flags (None when the input has
+    no Is_Prehistoric column) of the labeled sites in `input_file`.
+    """
+    texts, y, flags = [], [], []
+    seen = set()
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames or []
+        if 'trinomial' not in fieldnames:
+            print(f"Error: {input_file} has no 'trinomial' column to join the expert labels on.")
+            sys.exit(1)
+        column = _text_column(fieldnames, text_column, input_file)
+        for row in reader:
+            trinomial = (row.get('trinomial') or '').strip().upper()
+            if trinomial not in labels or trinomial in seen:
+                continue
+            seen.add(trinomial)
+            text = row.get(column) or ''
+            texts.append(text if column == DEFAULT_TEXT_COLUMN else classify_sites.normalize_text(text))
+            y.append(labels[trinomial])
+            flags.append(_is_true(row[FLAG_COLUMN]) if FLAG_COLUMN in row else None)
+    return texts, np.array(y, dtype=bool), flags
+
+def train(input_file=DEFAULT_INPUT_FILE, labels_file=DEFAULT_LABELS_FILE, model_file=DEFAULT_MODEL_FILE,
+          hash_bits=DEFAULT_HASH_BITS, ngrams=DEFAULT_NGRAMS, epochs=DEFAULT_EPOCHS,
+          learning_rate=DEFAULT_LEARNING_RATE, l2=DEFAULT_L2, holdout=DEFAULT_HOLDOUT, seed=0,
+          text_column=DEFAULT_TEXT_COLUMN):
+    """
+    Trains on the labeled sites, reporting held-out accuracy next to the
+    rule flag's, then refits on every labeled site and saves the model.
+    Returns the saved model and the held-out metrics (empty without a holdout).
+    """
+    texts, y, flags = read_training_set(input_file, load_labels(labels_file), text_column)
+    if len(texts) < 2:
+        print(f"Error: Fewer than two sites in {input_file} have an Is_Prehistoric label in {labels_file}.")
+        sys.exit(1)
+    print(f"Training on {len(texts)} labeled sites ({int(y.sum())} prehistoric).")
+
+    metrics = {}
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    test_size = int(len(order) * holdout)
+    if test_size:
+        test, fit_rows = order[:test_size], order[test_size:]
+        model = PrehistoricModel(hash_bits, ngrams, text_column)
+        model.fit([texts[i] for i in fit_rows], y[fit_rows], epochs, learning_rate, l2)
+        p = model.predict_proba([texts[i] for i in test])
+        metrics = {'holdout': test_size, 'accuracy': float(np.mean((p >= 0.5) == y[test])),
+                   'log_loss': log_loss(p, y[test])}
+        line = f"Held-out {test_size} sites: model accuracy {metrics['accuracy']:.3f} (log loss {metrics['log_loss']:.3f})"
+        if flags[0] is not None:
+            metrics['rule_accuracy'] = float(np.mean(np.array([flags[i] for i in test]) == y[test]))
+            line += f", rule flag accuracy {metrics['rule_accuracy']:.3f}"
+        print(line + ".")
+
+    model = PrehistoricModel(hash_bits, ngrams, text_column)
+    loss = model.fit(texts, y, epochs, learning_rate, l2)
+    model.save(model_file)
+    print(f"Model trained on all {len(texts)} sites (log loss {loss:.3f}) saved to {model_file} "
+          f"({os.path.getsize(model_file)} bytes).")
+    return model, metrics
+
+def score_file(input_file, output_file, model, batch_rows=BATCH_ROWS):
+    """
+    Writes `input_file` to `output_file` with the model's probability in a
+    Prehistoric_Score column right after Is_Prehistoric (replacing an old
+    score column). The output may be the input: it is written to a temporary
+    file first. Returns (rows, rows per second of vectorizing and scoring).
+    """
+    tmp_path = output_file + '.tmp'
+    rows_done = 0
+    scoring_seconds = 0.0
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin, \
+            open(tmp_path, 'w', encoding='utf-8', newline='') as fout:
+        reader = csv.reader(fin)
+        header = next(reader, None) or []
+        column = _text_column(header, model.text_column, input_file)
+        text_index = header.index(column) if column in header else None
+        old_score = header.index(SCORE_COLUMN) if SCORE_COLUMN in header else None
+        base = [name for i, name in enumerate(header) if i != old_score]
+        insert_at = base.index(FLAG_COLUMN) + 1 if FLAG_COLUMN in base else len(base)
+
+        writer = csv.writer(fout)
+        writer.writerow(base[:insert_at] + [SCORE_COLUMN] + base[insert_at:])
+        while True:
+            batch = list(itertools.islice(reader, batch_rows))
+            if not batch:
+                break
+            start = time.perf_counter()
+            if text_index is None:
+                texts = [''] * len(batch)
+            elif column == DEFAULT_TEXT_COLUMN:
+                texts = [row[text_index] if text_index < len(row) else '' for row in batch]
+            else:
+                texts = [classify_sites.normalize_text(row[text_index]) if text_index < len(row) else '' for row in batch]
+            scores = model.predict_proba(texts)
+            scoring_seconds += time.perf_counter() - start
+
+            for row, score in zip(batch, scores):
+                if old_score is not None and old_score < len(row):
+                    del row[old_score]
+                writer.writerow(row[:insert_at] + [f"{score:.4f}"] + row[insert_at:])
+            rows_done += len(batch)
+    os.replace(tmp_path, output_file)
+    return rows_done, rows_done / scoring_seconds if scoring_seconds else 0.0
+
+def main(input_file=DEFAULT_INPUT_FILE, output_file=None, model_file=DEFAULT_MODEL_FILE, do_train=False,
+         labels_file=DEFAULT_LABELS_FILE, **train_options):
+    for path in [input_file] + ([labels_file] if do_train else []):
+        if not os.path.exists(path):
+            print(f"Error: Input file '{path}' not found.")
+            sys.exit(1)
+
+    if do_train:
+        model, _ = train(input_file, labels_file, model_file, **train_options)
+    else:
+        if not os.path.exists(model_file):
+            print(f"Error: Model file '{model_file}' not found. Train one with --train.")
+            sys.exit(1)
+        model = PrehistoricModel.load(model_file)
+
+    output_file = output_file or input_file
+    rows, rate = score_file(input_file, output_file, model)
+    print(f"Scored {rows} rows ({rate:,.0f} rows/s); {SCORE_COLUMN} written to {output_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learned Is_Prehistoric score from hashed word n-grams (NumPy logistic regression).")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT_FILE, help="Classified CSV to score (and train on).")
+    parser.add_argument("output", nargs="?", help="Scored CSV (default: rewrite the input).")
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE, help="Model file to load, or to save with --train.")
+    parser.add_argument("--train", action="store_true", help="Train on the sites labeled in --labels before scoring.")
+    parser.add_argument("--labels", default=DEFAULT_LABELS_FILE, help="Expert labels CSV (trinomial, Is_Prehistoric).")
+    parser.add_argument("--hash-bits", type=int, default=DEFAULT_HASH_BITS, help="Hashed feature space is 2**N weights.")
+    parser.add_argument("--ngrams", type=int, default=DEFAULT_NGRAMS, help="Longest word n-gram used as a feature.")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS, help="Full passes over the training set.")
+    parser.add_argument("--learning-rate", type=float, default=DEFAULT_LEARNING_RATE, help="Adam step size.")
+    parser.add_argument("--l2", type=float, default=DEFAULT_L2, help="L2 penalty on the weights.")
+    parser.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT,
+                        help="Fraction of labeled sites held out to report accuracy before the final fit (0 skips).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the holdout split.")
+    args = parser.parse_args()
+
+    options = {}
+    if args.train:
+        options = dict(hash_bits=args.hash_bits, ngrams=args.ngrams, epochs=args.epochs, learning_rate=args.learning_rate,
+                       l2=args.l2, holdout=args.holdout, seed=args.seed)
+    main(args.input, args.output, args.model, args.train, args.labels, **options)
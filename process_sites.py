@@ -1,11 +1,18 @@
+import io
 import csv
-import csv_utils_helpers
-
-# Increase CSV field size limit to handle large fields
-csv_utils_helpers.increase_csv_field_size_limit()
+import sys
 import json
 import os
+import queue
+import shutil
+import argparse
+import tempfile
+import itertools
+import threading
+import multiprocessing
 import csv_utils_helpers
+import checkpoint
+import data_profile
 
 # Increase CSV field size limit to handle large fields
 csv_utils_helpers.increase_csv_field_size_limit()
@@ -14,28 +21,26 @@ DEFAULT_CONFIG_FILE = 'config.json'
 INPUT_FILE = 'p3_points_export_for_cleaning.csv'
 OUTPUT_FILE = 'p3_points_concatenated.csv'
 
-# Default columns if config is missing
-DEFAULT_COLUMNS_TO_CONCAT = [
-    'type_site', 'explain', 'additional', 'surf_tech', 'map_meth',
-    'test_meth', 'exca_meth', 'records', 'materials', 'samples',
-    'time_occ', 'drainage', 'soil_desc', 'surf_tex', 'visible',
-    'env_desc', 'time_desc', 'site_size', 'basis', 'cult_desc',
-    'basis_size', 'artifact', 'intact', 'value', 'invest',
-    'disc_desc', 'unmatched'
-import csv_utils
-import sys
-import json
-import argparse
-import os
+# Pipelined mode: rows per batch and batches buffered between stages
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_QUEUE_DEPTH = 8
 
-# Increase CSV field size limit to handle large fields
-csv_utils.increase_field_size_limit()
+# Parallel mode: byte ranges per worker (more ranges balance uneven rows)
+# and bytes read at a time while looking for record boundaries
+RANGES_PER_WORKER = 4
+BOUNDARY_SCAN_BYTES = 1 << 20
 
-DEFAULT_INPUT_FILE = '/tmp/file_attachments/Analysis/p3_points_export_for_cleaning.csv'
-DEFAULT_OUTPUT_FILE = '/tmp/p3_points_concatenated.csv'
-INPUT_FILE = 'p3_points_export_for_cleaning.csv'
-OUTPUT_FILE = 'p3_points_concatenated.csv'
+# A candidate boundary must be followed by this many well-formed records
+# (within the bytes read to check them); newlines tried per boundary before
+# checking every newline, and before giving up on splitting the rest
+BOUNDARY_CHECK_RECORDS = 4
+BOUNDARY_CHECK_BYTES = 1 << 16
+BOUNDARY_CHECK_NEWLINES = 64
 
+# Values (after cleaning, lowercase) left out of Concat_site_variables
+SKIP_VALUES = ('no data', 'false', '')
+
+# Default columns if config is missing
 DEFAULT_COLUMNS_TO_CONCAT = [
     'type_site',
     'explain',
@@ -74,11 +79,6 @@ def load_config(config_path):
     if not os.path.exists(config_path):
         print(f"Config file {config_path} not found. Using defaults.")
         return {}
-    Load configuration from a JSON file.
-    Returns a dictionary with configuration or None if loading fails.
-    """
-    if not os.path.exists(config_path):
-        return None
 
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -89,9 +89,6 @@ def load_config(config_path):
     except Exception as e:
         print(f"Error reading config file: {e}. Using defaults.")
         return {}
-    except Exception as e:
-        print(f"Error loading config file {config_path}: {e}")
-        return None
 
 def clean_value(val):
     if val is None:
@@ -104,13 +101,277 @@ def should_skip(val):
     Returns True if the value should be skipped (e.g. 'No Data', 'False', empty).
     """
     v = csv_utils_helpers.clean_value(val, lower=True)
-    return v in ['no data', 'false', '']
+    return v in SKIP_VALUES
+
+def concat_row(row, columns_to_concat):
+    """
+    Cleans every field of a row and adds the Concat_site_variables field.
+    """
+    # Clean all fields in the row to ensure no newlines exist in the output
+    clean_row = {k: csv_utils_helpers.clean_value(v) for k, v in row.items()}
+
+    concat_parts = []
+    for col in columns_to_concat:
+        if col in clean_row:
+            val = clean_row[col]
+            if not should_skip(val):
+                # Format: "Header: Value;"
+                # Value is already cleaned of newlines
+                concat_parts.append(f"{col}: {val};")
+
+    clean_row['Concat_site_variables'] = " ".join(concat_parts)
+    return clean_row
+
+def run_pipelined(rows, transform, write_rows, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Runs read -> transform -> write as three overlapping stages.
+
+    A reader thread pulls rows into batches, the calling thread transforms
+    them, and a writer thread writes them. Stages are connected by bounded
+    queues of at most `queue_depth` batches, so memory stays bounded while
+    input and output waits overlap with transform work. Batches are written
+    in input order. Returns the number of rows written.
+    """
+    read_queue = queue.Queue(maxsize=queue_depth)
+    write_queue = queue.Queue(maxsize=queue_depth)
+    errors = []
+    stop = threading.Event()
+    written = [0]
+
+    def put(q, item):
+        # Give up if another stage failed, so no thread blocks forever
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def reader_stage():
+        try:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    if not put(read_queue, batch):
+                        return
+                    batch = []
+            if batch and not put(read_queue, batch):
+                return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        put(read_queue, None)
+
+    def writer_stage():
+        try:
+            while True:
+                batch = get(write_queue)
+                if batch is None:
+                    return
+                write_rows(batch)
+                written[0] += len(batch)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    reader = threading.Thread(target=reader_stage, name='process_sites-reader', daemon=True)
+    writer = threading.Thread(target=writer_stage, name='process_sites-writer', daemon=True)
+    reader.start()
+    writer.start()
+
+    try:
+        while True:
+            batch = get(read_queue)
+            if batch is None:
+                break
+            if not put(write_queue, [transform(row) for row in batch]):
+                break
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        put(write_queue, None)
+        writer.join()
+        stop.set()
+        reader.join()
+
+    if errors:
+        raise errors[0]
+    return written[0]
+
+def _parses_as_records(f, offset, fields):
+    """
+    Checks a candidate boundary: the first BOUNDARY_CHECK_RECORDS records
+    from `offset` (those complete within BOUNDARY_CHECK_BYTES) must parse
+    as CSV rows of exactly `fields` fields.
+    """
+    f.seek(offset)
+    data = f.read(BOUNDARY_CHECK_BYTES)
+    at_end = len(data) < BOUNDARY_CHECK_BYTES
+    try:
+        rows = list(itertools.islice(csv.reader(io.StringIO(data.decode('utf-8', 'replace'), newline='')),
+                                     BOUNDARY_CHECK_RECORDS + 1))
+    except csv.Error:
+        return False
+    if len(rows) > BOUNDARY_CHECK_RECORDS:
+        rows = rows[:BOUNDARY_CHECK_RECORDS]
+    elif not at_end:
+        # The last record may be cut off by the end of the window
+        rows = rows[:-1]
+    return bool(rows) and all(len(row) == fields for row in rows)
+
+def record_boundaries(path, start, parts, fields):
+    """
+    Splits the bytes of `path` from `start` to the end into about `parts`
+    ranges that begin on record boundaries. A newline is a candidate
+    boundary when an even number of quote characters precede it (an
+    escaped quote is doubled, so it counts twice), so quoted fields with
+    embedded newlines are never cut; each candidate is then checked by
+    parsing the records of `fields` fields that follow it. A stray quote
+    in an unquoted field throws the count off, so once a candidate fails
+    the check (or BOUNDARY_CHECK_NEWLINES newlines pass without one) every
+    newline is checked until one passes, and after twice that many the
+    rest of the file is left as one range. Returns [(start, end), ...].
+    """
+    size = os.path.getsize(path)
+    targets = [start + (size - start) * i // parts for i in range(1, parts)]
+    boundaries = [start]
+    quotes = 0
+    t = 0
+    tries = 0
+    with open(path, 'rb') as f, open(path, 'rb') as check:
+        f.seek(start)
+        pos = start
+        while t < len(targets):
+            chunk = f.read(BOUNDARY_SCAN_BYTES)
+            if not chunk:
+                break
+            i = 0
+            while t < len(targets):
+                j = max(targets[t] - pos, i)
+                if j >= len(chunk):
+                    break
+                quotes += chunk.count(b'"', i, j)
+                i = j
+                nl = chunk.find(b'\n', i)
+                if nl == -1:
+                    break
+                quotes += chunk.count(b'"', i, nl)
+                i = nl + 1
+                suspect = tries >= BOUNDARY_CHECK_NEWLINES
+                if quotes % 2 == 0 or suspect:
+                    if _parses_as_records(check, pos + i, fields):
+                        boundaries.append(pos + i)
+                        quotes = tries = 0
+                        while t < len(targets) and targets[t] < pos + i:
+                            t += 1
+                        continue
+                    if not suspect:
+                        tries = BOUNDARY_CHECK_NEWLINES - 1
+                tries += 1
+                if tries >= 2 * BOUNDARY_CHECK_NEWLINES:
+                    print(f"Warning: could not find a record boundary near byte {targets[t]}; "
+                          f"the rest of the file is prepared as one range.")
+                    t = len(targets)
+            quotes += chunk.count(b'"', i)
+            pos += len(chunk)
+    boundaries.append(size)
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b > a]
+
+def prepare_range(task):
+    """
+    Worker for parallel mode: prepares the records in one byte range of the
+    input and writes them, without a header, to a part file. Returns the
+    number of rows written and, with `profile`, the range's DataProfiler.
+    """
+    input_path, start, end, fieldnames, new_fieldnames, columns_to_concat, profile, part_path = task
+    profiler = data_profile.DataProfiler(SKIP_VALUES) if profile else None
+    row_count = 0
+    with open(input_path, 'rb') as fin, open(part_path, 'w', encoding='utf-8', newline='') as fout:
+        fin.seek(start)
+        lines = checkpoint.OffsetLineReader(fin)
+
+        def range_lines():
+            for line in lines:
+                yield line
+                if lines.offset >= end:
+                    return
+
+        reader = csv.DictReader(range_lines(), fieldnames=fieldnames)
+        writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
+        for row in reader:
+            clean_row = concat_row(row, columns_to_concat)
+            if profiler is not None:
+                profiler.add_row(clean_row)
+            writer.writerow(clean_row)
+            row_count += 1
+    return row_count, profiler
+
+def run_parallel(input_path, data_start, fieldnames, new_fieldnames, columns_to_concat, fout, workers, profiler=None):
+    """
+    Prepares the input in byte ranges on a process pool and appends the
+    per-range outputs to `fout` in input order. Returns the number of rows.
+    The per-range profiles are merged into `profiler` if one is given.
+    """
+    ranges = record_boundaries(input_path, data_start, workers * RANGES_PER_WORKER, len(fieldnames))
+    part_dir = tempfile.mkdtemp(prefix='process_sites_', dir=os.path.dirname(os.path.abspath(fout.name)))
+    tasks = [(input_path, start, end, fieldnames, new_fieldnames, columns_to_concat, profiler is not None,
+              os.path.join(part_dir, f'part_{i:05d}.csv')) for i, (start, end) in enumerate(ranges)]
+    print(f"Preparing {len(ranges)} byte ranges with {workers} workers...")
+
+    row_count = 0
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for task, (rows, part_profile) in zip(tasks, pool.imap(prepare_range, tasks)):
+                with open(task[-1], 'r', encoding='utf-8', newline='') as part:
+                    shutil.copyfileobj(part, fout)
+                os.remove(task[-1])
+                if profiler is not None:
+                    profiler.merge(part_profile)
+                row_count += rows
+                print(f"Processed {row_count} rows...")
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return row_count
+
+def write_data_profile(profiler, input_path, path, baseline=None):
+    """
+    Writes the profile to `path` after comparing it with `baseline`, or with
+    the profile already at `path` from the previous run.
+    """
+    profile = dict(profiler.summary(), input_file=input_path)
+    baseline = baseline or path
+    previous = data_profile.load_profile(baseline)
+    if previous is not None:
+        profile['baseline'] = baseline
+        profile['drift'] = data_profile.compare_profiles(previous, profile)
+        data_profile.report_drift(profile['drift'], baseline)
+    data_profile.write_profile(path, profile)
+    print(f"Data profile written to {path}")
+    return profile
+
+def main(input_file=None, output_file=None, config_file=DEFAULT_CONFIG_FILE, pipelined=False,
+         batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH, checkpoint_every=0, resume=False, workers=1,
+         profile=None, profile_baseline=None):
+    if workers > 1 and (pipelined or checkpoint_every or resume):
+        raise ValueError("workers > 1 cannot be combined with pipelined, checkpoint_every or resume")
+    if pipelined and (checkpoint_every or resume):
+        raise ValueError("checkpoint_every/resume are not supported with pipelined")
+    if profile is not None and resume:
+        # Only the rows after the checkpoint would be profiled, and the
+        # partial profile would show false drift against a full one
+        raise ValueError("profile cannot be combined with resume")
 
-def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
-    print(f"Reading from {input_file}...")
-    
-    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-def main(input_file=None, output_file=None, config_file=DEFAULT_CONFIG_FILE):
     # Load Config
     config = load_config(config_file)
 
@@ -118,168 +379,146 @@ def main(input_file=None, output_file=None, config_file=DEFAULT_CONFIG_FILE):
     input_path = input_file or config.get('input_file') or INPUT_FILE
     output_path = output_file or config.get('output_file') or OUTPUT_FILE
     columns_to_concat = config.get('columns_to_concat', DEFAULT_COLUMNS_TO_CONCAT)
-    
-    print(f"Reading from {input_path}...")
 
-    try:
-        with open(input_path, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-            reader = csv.DictReader(fin)
-            fieldnames = reader.fieldnames if reader.fieldnames else []
-
-            # Check if all target columns exist
-            missing_cols = [c for c in columns_to_concat if c not in fieldnames]
-            if missing_cols:
-                print(f"Warning: The following columns were not found in the input CSV: {missing_cols}")
-def parse_arguments():
-    parser = argparse.ArgumentParser(description='Process site data.')
-    parser.add_argument('--input', '-i', default='p3_points_export_for_cleaning.csv', help='Input CSV file path')
-    parser.add_argument('--output', '-o', default='p3_points_concatenated.csv', help='Output CSV file path')
-    return parser.parse_args()
-
-def main():
-    parser = argparse.ArgumentParser(description='Process site data and concatenate columns.')
-    parser.add_argument('--config', type=str, default='config.json', help='Path to configuration file')
-    args = parser.parse_args()
+    if resume and not checkpoint_every:
+        checkpoint_every = checkpoint.DEFAULT_CHECKPOINT_EVERY
+    ckpt_path = checkpoint.checkpoint_path(output_path)
 
-    # Load configuration
-    config = load_config(args.config)
-    
-    if config:
-        print(f"Loaded configuration from {args.config}")
-        input_file = config.get('input_file', DEFAULT_INPUT_FILE)
-        output_file = config.get('output_file', DEFAULT_OUTPUT_FILE)
-        columns_to_concat = config.get('columns_to_concat', DEFAULT_COLUMNS_TO_CONCAT)
-    else:
-        print(f"Configuration file {args.config} not found or invalid. Using defaults.")
-        input_file = DEFAULT_INPUT_FILE
-        output_file = DEFAULT_OUTPUT_FILE
-        columns_to_concat = DEFAULT_COLUMNS_TO_CONCAT
-
-    print(f"Reading from {input_file}...")
+    # Optional data-quality profile of every column, compared with the
+    # previous run's profile (or `profile_baseline`) once the run finishes
+    if profile == '' or profile is True:
+        profile = data_profile.profile_path(output_path)
+    profiler = data_profile.DataProfiler(SKIP_VALUES) if profile else None
 
-    try:
-        with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-            reader = csv.DictReader(fin)
-            fieldnames = reader.fieldnames if reader.fieldnames else []
-    args = parse_arguments()
+    def prepare(row):
+        clean_row = concat_row(row, columns_to_concat)
+        if profiler is not None:
+            profiler.add_row(clean_row)
+        return clean_row
 
-    if not os.path.exists(args.input):
-        print(f"Error: Input file '{args.input}' not found.")
-        sys.exit(1)
+    print(f"Reading from {input_path}...")
 
-    print(f"Reading from {args.input}...")
-    
-    with open(args.input, 'r', encoding='utf-8', errors='replace', newline='') as fin:
-        reader = csv.DictReader(fin)
-        fieldnames = reader.fieldnames if reader.fieldnames else []
-        
-        # Check if all target columns exist
-        missing_cols = [c for c in COLUMNS_TO_CONCAT if c not in fieldnames]
-        if missing_cols:
-            print(f"Warning: The following columns were not found in the input CSV: {missing_cols}")
-            # We will proceed but skip missing columns for concatenation
-        
-        # Add the new column to fieldnames, ensuring no duplicates if re-running
-        base_fieldnames = [f for f in fieldnames if f != 'Concat_site_variables']
-        new_fieldnames = base_fieldnames + ['Concat_site_variables']
-        
-        print(f"Writing to {output_file}...")
-        with open(output_file, 'w', encoding='utf-8', newline='') as fout:
-        print(f"Writing to {args.output}...")
-        with open(args.output, 'w', encoding='utf-8', newline='') as fout:
-            writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
-            writer.writeheader()
-            
-            row_count = 0
-            for row in reader:
-                # Clean all fields in the row to ensure no newlines exist in the output
-                clean_row = {k: csv_utils_helpers.clean_value(v) for k, v in row.items()}
-            # Add the new column to fieldnames
-            base_fieldnames = [f for f in fieldnames if f != 'Concat_site_variables']
-            new_fieldnames = base_fieldnames + ['Concat_site_variables']
-
-            print(f"Writing to {output_path}...")
-            with open(output_path, 'w', encoding='utf-8', newline='') as fout:
+    try:
+        state = None
+        if resume:
+            state = checkpoint.load_checkpoint(ckpt_path, input_path)
+            if state is not None and not os.path.exists(output_path):
+                print(f"Warning: Output file '{output_path}' is missing. Starting over.")
+                state = None
+            if state is None:
+                print("No usable checkpoint found. Starting from the beginning.")
+
+        # Read through a byte-offset tracking line reader so runs can be resumed
+        with open(input_path, 'rb') as fin_bin:
+            lines = checkpoint.OffsetLineReader(fin_bin)
+
+            if state is not None:
+                lines.seek(state['input_offset'])
+                reader = csv.DictReader(lines, fieldnames=state['input_fieldnames'])
+                new_fieldnames = state['output_fieldnames']
+                row_count = state['row_count']
+
+                checkpoint.truncate_output(output_path, state['output_offset'])
+                print(f"Resuming {output_path} after row {row_count}...")
+                fout = open(output_path, 'a', encoding='utf-8', newline='')
                 writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
-                writer.writeheader()
-                
+            else:
+                reader = csv.DictReader(lines)
+                fieldnames = reader.fieldnames if reader.fieldnames else []
+
+                # Check if all target columns exist
+                missing_cols = [c for c in columns_to_concat if c not in fieldnames]
+                if missing_cols:
+                    print(f"Warning: The following columns were not found in the input CSV: {missing_cols}")
+                    # We will proceed but skip missing columns for concatenation
+
+                # Add the new column to fieldnames, ensuring no duplicates if re-running
+                base_fieldnames = [f for f in fieldnames if f != 'Concat_site_variables']
+                new_fieldnames = base_fieldnames + ['Concat_site_variables']
                 row_count = 0
-                for row in reader:
-                    # Clean all fields
-                    clean_row = {k: csv_utils_helpers.clean_value(v) for k, v in row.items()}
-
-                    concat_parts = []
-                    for col in columns_to_concat:
-                        if col in clean_row:
-                            val = clean_row[col]
-                            if not should_skip(val):
-                                concat_parts.append(f"{col}: {val};")
-
-                    clean_row['Concat_site_variables'] = " ".join(concat_parts)
-                    writer.writerow(clean_row)
-                    row_count += 1
-
-                    if row_count % 1000 == 0:
-                        print(f"Processed {row_count} rows...")
-                
-                print(f"Finished processing {row_count} rows.")
-                
-    except FileNotFoundError:
-        print(f"Error: Input file '{input_path}' not found.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-            # Check if all target columns exist
-            missing_cols = [c for c in columns_to_concat if c not in fieldnames]
-            if missing_cols:
-                print(f"Warning: The following columns were not found in the input CSV: {missing_cols}")
-                # We will proceed but skip missing columns for concatenation
-
-            # Add the new column to fieldnames, ensuring no duplicates if re-running
-            base_fieldnames = [f for f in fieldnames if f != 'Concat_site_variables']
-            new_fieldnames = base_fieldnames + ['Concat_site_variables']
-
-            print(f"Writing to {output_file}...")
-            with open(output_file, 'w', encoding='utf-8', newline='') as fout:
+
+                print(f"Writing to {output_path}...")
+                fout = open(output_path, 'w', encoding='utf-8', newline='')
                 writer = csv.DictWriter(fout, fieldnames=new_fieldnames)
                 writer.writeheader()
-                
-                row_count = 0
-                for row in reader:
-                    # Clean all fields in the row to ensure no newlines exist in the output
-                    clean_row = {k: clean_value(v) for k, v in row.items()}
-
-                    concat_parts = []
-                    for col in columns_to_concat:
-                        if col in clean_row:
-                            val = clean_row[col]
-                            if not should_skip(val):
-                                # Format: "Header: Value;"
-                                # Value is already cleaned of newlines
-                                concat_parts.append(f"{col}: {val};")
-
-                    clean_row['Concat_site_variables'] = " ".join(concat_parts)
-                    writer.writerow(clean_row)
-                    row_count += 1
-
-                    if row_count % 1000 == 0:
-                        print(f"Processed {row_count} rows...")
-                
+
+            with fout:
+                if workers > 1:
+                    fout.flush()
+                    row_count = run_parallel(input_path, lines.offset, reader.fieldnames, new_fieldnames,
+                                             columns_to_concat, fout, workers, profiler)
+                elif pipelined:
+                    progress = {'rows': 0}
+
+                    def write_rows(batch):
+                        writer.writerows(batch)
+                        before = progress['rows']
+                        progress['rows'] += len(batch)
+                        if progress['rows'] // 1000 > before // 1000:
+                            print(f"Processed {progress['rows']} rows...")
+
+                    row_count = run_pipelined(
+                        reader, prepare, write_rows,
+                        batch_size=batch_size, queue_depth=queue_depth
+                    )
+                else:
+                    for row in reader:
+                        writer.writerow(prepare(row))
+                        row_count += 1
+
+                        if row_count % 1000 == 0:
+                            print(f"Processed {row_count} rows...")
+
+                        if checkpoint_every and row_count % checkpoint_every == 0:
+                            checkpoint.save_checkpoint(ckpt_path, fout, {
+                                'input_signature': checkpoint.input_signature(input_path),
+                                'input_offset': lines.offset,
+                                'input_fieldnames': reader.fieldnames,
+                                'output_fieldnames': new_fieldnames,
+                                'row_count': row_count,
+                            })
+
                 print(f"Finished processing {row_count} rows.")
+
+        checkpoint.remove_checkpoint(ckpt_path)
+        if profiler is not None:
+            write_data_profile(profiler, input_path, profile, profile_baseline)
     except FileNotFoundError:
-        print(f"Error: Input file '{input_file}' not found.")
+        print(f"Error: Input file '{input_path}' not found.")
         sys.exit(1)
 
 if __name__ == "__main__":
-    import argparse
     parser = argparse.ArgumentParser(description="Concatenate site variables from a CSV file.")
-    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Path to the input CSV file.")
-    parser.add_argument("output", nargs="?", default=OUTPUT_FILE, help="Path to the output CSV file.")
-    args = parser.parse_args()
-
-    main(args.input, args.output)
     parser.add_argument("--input", "-i", help="Path to the input CSV file.")
     parser.add_argument("--output", "-o", help="Path to the output CSV file.")
     parser.add_argument("--config", "-c", default=DEFAULT_CONFIG_FILE, help="Path to the JSON config file.")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Overlap reading, cleaning and writing in separate threads (helps on network shares).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per batch in pipelined mode.")
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help="Maximum batches buffered between stages in pipelined mode.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Prepare byte ranges of the input in this many processes (output is identical).")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Write a resumable checkpoint every N rows (0 disables).")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint of this output file.")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help="Profile every column (fill rate, skip rate, lengths, distinct and top values) to PATH "
+                             "(default: <output>.profile.json) and report drift from the previous profile.")
+    parser.add_argument("--profile-baseline", metavar="PATH",
+                        help="Compare the profile with this one instead of the previous run's.")
     args = parser.parse_args()
 
-    main(input_file=args.input, output_file=args.output, config_file=args.config)
+    if args.pipelined and (args.checkpoint_every or args.resume):
+        parser.error("--checkpoint-every/--resume are not supported with --pipelined")
+    if args.workers > 1 and (args.pipelined or args.checkpoint_every or args.resume):
+        parser.error("--workers cannot be combined with --pipelined, --checkpoint-every or --resume")
+    if args.profile is not None and args.resume:
+        parser.error("--profile cannot be combined with --resume")
+    if args.profile_baseline and args.profile is None:
+        parser.error("--profile-baseline needs --profile")
+
+    main(input_file=args.input, output_file=args.output, config_file=args.config,
+         pipelined=args.pipelined, batch_size=args.batch_size, queue_depth=args.queue_depth,
+         checkpoint_every=args.checkpoint_every, resume=args.resume, workers=args.workers,
+         profile=args.profile, profile_baseline=args.profile_baseline)
@@ -0,0 +1,132 @@
+import os
+import csv
+import time
+import cProfile
+import contextlib
+
+DEFAULT_REPORT_FILE = 'rule_profile.csv'
+
+REPORT_FIELDS = ['Kind', 'Rule', 'Seconds', 'Scans', 'Matches', 'Negated', 'Excluded', 'Dependency', 'Accepted']
+
+class RuleStats:
+    """
+    Counters for one rule. `matches` counts the matches examined (a keyword
+    stops being scanned in a row once one match is accepted); `negated`,
+    `excluded` and `dependency` count matches rejected by each check.
+    """
+    __slots__ = ('seconds', 'scans', 'matches', 'negated', 'excluded', 'dependency', 'accepted')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.scans = 0
+        self.matches = 0
+        self.negated = 0
+        self.excluded = 0
+        self.dependency = 0
+        self.accepted = 0
+
+class RuleProfiler:
+    """
+    Per-rule cost profile of a classification run. Attach to a
+    SiteClassifier (classifier.profiler = RuleProfiler()) to record time and
+    outcomes for every keyword, rock material, period, artifact, burned clay,
+    prehistoric evidence and exclusion rule, plus wall time per stage.
+
+    With `cprofile_dir`, each stage also runs under its own cProfile.Profile
+    and is dumped to <cprofile_dir>/<stage>.prof. Exclusion time is also
+    included in the time of the keyword that triggered the check.
+    """
+    def __init__(self, cprofile_dir=None):
+        self.rules = {}
+        self.stage_seconds = {}
+        self.cprofile_dir = cprofile_dir
+        self._profiles = {}
+
+    def rule(self, kind, name):
+        key = (kind, name)
+        stats = self.rules.get(key)
+        if stats is None:
+            stats = self.rules[key] = RuleStats()
+        return stats
+
+    def timed_search(self, kind, name, search, *args):
+        """Runs a search that returns a match (or True) or None (or False), recording it under the rule."""
+        stats = self.rule(kind, name)
+        start = time.perf_counter()
+        result = search(*args)
+        stats.seconds += time.perf_counter() - start
+        stats.scans += 1
+        if result:
+            stats.matches += 1
+            stats.accepted += 1
+        return result
+
+    def check_exclusions(self, text_around, keyword, exclusion_regexes):
+        """Profiled equivalent of classify_sites.is_excluded_context."""
+        for base_kw, regex in exclusion_regexes.items():
+            if base_kw in keyword:
+                stats = self.rule('exclusion', base_kw)
+                start = time.perf_counter()
+                hit = regex.search(text_around)
+                stats.seconds += time.perf_counter() - start
+                stats.scans += 1
+                if hit:
+                    stats.matches += 1
+                    stats.accepted += 1
+                    return True
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profile = None
+        if self.cprofile_dir:
+            profile = self._profiles.get(name)
+            if profile is None:
+                profile = self._profiles[name] = cProfile.Profile()
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+
+    def sorted_rules(self):
+        """(kind, rule, stats) sorted by cumulative time, most expensive first."""
+        return sorted(((kind, name, stats) for (kind, name), stats in self.rules.items()),
+                      key=lambda item: (-item[2].seconds, item[0], item[1]))
+
+    def dead_rules(self):
+        return [(kind, name) for kind, name, stats in self.sorted_rules() if stats.accepted == 0]
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_FIELDS)
+            for kind, name, stats in self.sorted_rules():
+                writer.writerow([kind, name, f"{stats.seconds:.6f}", stats.scans, stats.matches,
+                                 stats.negated, stats.excluded, stats.dependency, stats.accepted])
+
+    def dump_stages(self):
+        """Writes one .prof file per stage. Returns the written paths."""
+        if not self.cprofile_dir:
+            return []
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        paths = []
+        for name, profile in sorted(self._profiles.items()):
+            path = os.path.join(self.cprofile_dir, f"{name}.prof")
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def summary(self, top=15):
+        lines = ["Stage times:"]
+        for name, seconds in sorted(self.stage_seconds.items(), key=lambda item: -item[1]):
+            lines.append(f"  {name}: {seconds:.3f}s")
+        lines.append(f"Top {top} rules by time:")
+        for kind, name, stats in self.sorted_rules()[:top]:
+            lines.append(f"  {kind:<12} {name:<32} {stats.seconds:.4f}s  {stats.matches} matches, "
+                         f"{stats.negated} negated, {stats.excluded} excluded, {stats.accepted} accepted")
+        lines.append(f"{len(self.dead_rules())} of {len(self.rules)} rules were never accepted.")
+        return "\n".join(lines)
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import process_sites
+import classify_sites
+import generate_report
+import keyword_codes
+
+DEFAULT_CACHE_DIR = '.pipeline_cache'
+MANIFEST_FILE = 'manifest.json'
+
+# Cached outputs kept per stage; older entries are dropped with their files
+DEFAULT_KEEP_ENTRIES = 3
+
+HASH_CHUNK_BYTES = 1 << 20
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Source files whose contents version each stage
+STAGE_CODE = {
+    'process': ['process_sites.py', 'csv_utils_helpers.py', 'checkpoint.py', 'data_profile.py'],
+    'classify': ['classify_sites.py', 'csv_utils_helpers.py', 'checkpoint.py', 'keyword_codes.py', 'rule_profiler.py',
+                 'match_spans.py'],
+    'report': ['generate_report.py', 'csv_utils_helpers.py', 'keyword_codes.py', 'spatial_index.py',
+               'sampling.py', 'svg_report.py'],
+}
+
+# Files the report DAG writes to the report directory (charts as PNG or SVG).
+# Only these are cleared before a rerun and cached; anything else there (e.g.
+# --by-county summaries or the user's own files) is left alone.
+REPORT_CHARTS = ['class_distribution', 'class3_prehistoric_breakdown', 'time_period_distribution', 'class_period_heatmap']
+REPORT_OUTPUTS = (['Burned_Rock_Analysis_Report.txt', 'Keyword_Hits.csv', 'Class_Period_Matrix.csv',
+                   'Burned_Clay_Period_Matrix.csv', 'Methodology_Summary.txt', 'Burned_Rock_Report.html']
+                  + [name + ext for name in REPORT_CHARTS for ext in ('.png', '.svg')])
+
+def run_dag(tasks, jobs=4):
+    """
+    Runs {name: (dependencies, func)} in dependency order. Tasks whose
+    dependencies are done run concurrently on up to `jobs` threads. The
+    first failure stops new tasks from starting and is re-raised.
+    """
+    done = set()
+    running = {}
+    pending = dict(tasks)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in [n for n, (deps, _) in pending.items() if all(d in done for d in deps)]:
+                running[pool.submit(pending.pop(name)[1])] = name
+            if not running:
+                raise ValueError(f"Unsatisfiable task dependencies: {sorted(pending)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    pending.clear()
+                    wait(running)
+                    raise error
+                done.add(name)
+    return done
+
+class StageCache:
+    """
+    Content-addressed store of stage outputs. A stage's fingerprint hashes
+    its input files, config and rule files, options and the source of the
+    code that runs it; the manifest maps each fingerprint to the content
+    hashes of the outputs it produced, stored under objects/<sha256>.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, keep_entries=DEFAULT_KEEP_ENTRIES):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.keep_entries = keep_entries
+        self.lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.manifest = {'stages': {}, 'file_hashes': {}}
+        path = os.path.join(cache_dir, MANIFEST_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError):
+                print(f"Warning: Pipeline cache manifest {path} is unreadable. Starting an empty cache.")
+
+    def save(self):
+        path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        tmp_path = path + '.tmp'
+        with self.lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+
+    def file_hash(self, path):
+        """SHA-256 of a file, remembered by size and mtime so unchanged files are not re-read."""
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self.lock:
+            memo = self.manifest['file_hashes'].get(key)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            self.manifest['file_hashes'][key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, stage, inputs, code_files, options):
+        """Hash of the stage's inputs (missing files count as absent), code and options."""
+        parts = {'stage': stage, 'options': options, 'inputs': {}, 'code': {}}
+        for path in inputs:
+            parts['inputs'][os.path.basename(path)] = self.file_hash(path) if os.path.exists(path) else None
+        for name in code_files:
+            path = os.path.join(HERE, name)
+            parts['code'][name] = self.file_hash(path) if os.path.exists(path) else None
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, stage, fingerprint):
+        with self.lock:
+            entry = self.manifest['stages'].get(stage, {}).get(fingerprint)
+        if entry is None:
+            return None
+        if not all(os.path.exists(os.path.join(self.objects_dir, digest)) for digest in entry['outputs'].values()):
+            return None
+        return entry
+
+    def restore(self, entry):
+        """Puts cached outputs in place, copying only those that differ."""
+        for path, digest in entry['outputs'].items():
+            if os.path.exists(path) and self.file_hash(path) == digest:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shutil.copyfile(os.path.join(self.objects_dir, digest), path)
+            self.file_hash(path)
+
+    def store(self, stage, fingerprint, outputs):
+        entry = {'outputs': {}}
+        for path in outputs:
+            digest = self.file_hash(path)
+            obj = os.path.join(self.objects_dir, digest)
+            if not os.path.exists(obj):
+                shutil.copyfile(path, obj + '.tmp')
+                os.replace(obj + '.tmp', obj)
+            entry['outputs'][path] = digest
+
+        with self.lock:
+            entries = self.manifest['stages'].setdefault(stage, {})
+            entries.pop(fingerprint, None)
+            entries[fingerprint] = entry
+            while len(entries) > self.keep_entries:
+                entries.pop(next(iter(entries)))
+        self.prune()
+        self.save()
+
+    def prune(self):
+        """Deletes objects no manifest entry refers to."""
+        with self.lock:
+            live = {digest for entries in self.manifest['stages'].values()
+                    for entry in entries.values() for digest in entry['outputs'].values()}
+        for name in os.listdir(self.objects_dir):
+            if name not in live:
+                os.remove(os.path.join(self.objects_dir, name))
+
+def run_cached(cache, stage, inputs, outputs, options, run, force=False):
+    """
+    Runs one stage unless a cached run with the same fingerprint exists.
+    `outputs` returns the output paths the stage produced (it is called
+    after `run`, so optional outputs can be included when present). Returns
+    True if the stage ran.
+    """
+    fingerprint = cache.fingerprint(stage, inputs, STAGE_CODE[stage], options)
+    entry = None if force else cache.lookup(stage, fingerprint)
+    if entry is not None:
+        cache.restore(entry)
+        print(f"[{stage}] Up to date (fingerprint {fingerprint[:12]}); skipped.")
+        return False
+
+    print(f"[{stage}] Running (fingerprint {fingerprint[:12]})...")
+    # Outputs are written to fresh files, never over a cached object's copy
+    for path in outputs():
+        if os.path.exists(path):
+            os.remove(path)
+    run()
+    cache.store(stage, fingerprint, [path for path in outputs() if os.path.exists(path)])
+    return True
+
+def report_tasks(classified_file, report_dir, radii=None):
+    """generate_report as a DAG: one analysis pass, then independent writers."""
+    stats = {}
+
+    def analyze():
+        stats.update(generate_report.analyze_data(classified_file))
+        generate_report.analyze_spatial(stats, radii)
+
+    return {
+        'analyze': ([], analyze),
+        'text_report': (['analyze'], lambda: generate_report.write_text_report(stats, report_dir)),
+        'keyword_report': (['analyze'], lambda: generate_report.write_keyword_report(stats, report_dir)),
+        'period_matrices': (['analyze'], lambda: generate_report.write_period_matrices(stats, report_dir)),
+        'charts': (['analyze'], lambda: generate_report.generate_charts(stats, report_dir)),
+        'methodology': ([], lambda: generate_report.write_methodology_report(report_dir)),
+        'html_report': (['analyze'], lambda: generate_report.write_html_report(stats, report_dir)),
+    }
+
+def _report_outputs(report_dir):
+    return [os.path.join(report_dir, name) for name in REPORT_OUTPUTS]
+
+def main(input_file=None, config_file=process_sites.DEFAULT_CONFIG_FILE, cache_dir=DEFAULT_CACHE_DIR,
+         force=(), jobs=4, workers=1):
+    config = process_sites.load_config(config_file)
+    raw_file = input_file or config.get('input_file') or process_sites.INPUT_FILE
+    concatenated_file = config.get('output_file') or process_sites.OUTPUT_FILE
+    classified_file = classify_sites.OUTPUT_FILE
+    report_dir = generate_report.REPORT_DIR
+
+    if not os.path.exists(raw_file):
+        print(f"Error: Input file '{raw_file}' not found.")
+        sys.exit(1)
+
+    cache = StageCache(cache_dir)
+    ran = []
+
+    # Only process_sites reads config.json; later stages see its effect
+    # through the content hash of the file it writes
+
+    def process():
+        if run_cached(cache, 'process', [raw_file, config_file], lambda: [concatenated_file], {},
+                      lambda: process_sites.main(raw_file, concatenated_file, config_file, workers=workers),
+                      'process' in force):
+            ran.append('process')
+
+    def classify():
+        def outputs():
+            return [classified_file, keyword_codes.sidecar_path(classified_file), classify_sites.SYNONYMS_FILE]
+        if run_cached(cache, 'classify',
+                      [concatenated_file, classify_sites.ARTIFACT_DB_FILE],
+                      outputs, {}, lambda: classify_sites.main(concatenated_file, classified_file),
+                      'classify' in force):
+            ran.append('classify')
+
+    def report():
+        def run():
+            generate_report.ensure_dir(report_dir)
+            run_dag(report_tasks(classified_file, report_dir), jobs)
+        if run_cached(cache, 'report', [classified_file, keyword_codes.sidecar_path(classified_file)],
+                      lambda: _report_outputs(report_dir), {'radii': generate_report.DEFAULT_NEIGHBOR_RADII}, run,
+                      'report' in force):
+            ran.append('report')
+
+    # Stages depend on each other's outputs, so the top level is a chain
+    run_dag({
+        'process': ([], process),
+        'classify': (['process'], classify),
+        'report': (['classify'], report),
+    }, jobs=1)
+    cache.save()
+
+    print(f"\nPipeline complete. Stages run: {', '.join(ran) if ran else 'none (all cached)'}.")
+    return ran
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run process -> classify -> report, skipping stages whose inputs and code are unchanged.")
+    parser.add_argument("--input", "-i", help="Raw export CSV (default: config.json input_file).")
+    parser.add_argument("--config", "-c", default=process_sites.DEFAULT_CONFIG_FILE, help="Path to the JSON config file.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory holding cached stage outputs.")
+    parser.add_argument("--force", nargs="+", choices=list(STAGE_CODE), default=[],
+                        help="Rerun these stages even if their fingerprint is cached.")
+    parser.add_argument("--jobs", type=int, default=4, help="Report tasks run at the same time.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for process_sites byte ranges.")
+    args = parser.parse_args()
+
+    main(args.input, args.config, args.cache_dir, set(args.force), args.jobs, args.workers)
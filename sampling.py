@@ -0,0 +1,202 @@
+import csv
+import math
+import random
+import re
+from collections import Counter, defaultdict
+
+# Two-sided 95% normal quantile used for every interval
+Z_95 = 1.959963984540054
+
+# Within-stratum variance assumed for a stratum with one sampled record,
+# where it cannot be estimated: the largest an indicator (or a residual
+# spanning a range of 1) can have
+SINGLE_UNIT_VARIANCE = 0.25
+
+# Smithsonian trinomial: state number + two-letter county code + site number (e.g. 41AN101)
+_TRINOMIAL_RE = re.compile(r'^\s*(\d{1,2})\s*([A-Za-z]{2})')
+
+UNKNOWN_COUNTY = 'Unknown'
+
+def county_code(trinomial):
+    """Returns the state+county prefix of a trinomial (e.g. '41AN'), or 'Unknown'."""
+    match = _TRINOMIAL_RE.match(trinomial or '')
+    if not match:
+        return UNKNOWN_COUNTY
+    return match.group(1) + match.group(2).upper()
+
+def iter_raw_records(f):
+    """
+    Yields the raw text of each CSV record without parsing its fields. A
+    line with an odd number of quote characters opens (or closes) a quoted
+    field, so records with embedded newlines stay whole.
+    """
+    pending = None
+    for line in f:
+        if pending is None:
+            if line.count('"') % 2 == 0:
+                yield line
+            else:
+                pending = [line]
+        else:
+            pending.append(line)
+            if line.count('"') % 2 == 1:
+                yield ''.join(pending)
+                pending = None
+    if pending is not None:
+        yield ''.join(pending)
+
+def parse_record(raw):
+    return next(csv.reader([raw]))
+
+def record_field(raw, index):
+    """One field of a raw record; avoids the csv module when the record has no quotes."""
+    if '"' not in raw:
+        fields = raw.rstrip('\r\n').split(',')
+    else:
+        fields = parse_record(raw)
+    return fields[index] if index < len(fields) else ''
+
+def reservoir_sample(records, size, rng):
+    """
+    Uniform sample of `size` records in one pass (Algorithm L: random skips
+    between replacements, so few random numbers are drawn). Returns
+    (sample, records seen).
+    """
+    reservoir = []
+    seen = 0
+    next_index = None
+    w = 1.0
+    for i, record in enumerate(records):
+        seen = i + 1
+        if i < size:
+            reservoir.append(record)
+            if i == size - 1:
+                w = math.exp(math.log(1.0 - rng.random()) / size)
+                next_index = i + _skip(1.0 - w, rng) + 1
+        elif i == next_index:
+            reservoir[rng.randrange(size)] = record
+            w *= math.exp(math.log(1.0 - rng.random()) / size)
+            next_index = i + _skip(1.0 - w, rng) + 1
+    return reservoir, seen
+
+def _skip(p, rng):
+    # Records passed over before the next kept one, when each record is
+    # passed over with probability p (geometric distribution)
+    if p <= 0.0:
+        return 0
+    if p >= 1.0:
+        return math.inf
+    return math.floor(math.log(1.0 - rng.random()) / math.log(p))
+
+def bernoulli_sample(records, fraction, rng):
+    """Keeps each record with probability `fraction`. Returns (sample, records seen)."""
+    sample = []
+    seen = 0
+    next_index = _skip(1.0 - fraction, rng)
+    for i, record in enumerate(records):
+        seen = i + 1
+        if i == next_index:
+            sample.append(record)
+            next_index = i + _skip(1.0 - fraction, rng) + 1
+    return sample, seen
+
+def allocate(populations, sample_size=None, fraction=None):
+    """
+    Proportional allocation of a sample over strata (largest remainder for
+    a fixed size). Every non-empty stratum gets at least one record.
+    """
+    total = sum(populations.values())
+    if sample_size is not None:
+        sample_size = min(sample_size, total)
+        exact = {h: sample_size * n / total for h, n in populations.items()}
+    else:
+        exact = {h: fraction * n for h, n in populations.items()}
+
+    if sample_size is not None:
+        allocation = {h: int(math.floor(x)) for h, x in exact.items()}
+        remaining = sample_size - sum(allocation.values())
+        for h in sorted(exact, key=lambda h: allocation[h] - exact[h])[:max(remaining, 0)]:
+            allocation[h] += 1
+    else:
+        allocation = {h: int(round(x)) for h, x in exact.items()}
+    return {h: min(populations[h], max(1, n)) for h, n in allocation.items() if populations[h]}
+
+def stratified_sample(open_records, stratum_of, sample_size=None, fraction=None, rng=None):
+    """
+    Two passes over the records: count each stratum, then keep a simple
+    random sample of its allocated size. `open_records` returns a fresh
+    record iterator for each pass. Returns ({stratum: [records]}, {stratum: population}).
+    """
+    rng = rng or random.Random()
+    populations = Counter(stratum_of(record) for record in open_records())
+    allocation = allocate(populations, sample_size, fraction)
+    chosen = {h: set(rng.sample(range(populations[h]), n)) for h, n in allocation.items()}
+
+    samples = defaultdict(list)
+    positions = Counter()
+    for record in open_records():
+        h = stratum_of(record)
+        if positions[h] in chosen[h]:
+            samples[h].append(record)
+        positions[h] += 1
+    return dict(samples), dict(populations)
+
+def estimate_total(strata, z=Z_95):
+    """
+    Stratified estimate of a population count from sampled indicator counts.
+    `strata` is a list of (hits in sample, sample size, population size).
+    Returns (estimate, low, high); the interval uses the normal
+    approximation with finite population correction, and the rule of three
+    (capped at the unsampled rows) when no sampled record was a hit. A
+    stratum with one sampled record adds the worst-case variance
+    SINGLE_UNIT_VARIANCE.
+    """
+    estimate = 0.0
+    variance = 0.0
+    population = 0
+    sampled = 0
+    hits = 0
+    for y, n, N in strata:
+        population += N
+        if not n:
+            continue
+        sampled += n
+        hits += y
+        p = y / n
+        estimate += N * p
+        s2 = n / (n - 1) * p * (1 - p) if n > 1 else SINGLE_UNIT_VARIANCE
+        variance += N * N * (1 - n / N) * s2 / n
+
+    if sampled and hits == 0:
+        return 0.0, 0.0, min(float(population - sampled), population * 3.0 / sampled)
+    half = z * math.sqrt(variance)
+    return estimate, max(0.0, estimate - half), min(float(population), estimate + half)
+
+def estimate_ratio(strata, z=Z_95):
+    """
+    Stratified ratio of two nested indicator counts (e.g. Class 3 only among
+    Class 3 sites). `strata` is a list of (numerator hits, denominator hits,
+    sample size, population size). Returns (ratio, low, high) as fractions,
+    or None if no sampled record is in the denominator. Strata with one
+    sampled record add SINGLE_UNIT_VARIANCE, as in estimate_total.
+    """
+    num_total = sum(N * y / n for y, x, n, N in strata if n)
+    den_total = sum(N * x / n for y, x, n, N in strata if n)
+    if den_total <= 0:
+        return None
+    ratio = num_total / den_total
+
+    # Linearized variance of the residual z = y - R x over the sample
+    variance = 0.0
+    for y, x, n, N in strata:
+        if not n:
+            continue
+        if n == 1:
+            s2 = SINGLE_UNIT_VARIANCE
+        else:
+            sum_z = y - ratio * x
+            sum_z2 = y * (1 - ratio) ** 2 + (x - y) * ratio ** 2
+            s2 = (sum_z2 - sum_z * sum_z / n) / (n - 1)
+        variance += N * N * (1 - n / N) * s2 / n
+    half = z * math.sqrt(max(variance, 0.0)) / den_total
+    return ratio, max(0.0, ratio - half), min(1.0, ratio + half)
@@ -0,0 +1,222 @@
+import math
+import numpy as np
+
+# Coordinate column pairs tried in order when none are given explicitly.
+# Values are in the units of the export's coordinate system (metres for a
+# projected system, degrees for geographic exports).
+COORDINATE_COLUMN_CANDIDATES = [
+    ('POINT_X', 'POINT_Y'),
+    ('x', 'y'),
+    ('X', 'Y'),
+    ('Longitude', 'Latitude'),
+    ('longitude', 'latitude'),
+    ('lon', 'lat'),
+]
+
+GEOGRAPHIC_COLUMNS = {('Longitude', 'Latitude'), ('longitude', 'latitude'), ('lon', 'lat')}
+
+# --units: 'auto' goes by the column names, and by the coordinate ranges for
+# other columns (ArcPro "Add XY" on a GCS layer writes degrees to
+# POINT_X/POINT_Y)
+UNIT_CHOICES = ['auto', 'projected', 'degrees']
+
+# Cell indices are packed into one int64 key; offsets keep them non-negative
+_KEY_OFFSET = 1 << 30
+_KEY_SHIFT = 1 << 31
+
+def detect_coordinate_columns(fieldnames):
+    for x_col, y_col in COORDINATE_COLUMN_CANDIDATES:
+        if x_col in fieldnames and y_col in fieldnames:
+            return x_col, y_col
+    return None, None
+
+def looks_geographic(x, y):
+    """True if every coordinate is a plausible longitude/latitude in degrees."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return bool(len(x)) and bool((np.abs(x) <= 180.0).all() and (np.abs(y) <= 90.0).all())
+
+def project_to_metres(lon, lat):
+    """
+    Equirectangular projection of degree coordinates to approximate metres,
+    good enough for neighbour distances at county/state scale.
+    """
+    lat0 = math.radians(float(np.mean(lat))) if len(lat) else 0.0
+    return lon * 111320.0 * math.cos(lat0), lat * 110540.0
+
+def _encode(ci, cj):
+    return (ci + _KEY_OFFSET) * _KEY_SHIFT + (cj + _KEY_OFFSET)
+
+class GridIndex:
+    """
+    Uniform grid over a point set. Points are sorted by cell so the members
+    of any cell are a contiguous slice, and neighbour queries for many query
+    points are answered one cell offset at a time with vectorized NumPy.
+    """
+    def __init__(self, x, y, cell_size):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cell_size = float(cell_size)
+
+        ci, cj = self.cell_of(self.x, self.y)
+        keys = _encode(ci, cj)
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.cell_ci = self.cell_keys // _KEY_SHIFT - _KEY_OFFSET
+        self.cell_cj = self.cell_keys % _KEY_SHIFT - _KEY_OFFSET
+
+        if len(self.x):
+            self.ci_range = (int(ci.min()), int(ci.max()))
+            self.cj_range = (int(cj.min()), int(cj.max()))
+        else:
+            self.ci_range = self.cj_range = (0, 0)
+
+    def cell_of(self, x, y):
+        return np.floor(x / self.cell_size).astype(np.int64), np.floor(y / self.cell_size).astype(np.int64)
+
+    def _candidates(self, qi, qj, dx, dy):
+        """
+        Returns (query position, point index) pairs for every indexed point in
+        the cell at offset (dx, dy) from each query's cell.
+        """
+        if not len(self.cell_keys):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        keys = _encode(qi + dx, qj + dy)
+        pos = np.searchsorted(self.cell_keys, keys)
+        pos[pos == len(self.cell_keys)] = 0
+        hit = np.nonzero(self.cell_keys[pos] == keys)[0]
+        counts = self.cell_counts[pos[hit]]
+        starts = self.cell_starts[pos[hit]]
+
+        query_pos = np.repeat(hit, counts)
+        within = np.arange(len(query_pos)) - np.repeat(np.cumsum(counts) - counts, counts)
+        point_idx = self.order[np.repeat(starts, counts) + within]
+        return query_pos, point_idx
+
+    def nearest_distance(self, qx, qy):
+        """
+        Distance from each query point to the nearest indexed point (inf when
+        the index is empty). Searches rings of cells outward and retires a
+        query once no unvisited ring can hold a closer point. Once the rings
+        would have visited more cells than the grid has occupied cells, the
+        queries still active scan the occupied cells directly instead.
+        """
+        qx = np.asarray(qx, dtype=np.float64)
+        qy = np.asarray(qy, dtype=np.float64)
+        best = np.full(len(qx), np.inf)
+        if not len(self.x) or not len(qx):
+            return best
+
+        qi, qj = self.cell_of(qx, qy)
+        max_ring = max(
+            qi.max() - self.ci_range[0], self.ci_range[1] - qi.min(),
+            qj.max() - self.cj_range[0], self.cj_range[1] - qj.min(),
+        )
+
+        active = np.arange(len(qx))
+        ring = visited = 0
+        while len(active) and ring <= max_ring:
+            offsets = _ring_offsets(ring)
+            visited += len(offsets)
+            if visited > len(self.cell_keys):
+                best[active] = self._scan_cells(qx[active], qy[active], best[active])
+                break
+            a_qi, a_qj = qi[active], qj[active]
+            a_best = best[active]
+            for dx, dy in offsets:
+                query_pos, point_idx = self._candidates(a_qi, a_qj, dx, dy)
+                if len(query_pos):
+                    d = np.hypot(self.x[point_idx] - qx[active[query_pos]], self.y[point_idx] - qy[active[query_pos]])
+                    np.minimum.at(a_best, query_pos, d)
+            best[active] = a_best
+            # Every point outside rings 0..ring is at least ring * cell_size away
+            active = active[a_best > ring * self.cell_size]
+            ring += 1
+        return best
+
+    def _scan_cells(self, qx, qy, best):
+        """
+        Nearest distances by visiting every occupied cell, skipping the cells
+        that cannot hold a point closer than each query's current best.
+        """
+        best = best.copy()
+        size = self.cell_size
+        for ci, cj, start, count in zip(self.cell_ci, self.cell_cj, self.cell_starts, self.cell_counts):
+            gap_x = np.maximum(np.maximum(ci * size - qx, qx - (ci + 1) * size), 0.0)
+            gap_y = np.maximum(np.maximum(cj * size - qy, qy - (cj + 1) * size), 0.0)
+            near = np.nonzero(np.hypot(gap_x, gap_y) < best)[0]
+            if len(near):
+                members = self.order[start:start + count]
+                d = np.hypot(self.x[members][None, :] - qx[near, None], self.y[members][None, :] - qy[near, None])
+                best[near] = np.minimum(best[near], d.min(axis=1))
+        return best
+
+    def count_within(self, qx, qy, radius):
+        """Number of indexed points within `radius` of each query point."""
+        qx = np.asarray(qx, dtype=np.float64)
+        qy = np.asarray(qy, dtype=np.float64)
+        counts = np.zeros(len(qx), dtype=np.int64)
+        if not len(self.x) or not len(qx):
+            return counts
+
+        qi, qj = self.cell_of(qx, qy)
+        reach = int(math.ceil(radius / self.cell_size))
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                # Skip cells that cannot hold a point within the radius
+                gap_x = max(abs(dx) - 1, 0) * self.cell_size
+                gap_y = max(abs(dy) - 1, 0) * self.cell_size
+                if gap_x * gap_x + gap_y * gap_y > radius * radius:
+                    continue
+                query_pos, point_idx = self._candidates(qi, qj, dx, dy)
+                if len(query_pos):
+                    d = np.hypot(self.x[point_idx] - qx[query_pos], self.y[point_idx] - qy[query_pos])
+                    counts += np.bincount(query_pos[d <= radius], minlength=len(qx))
+        return counts
+
+def _ring_offsets(ring):
+    if ring == 0:
+        return [(0, 0)]
+    offsets = []
+    for d in range(-ring, ring + 1):
+        offsets.append((d, -ring))
+        offsets.append((d, ring))
+    for d in range(-ring + 1, ring):
+        offsets.append((-ring, d))
+        offsets.append((ring, d))
+    return offsets
+
+class SpatialIndex:
+    """
+    Spatial index over one set of sites. The nearest-neighbour grid is sized
+    from the point density; radius counts use a grid whose cell matches the
+    radius. Grids are built once per cell size and reused across queries.
+    """
+    def __init__(self, x, y, extent_area=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self._grids = {}
+
+        if extent_area is None and len(self.x):
+            extent_area = (self.x.max() - self.x.min()) * (self.y.max() - self.y.min())
+        # About two points per cell on average; points on a line (no area)
+        # get two per cell along its length
+        extent_length = max(np.ptp(self.x), np.ptp(self.y)) if len(self.x) else 0.0
+        if len(self.x) and extent_area:
+            self.nearest_cell_size = math.sqrt(2.0 * extent_area / len(self.x))
+        elif extent_length:
+            self.nearest_cell_size = 2.0 * float(extent_length) / len(self.x)
+        else:
+            self.nearest_cell_size = 1.0
+
+    def grid(self, cell_size):
+        if cell_size not in self._grids:
+            self._grids[cell_size] = GridIndex(self.x, self.y, cell_size)
+        return self._grids[cell_size]
+
+    def nearest_distance(self, qx, qy):
+        return self.grid(self.nearest_cell_size).nearest_distance(qx, qy)
+
+    def count_within(self, qx, qy, radius):
+        return self.grid(float(radius)).count_within(qx, qy, radius)
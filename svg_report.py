@@ -0,0 +1,197 @@
+import json
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+# Standard-library chart rendering for generate_report: each function returns
+# a standalone <svg> document as a string, so charts can be written as .svg
+# files or inlined in the HTML report.
+
+FONT = 'font-family="Helvetica, Arial, sans-serif"'
+CHAR_WIDTH = 6.5  # approximate width of a 12px character, for layout only
+AXIS_COLOR = '#444444'
+GRID_COLOR = '#dddddd'
+DEFAULT_COLORS = ['#4c72b0', '#dd8452', '#55a868', '#c44e52', '#8172b3']
+
+# Light yellow -> orange -> dark red, like matplotlib's YlOrRd
+HEAT_STOPS = [(255, 255, 204), (254, 217, 118), (253, 141, 60), (227, 26, 28), (128, 0, 38)]
+
+def _num(value):
+    return f"{value:.1f}".rstrip('0').rstrip('.')
+
+def _text(x, y, label, size=12, anchor='middle', extra=''):
+    return (f'<text x="{_num(x)}" y="{_num(y)}" font-size="{size}" text-anchor="{anchor}" {FONT}{extra}>'
+            f'{escape(str(label))}</text>')
+
+def _multiline(x, y, label, size=12, anchor='middle'):
+    lines = str(label).split('\n')
+    spans = ''.join(f'<tspan x="{_num(x)}" dy="{0 if i == 0 else size + 2}">{escape(line)}</tspan>'
+                    for i, line in enumerate(lines))
+    return f'<text x="{_num(x)}" y="{_num(y)}" font-size="{size}" text-anchor="{anchor}" {FONT}>{spans}</text>'
+
+def _document(width, height, title, body):
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}" role="img" aria-label={quoteattr(title)}>'
+            f'<title>{escape(title)}</title><rect width="100%" height="100%" fill="white"/>'
+            + _text(width / 2, 24, title, size=16, extra=' font-weight="bold"')
+            + ''.join(body) + '</svg>\n')
+
+def nice_ticks(maximum, count=5):
+    """Round axis ticks from 0 covering `maximum` (steps of 1, 2 or 5 x 10^k)."""
+    if maximum <= 0:
+        return [0, 1]
+    raw = maximum / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    if step < 1:
+        step = 1
+    top = step * math.ceil(maximum / step)
+    return [i * step for i in range(int(round(top / step)) + 1)]
+
+def bar_chart(categories, values, title, ylabel='', colors=None, width=640, height=400):
+    """Vertical bars with value labels; category labels may contain newlines."""
+    left, right, top, bottom = 70, 20, 50, 60
+    plot_w, plot_h = width - left - right, height - top - bottom
+    ticks = nice_ticks(max(values) if values else 0)
+    scale = plot_h / ticks[-1]
+    body = []
+    for tick in ticks:
+        y = top + plot_h - tick * scale
+        body.append(f'<line x1="{left}" y1="{_num(y)}" x2="{width - right}" y2="{_num(y)}" stroke="{GRID_COLOR}"/>')
+        body.append(_text(left - 8, y + 4, f"{tick:g}", size=11, anchor='end'))
+    slot = plot_w / max(len(values), 1)
+    bar_w = slot * 0.6
+    palette = colors or DEFAULT_COLORS[:1]
+    for i, (category, value) in enumerate(zip(categories, values)):
+        x = left + i * slot + (slot - bar_w) / 2
+        h = value * scale
+        color = palette[i % len(palette)]
+        body.append(f'<rect x="{_num(x)}" y="{_num(top + plot_h - h)}" width="{_num(bar_w)}" height="{_num(h)}" fill="{color}">'
+                    f'<title>{escape(str(category).replace(chr(10), " "))}: {value}</title></rect>')
+        body.append(_text(x + bar_w / 2, top + plot_h - h - 5, value, size=11))
+        body.append(_multiline(x + bar_w / 2, top + plot_h + 18, category))
+    body.append(f'<line x1="{left}" y1="{top + plot_h}" x2="{width - right}" y2="{top + plot_h}" stroke="{AXIS_COLOR}"/>')
+    body.append(f'<line x1="{left}" y1="{top}" x2="{left}" y2="{top + plot_h}" stroke="{AXIS_COLOR}"/>')
+    if ylabel:
+        body.append(_text(18, top + plot_h / 2, ylabel, extra=f' transform="rotate(-90 18 {_num(top + plot_h / 2)})"'))
+    return _document(width, height, title, body)
+
+def hbar_chart(labels, values, title, xlabel='', color='teal', width=760):
+    """Horizontal bars, first label at the top; the height follows the number of bars."""
+    label_w = min(320, 16 + CHAR_WIDTH * max((len(str(label)) for label in labels), default=0))
+    left, right, top, bottom = label_w, 60, 50, 50
+    row_h = 24
+    height = top + bottom + row_h * max(len(values), 1)
+    plot_w = width - left - right
+    ticks = nice_ticks(max(values) if values else 0)
+    scale = plot_w / ticks[-1]
+    body = []
+    for tick in ticks:
+        x = left + tick * scale
+        body.append(f'<line x1="{_num(x)}" y1="{top}" x2="{_num(x)}" y2="{height - bottom}" stroke="{GRID_COLOR}"/>')
+        body.append(_text(x, height - bottom + 16, f"{tick:g}", size=11))
+    for i, (label, value) in enumerate(zip(labels, values)):
+        y = top + i * row_h
+        w = value * scale
+        body.append(f'<rect x="{left}" y="{y + 4}" width="{_num(w)}" height="{row_h - 8}" fill="{color}">'
+                    f'<title>{escape(str(label))}: {value}</title></rect>')
+        body.append(_text(left - 6, y + row_h / 2 + 4, label, size=11, anchor='end'))
+        body.append(_text(left + w + 4, y + row_h / 2 + 4, value, size=11, anchor='start'))
+    body.append(f'<line x1="{left}" y1="{top}" x2="{left}" y2="{height - bottom}" stroke="{AXIS_COLOR}"/>')
+    if xlabel:
+        body.append(_text(left + plot_w / 2, height - 12, xlabel))
+    return _document(width, height, title, body)
+
+def pie_chart(labels, sizes, title, colors=None, width=560, height=420):
+    """Pie with percentage labels and a legend. Zero-sized slices are left out."""
+    cx, cy, r = 200, 230, 150
+    total = float(sum(sizes))
+    body = []
+    angle = -math.pi / 2
+    palette = colors or DEFAULT_COLORS
+    for i, (label, size) in enumerate(zip(labels, sizes)):
+        color = palette[i % len(palette)]
+        body.append(f'<rect x="{2 * cx + 10}" y="{60 + i * 22}" width="14" height="14" fill="{color}"/>')
+        body.append(_text(2 * cx + 30, 72 + i * 22, f"{label} ({size})", size=11, anchor='start'))
+        if not total or not size:
+            continue
+        sweep = 2 * math.pi * size / total
+        tip = f'<title>{escape(str(label))}: {size}</title>'
+        if size == total:
+            body.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}">{tip}</circle>')
+        else:
+            x1, y1 = cx + r * math.cos(angle), cy + r * math.sin(angle)
+            x2, y2 = cx + r * math.cos(angle + sweep), cy + r * math.sin(angle + sweep)
+            large = 1 if sweep > math.pi else 0
+            body.append(f'<path d="M{cx},{cy} L{_num(x1)},{_num(y1)} A{r},{r} 0 {large} 1 {_num(x2)},{_num(y2)} Z" '
+                        f'fill="{color}" stroke="white">{tip}</path>')
+        mid = angle + sweep / 2
+        body.append(_text(cx + 0.6 * r * math.cos(mid), cy + 0.6 * r * math.sin(mid) + 4, f"{size / total * 100:.1f}%"))
+        angle += sweep
+    return _document(width, height, title, body)
+
+def heat_color(fraction):
+    """Colour for a value scaled to 0-1 on the HEAT_STOPS ramp."""
+    fraction = min(max(fraction, 0.0), 1.0) * (len(HEAT_STOPS) - 1)
+    i = min(int(fraction), len(HEAT_STOPS) - 2)
+    t = fraction - i
+    rgb = [round(a + (b - a) * t) for a, b in zip(HEAT_STOPS[i], HEAT_STOPS[i + 1])]
+    return '#%02x%02x%02x' % tuple(rgb)
+
+def heatmap(row_labels, col_labels, values, title, width=None):
+    """Grid of counts (values[row][col]) shaded by size, with the count in each cell."""
+    label_w = min(320, 16 + CHAR_WIDTH * max((len(str(label)) for label in row_labels), default=0))
+    cell_w, cell_h = 90, 24
+    left, top, bottom = label_w, 90, 20
+    width = width or left + cell_w * len(col_labels) + 20
+    height = top + cell_h * len(row_labels) + bottom
+    peak = max((v for row in values for v in row), default=0) or 1
+    body = []
+    for j, label in enumerate(col_labels):
+        x = left + j * cell_w + cell_w / 2
+        body.append(_text(x, top - 8, label, size=11, anchor='start', extra=f' transform="rotate(-30 {_num(x)} {top - 8})"'))
+    for i, (label, row) in enumerate(zip(row_labels, values)):
+        y = top + i * cell_h
+        body.append(_text(left - 6, y + cell_h / 2 + 4, label, size=11, anchor='end'))
+        for j, value in enumerate(row):
+            x = left + j * cell_w
+            body.append(f'<rect x="{x}" y="{y}" width="{cell_w}" height="{cell_h}" fill="{heat_color(value / peak)}" stroke="white">'
+                        f'<title>{escape(str(label))} / {escape(str(col_labels[j]))}: {value}</title></rect>')
+            text_color = ' fill="white"' if value / peak > 0.6 else ''
+            body.append(_text(x + cell_w / 2, y + cell_h / 2 + 4, value, size=11, extra=text_color))
+    return _document(width, height, title, body)
+
+def html_page(title, header_lines, sections, figures, data, appendix=None):
+    """
+    One self-contained HTML document: `header_lines` under the title,
+    `sections` as (heading, preformatted text), inline SVG `figures` as
+    (caption, svg) and `data` embedded as JSON in a script element with id
+    "report-data". `appendix` is an optional (summary, text) collapsed at
+    the end.
+    """
+    parts = ['<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n',
+             f'<title>{escape(title)}</title>\n',
+             '<style>\n'
+             'body { font-family: Helvetica, Arial, sans-serif; margin: 2em auto; max-width: 1000px; color: #222; }\n'
+             'h1 { border-bottom: 2px solid #8b0000; padding-bottom: 0.2em; }\n'
+             'h2 { margin-top: 1.6em; color: #8b0000; }\n'
+             'pre { background: #f6f6f6; padding: 0.8em; white-space: pre-wrap; }\n'
+             'figure { margin: 1.5em 0; } figcaption { font-size: 0.9em; color: #555; }\n'
+             'svg { max-width: 100%; height: auto; }\n'
+             '</style>\n</head>\n<body>\n',
+             f'<h1>{escape(title)}</h1>\n']
+    for line in header_lines:
+        parts.append(f'<p>{escape(line)}</p>\n')
+    for heading, text in sections:
+        parts.append(f'<section>\n<h2>{escape(heading)}</h2>\n<pre>{escape(text)}</pre>\n</section>\n')
+    if figures:
+        parts.append('<section>\n<h2>Charts</h2>\n')
+        for caption, svg in figures:
+            parts.append(f'<figure>\n{svg}<figcaption>{escape(caption)}</figcaption>\n</figure>\n')
+        parts.append('</section>\n')
+    if appendix:
+        summary, text = appendix
+        parts.append(f'<details>\n<summary>{escape(summary)}</summary>\n<pre>{escape(text)}</pre>\n</details>\n')
+    # "</" cannot appear inside a script element
+    payload = json.dumps(data, indent=1, sort_keys=True).replace('</', '<\\/')
+    parts.append(f'<script type="application/json" id="report-data">\n{payload}\n</script>\n</body>\n</html>\n')
+    return ''.join(parts)
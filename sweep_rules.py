@@ -0,0 +1,381 @@
+import os
+import csv
+import sys
+import time
+import difflib
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+import csv_utils_helpers
+import classify_sites
+
+# Increase CSV field size limit to handle large fields
+csv_utils_helpers.increase_csv_field_size_limit()
+
+DEFAULT_INPUT_FILE = classify_sites.INPUT_FILE
+DEFAULT_LABELS_FILE = 'expert_classified.csv'
+DEFAULT_OUTPUT_FILE = 'rule_sweep.csv'
+
+# Default grid; each list includes the setting classify_sites uses
+DEFAULT_TYPO_CUTOFFS = [0.75, 0.8, 0.85, 0.9, 0.95]
+DEFAULT_NEGATION_CHARS = [15, 20, 30, 45, 60]
+DEFAULT_NEGATION_WORDS = [2, 3, 5, 8]
+DEFAULT_EXCLUSION_CHARS = [0, 25, 50, 100, 200]
+
+# Label columns scored, in output order. Is_Prehistoric comes straight from
+# the expert file; the class labels are derived from Refined_Context.
+TARGETS = ['Is_Prehistoric', 'Class_1', 'Class_2', 'Class_3']
+METRICS = ['mean'] + TARGETS
+
+UNLABELED = -1
+
+def current_settings():
+    """The (typo cutoff, negation chars, negation words, exclusion chars) classify_sites runs with."""
+    return (classify_sites.TYPO_CUTOFF, classify_sites.NEGATION_CHARS, classify_sites.NEGATION_WORDS,
+            classify_sites.EXCLUSION_CONTEXT_CHARS)
+
+def _parse_flag(value):
+    value = (value or '').strip().upper()
+    if value in ('TRUE', 'T', 'YES', '1'):
+        return 1
+    if value in ('FALSE', 'F', 'NO', '0'):
+        return 0
+    return UNLABELED
+
+def load_labels(labels_file, classifier):
+    """
+    Expert labels by trinomial, as [Is_Prehistoric, Class_1, Class_2, Class_3]
+    with 1, 0 or UNLABELED. Rows with a Refined_Context label every class:
+    a class is present when the context names one of its keywords. Later
+    rows for an already labeled trinomial are ignored.
+    """
+    class_re_lists = [classifier.class_1_re_list, classifier.class_2_re_list, classifier.class_3_re_list]
+    labels = {}
+    with open(labels_file, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        for row in csv.DictReader(f):
+            trinomial = (row.get('trinomial') or '').strip().upper()
+            if not trinomial or trinomial in labels:
+                continue
+            label = [_parse_flag(row.get('Is_Prehistoric'))] + [UNLABELED] * 3
+            context = classify_sites.normalize_text(row.get('Refined_Context') or '')
+            if context:
+                for k, re_list in enumerate(class_re_lists):
+                    label[k + 1] = int(any(regex.search(context) for _, regex in re_list))
+            labels[trinomial] = label
+    return labels
+
+def read_labeled_tokens(input_file, labels, classifier):
+    """
+    Normalized (uncorrected) tokens of each labeled site's description,
+    cleaned and truncated as classify_sites does. Returns (trinomials,
+    token lists) in input order, first row per trinomial.
+    """
+    trinomials = []
+    documents = []
+    seen = set()
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.DictReader(f)
+        if 'trinomial' not in (reader.fieldnames or []):
+            print(f"Error: {input_file} has no 'trinomial' column to join the expert labels on.")
+            sys.exit(1)
+        for row in reader:
+            trinomial = (row.get('trinomial') or '').strip().upper()
+            if trinomial not in labels or trinomial in seen:
+                continue
+            seen.add(trinomial)
+            text = classifier.truncate(csv_utils_helpers.clean_value(row.get('Concat_site_variables') or ''))
+            trinomials.append(trinomial)
+            documents.append(classify_sites.tokenize(text))
+    return trinomials, documents
+
+def closest_targets(words, min_cutoff):
+    """
+    {word: (similarity, typo target)} for the words classify_sites would try
+    to correct at some cutoff >= min_cutoff. get_close_matches(word,
+    TYPO_TARGETS, n=1, cutoff=c) returns the best-scoring target exactly when
+    its score is >= c, so one comparison per word serves every cutoff.
+    """
+    matcher = difflib.SequenceMatcher()
+    closest = {}
+    for word in words:
+        if not classify_sites.needs_correction(word):
+            continue
+        matcher.set_seq2(word)
+        best = (0.0, word)
+        for target in classify_sites.TYPO_TARGETS:
+            matcher.set_seq1(target)
+            best = max(best, (matcher.ratio(), target))
+        if best[0] >= min_cutoff:
+            closest[word] = best
+    return closest
+
+def correct_at(tokens, closest, cutoff):
+    corrected = []
+    for word in tokens:
+        best = closest.get(word)
+        corrected.append(best[1] if best is not None and best[0] >= cutoff else word)
+    return corrected
+
+_worker = {}
+
+def _init_scan(negation_settings, exclusion_settings):
+    _worker['classifier'] = classify_sites.SiteClassifier()
+    _worker['negation'] = negation_settings
+    _worker['exclusion'] = exclusion_settings
+
+def scan_document(tokens):
+    """
+    Every rock material and class keyword match in a typo-corrected
+    document, with its negation outcome under each negation setting and its
+    exclusion outcome under each exclusion width. Returns (class ids,
+    dependency flags, negated rows, excluded rows, prehistoric).
+    """
+    classifier = _worker['classifier']
+    negation_settings = _worker['negation']
+    exclusion_settings = _worker['exclusion']
+    document = classify_sites.Document(tokens, tokens)
+    text = document.text
+    windows = classifier.scan_windows(text)
+    # One negation walk per character width covers every word window
+    negation_chars = sorted({chars for chars, _ in negation_settings})
+    max_words = max(words for _, words in negation_settings)
+
+    class_ids, dependency, negated, excluded = [], [], [], []
+    for class_id, re_list in ((0, classifier.rock_material_re_list), (1, classifier.class_1_re_list),
+                              (2, classifier.class_2_re_list), (3, classifier.class_3_re_list)):
+        for win_start, win_end, endpos in windows:
+            for kw, regex in re_list:
+                for match in regex.finditer(text, win_start, endpos):
+                    start, end = match.span()
+                    if start >= win_end:
+                        break
+                    class_ids.append(class_id)
+                    dependency.append(class_id == 2 and kw in classify_sites.CLASS_2_DEPENDENCY_KEYWORDS)
+                    ranks = {chars: document.negation_rank(start, chars, max_words) for chars in negation_chars}
+                    negated.append([ranks[chars] is not None and ranks[chars] < words for chars, words in negation_settings])
+                    if kw in classifier.exclusion_keywords:
+                        excluded.append([classify_sites.is_excluded_context(text[max(0, start - c):min(len(text), end + c)], kw)
+                                         for c in exclusion_settings])
+                    else:
+                        excluded.append([False] * len(exclusion_settings))
+    prehistoric = bool(classifier.find_prehistoric_evidence(document))
+    return class_ids, dependency, negated, excluded, prehistoric
+
+class MatchCache:
+    """
+    Candidate matches of the labeled documents at each typo cutoff, as flat
+    NumPy arrays: the document and class of each match, whether it is a
+    Class 2 keyword that needs rock material, and boolean matrices of its
+    negation outcome per negation setting and exclusion outcome per
+    exclusion width. A document that corrects to the same tokens at several
+    cutoffs (or repeats another document) is scanned once.
+    """
+    def __init__(self, documents, typo_cutoffs, negation_settings, exclusion_settings, workers=1):
+        self.typo_cutoffs = list(typo_cutoffs)
+        self.negation_settings = list(negation_settings)
+        self.exclusion_settings = list(exclusion_settings)
+        self.doc_count = len(documents)
+
+        closest = closest_targets({word for tokens in documents for word in tokens}, min(self.typo_cutoffs))
+
+        # Distinct corrected texts and, per cutoff, the text of each document
+        variant_ids = {}
+        variants = []
+        doc_variants = []
+        for cutoff in self.typo_cutoffs:
+            ids = []
+            for tokens in documents:
+                key = " ".join(correct_at(tokens, closest, cutoff))
+                if key not in variant_ids:
+                    variant_ids[key] = len(variants)
+                    variants.append(key.split())
+                ids.append(variant_ids[key])
+            doc_variants.append(ids)
+        self.variant_count = len(variants)
+
+        scan_args = (self.negation_settings, self.exclusion_settings)
+        if workers > 1 and len(variants) > 1:
+            with multiprocessing.Pool(workers, _init_scan, scan_args) as pool:
+                scanned = pool.map(scan_document, variants, chunksize=max(1, len(variants) // (workers * 8)))
+        else:
+            _init_scan(*scan_args)
+            scanned = [scan_document(tokens) for tokens in variants]
+
+        self.matches = [self._assemble(ids, scanned) for ids in doc_variants]
+
+    def _assemble(self, variant_ids, scanned):
+        doc, class_id, dependency, negated, excluded = [], [], [], [], []
+        prehistoric = np.zeros(self.doc_count, dtype=bool)
+        for i, variant in enumerate(variant_ids):
+            v_class, v_dependency, v_negated, v_excluded, v_prehistoric = scanned[variant]
+            doc.extend([i] * len(v_class))
+            class_id.extend(v_class)
+            dependency.extend(v_dependency)
+            negated.extend(v_negated)
+            excluded.extend(v_excluded)
+            prehistoric[i] = v_prehistoric
+        return {
+            'doc': np.array(doc, dtype=np.int64),
+            'class_id': np.array(class_id, dtype=np.int64),
+            'dependency': np.array(dependency, dtype=bool),
+            'negated': np.array(negated, dtype=bool).reshape(len(doc), len(self.negation_settings)),
+            'excluded': np.array(excluded, dtype=bool).reshape(len(doc), len(self.exclusion_settings)),
+            'prehistoric': prehistoric,
+        }
+
+    def predict(self, cutoff_index, negation_index, exclusion_index):
+        """Is_Prehistoric and Class 1-3 predictions, shape (4, documents), for one setting."""
+        m = self.matches[cutoff_index]
+        doc = m['doc']
+        class_id = m['class_id']
+        accepted = ~m['negated'][:, negation_index] & ~m['excluded'][:, exclusion_index]
+
+        rock_present = np.zeros(self.doc_count, dtype=bool)
+        rock_present[doc[accepted & (class_id == 0)]] = True
+        accepted &= ~(m['dependency'] & ~rock_present[doc])
+
+        found = np.zeros((4, self.doc_count), dtype=bool)
+        found[class_id[accepted], doc[accepted]] = True
+        found[0] = m['prehistoric']
+        return found
+
+def accuracies(predictions, labels):
+    """Accuracy per target over its labeled documents (None where none is labeled)."""
+    scores = []
+    for k in range(len(TARGETS)):
+        labeled = labels[:, k] != UNLABELED
+        if not labeled.any():
+            scores.append(None)
+            continue
+        scores.append(float(np.mean(predictions[k][labeled] == (labels[labeled, k] == 1))))
+    return scores
+
+def _init_sweep(cache, labels):
+    _worker['cache'] = cache
+    _worker['labels'] = labels
+
+def evaluate(combo):
+    cache = _worker['cache']
+    return accuracies(cache.predict(*combo), _worker['labels'])
+
+def sweep(cache, labels, workers=1):
+    """Scores every (cutoff, negation, exclusion) index combination. Returns [(combo, accuracies)]."""
+    combos = list(itertools.product(range(len(cache.typo_cutoffs)), range(len(cache.negation_settings)),
+                                    range(len(cache.exclusion_settings))))
+    if workers > 1 and len(combos) > 1:
+        with multiprocessing.Pool(workers, _init_sweep, (cache, labels)) as pool:
+            scores = pool.map(evaluate, combos, chunksize=max(1, len(combos) // (workers * 4)))
+    else:
+        _init_sweep(cache, labels)
+        scores = [evaluate(combo) for combo in combos]
+    return list(zip(combos, scores))
+
+def rank_results(cache, results, metric='mean'):
+    """
+    Rows for the output table, best first. `metric` is a target name or
+    'mean' (the mean accuracy of the labeled targets). Ties keep the
+    current settings first, then grid order.
+    """
+    current = current_settings()
+    rows = []
+    for (t, n, e), scores in results:
+        settings = (cache.typo_cutoffs[t],) + tuple(cache.negation_settings[n]) + (cache.exclusion_settings[e],)
+        labeled = [s for s in scores if s is not None]
+        if metric == 'mean':
+            score = sum(labeled) / len(labeled) if labeled else 0.0
+        else:
+            score = scores[TARGETS.index(metric)]
+            score = 0.0 if score is None else score
+        rows.append((score, settings == current, settings, scores))
+    rows.sort(key=lambda r: (-r[0], not r[1]))
+
+    ranked = []
+    for rank, (score, is_current, settings, scores) in enumerate(rows, 1):
+        row = {
+            'Rank': rank,
+            'Typo_Cutoff': settings[0],
+            'Negation_Chars': settings[1],
+            'Negation_Words': settings[2],
+            'Exclusion_Chars': settings[3],
+            'Score': f"{score:.4f}",
+            'Current': 'yes' if is_current else '',
+        }
+        for target, value in zip(TARGETS, scores):
+            row[f'{target}_Accuracy'] = '' if value is None else f"{value:.4f}"
+        ranked.append(row)
+    return ranked
+
+OUTPUT_FIELDS = (['Rank', 'Typo_Cutoff', 'Negation_Chars', 'Negation_Words', 'Exclusion_Chars', 'Score']
+                 + [f'{target}_Accuracy' for target in TARGETS] + ['Current'])
+
+def write_results(output_file, ranked):
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(ranked)
+
+def main(input_file=DEFAULT_INPUT_FILE, labels_file=DEFAULT_LABELS_FILE, output_file=DEFAULT_OUTPUT_FILE,
+         typo_cutoffs=None, negation_chars=None, negation_words=None, exclusion_chars=None,
+         metric='mean', workers=1, top=10):
+    for path in (input_file, labels_file):
+        if not os.path.exists(path):
+            print(f"Error: Input file '{path}' not found.")
+            sys.exit(1)
+
+    typo_cutoffs = sorted(set(typo_cutoffs or DEFAULT_TYPO_CUTOFFS))
+    negation_settings = list(itertools.product(sorted(set(negation_chars or DEFAULT_NEGATION_CHARS)),
+                                               sorted(set(negation_words or DEFAULT_NEGATION_WORDS))))
+    exclusion_settings = sorted(set(exclusion_chars if exclusion_chars is not None else DEFAULT_EXCLUSION_CHARS))
+
+    classifier = classify_sites.SiteClassifier()
+    labels_by_site = load_labels(labels_file, classifier)
+    trinomials, documents = read_labeled_tokens(input_file, labels_by_site, classifier)
+    if not documents:
+        print(f"Error: No site in {input_file} has a label in {labels_file}.")
+        sys.exit(1)
+    labels = np.array([labels_by_site[t] for t in trinomials], dtype=np.int8)
+    counts = ", ".join(f"{target} {int(np.sum(labels[:, k] != UNLABELED))}" for k, target in enumerate(TARGETS))
+    print(f"Labeled sites found in {input_file}: {len(documents)} of {len(labels_by_site)} ({counts}).")
+
+    start = time.perf_counter()
+    cache = MatchCache(documents, typo_cutoffs, negation_settings, exclusion_settings, workers)
+    print(f"Scanned {cache.variant_count} distinct corrected texts for {len(typo_cutoffs)} typo cutoffs "
+          f"in {time.perf_counter() - start:.1f}s.")
+
+    start = time.perf_counter()
+    results = sweep(cache, labels, workers)
+    print(f"Scored {len(results)} settings in {time.perf_counter() - start:.1f}s.")
+
+    ranked = rank_results(cache, results, metric)
+    write_results(output_file, ranked)
+
+    print(f"\nTop settings by {metric} accuracy:")
+    print("Rank  Cutoff  Neg chars  Neg words  Excl chars  Score")
+    for row in ranked[:top]:
+        marker = "  (current)" if row['Current'] else ""
+        print(f"{row['Rank']:>4}  {row['Typo_Cutoff']:>6}  {row['Negation_Chars']:>9}  {row['Negation_Words']:>9}  "
+              f"{row['Exclusion_Chars']:>10}  {row['Score']}{marker}")
+    current = [row for row in ranked if row['Current']]
+    if current and current[0]['Rank'] > top:
+        print(f"Current settings rank {current[0]['Rank']} (score {current[0]['Score']}).")
+    print(f"Full table written to {output_file}")
+    return ranked
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score combinations of negation, exclusion and typo settings against expert labels.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT_FILE,
+                        help="CSV with trinomial and Concat_site_variables columns (concatenated or classified output).")
+    parser.add_argument("--labels", default=DEFAULT_LABELS_FILE, help="Expert labels CSV (trinomial, Is_Prehistoric, Refined_Context).")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT_FILE, help="Ranked results CSV.")
+    parser.add_argument("--typo-cutoffs", type=float, nargs="+", help=f"Typo similarity cutoffs (default: {DEFAULT_TYPO_CUTOFFS}).")
+    parser.add_argument("--negation-chars", type=int, nargs="+", help=f"Characters checked for negation before a match (default: {DEFAULT_NEGATION_CHARS}).")
+    parser.add_argument("--negation-words", type=int, nargs="+", help=f"Words checked for negation before a match (default: {DEFAULT_NEGATION_WORDS}).")
+    parser.add_argument("--exclusion-chars", type=int, nargs="+", help=f"Context searched for exclusion terms around a match (default: {DEFAULT_EXCLUSION_CHARS}).")
+    parser.add_argument("--metric", choices=METRICS, default='mean', help="Accuracy the table is ranked by.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to scan documents and score settings.")
+    parser.add_argument("--top", type=int, default=10, help="Rows of the ranking printed.")
+    args = parser.parse_args()
+
+    main(args.input, args.labels, args.output, args.typo_cutoffs, args.negation_chars, args.negation_words,
+         args.exclusion_chars, args.metric, args.workers, args.top)
@@ -0,0 +1,340 @@
+import os
+import csv
+import zlib
+import argparse
+from collections import Counter, defaultdict
+import numpy as np
+import csv_utils_helpers
+import classify_sites
+
+# Increase CSV field size limit to handle large fields
+csv_utils_helpers.increase_csv_field_size_limit()
+
+DEFAULT_INPUT_FILE = classify_sites.OUTPUT_FILE
+DEFAULT_OUTPUT_FILE = 'potential_synonyms.csv'
+DEFAULT_TEXT_COLUMN = 'Normalized_Text'
+
+# Terms are 1- to 3-word phrases (the longest class keyword has three words).
+# Two terms co-occur when the second starts at most WINDOW words after the
+# first ends.
+DEFAULT_MAX_NGRAM = 3
+DEFAULT_WINDOW = 5
+
+# Terms are hashed into 2**HASH_BITS vocabulary ids, so no term strings are
+# held while counting. Colliding terms share counts; at 4M ids this is rare
+# for the phrases that rank.
+DEFAULT_HASH_BITS = 22
+
+# Budget for the sparse pair counts. When the distinct pairs outgrow it the
+# rarest pairs are dropped (see CooccurrenceMatrix.prune_threshold).
+DEFAULT_MEMORY_MB = 256
+
+DEFAULT_MIN_COUNT = 5
+DEFAULT_TOP = 50
+
+# Words counted before a batch of documents is turned into pairs
+BATCH_WORDS = 200000
+
+# Occurrences read to name a hashed term in the second pass
+RESOLVE_SAMPLES = 50
+
+# Bytes per stored pair (int64 key + int64 count) times the headroom needed
+# to merge a flushed buffer into the store
+_BYTES_PER_PAIR = 16 * 3
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def seed_keywords():
+    """Seed keyword sets per class, as normalized token tuples."""
+    seeds = {
+        'Class 1': classify_sites.CLASS_1_SET,
+        'Class 2': classify_sites.CLASS_2_SET,
+        'Class 3': classify_sites.CLASS_3_SET,
+        'Burned Clay': classify_sites.BURNED_CLAY_SET,
+    }
+    return {label: sorted({tuple(classify_sites.tokenize(kw)) for kw in kws} - {()}) for label, kws in seeds.items()}
+
+class CooccurrenceMatrix:
+    """
+    Sparse, symmetric term-by-term co-occurrence counts over hashed term ids.
+
+    Pairs are stored as sorted int64 keys (low id * vocab size + high id)
+    with a parallel count array. New pairs are buffered per batch and merged
+    into the store with NumPy; term marginals are kept exactly in a dense
+    array indexed by term id.
+    """
+    def __init__(self, window=DEFAULT_WINDOW, max_ngram=DEFAULT_MAX_NGRAM, hash_bits=DEFAULT_HASH_BITS,
+                 memory_mb=DEFAULT_MEMORY_MB):
+        self.window = window
+        self.max_ngram = max_ngram
+        self.vocab_size = 1 << hash_bits
+        self.max_pairs = max(1024, memory_mb * 1024 * 1024 // _BYTES_PER_PAIR)
+
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.marginals = np.zeros(self.vocab_size, dtype=np.int64)
+        self.prune_threshold = 0
+        self.documents = 0
+
+        self._buffer = []
+        self._buffered = 0
+        self._word_hashes = {}
+
+    def _word_hash(self, word):
+        h = self._word_hashes.get(word)
+        if h is None:
+            h = self._word_hashes[word] = zlib.crc32(word.encode('utf-8')) + 1
+        return h
+
+    def term_ids(self, tokens):
+        """
+        Hashed ids of every n-gram of `tokens`: {n: int64 array with the id
+        of the n-gram starting at each position, or -1}. An n-gram is a term
+        when its first and last words are not stopwords and no position is a
+        document separator (None).
+        """
+        length = len(tokens)
+        hashes = np.fromiter((0 if t is None else self._word_hash(t) for t in tokens), dtype=np.uint64, count=length)
+        is_token = hashes != 0
+        is_word = np.fromiter((t is not None and len(t) > 2 and t not in classify_sites.STOPWORDS and not t.isdigit()
+                               for t in tokens), dtype=bool, count=length)
+
+        ids = {}
+        for n in range(1, self.max_ngram + 1):
+            span = length - n + 1
+            if span <= 0:
+                ids[n] = np.zeros(0, dtype=np.int64)
+                continue
+            h = np.full(span, n, dtype=np.uint64)
+            valid = is_word[:span] & is_word[n - 1:n - 1 + span]
+            for k in range(n):
+                h = (h ^ hashes[k:k + span]) * _MIX
+                valid &= is_token[k:k + span]
+            h ^= h >> np.uint64(31)
+            term = (h % np.uint64(self.vocab_size)).astype(np.int64)
+            term[~valid] = -1
+            ids[n] = term
+        return ids
+
+    def add_documents(self, documents):
+        """Counts the co-occurring term pairs of a batch of token lists."""
+        tokens = []
+        for doc in documents:
+            tokens.extend(doc)
+            # Separators keep pairs from spanning two documents
+            tokens.extend([None] * self.window)
+            self.documents += 1
+        if not tokens:
+            return
+
+        ids = self.term_ids(tokens)
+        length = len(tokens)
+        endpoints = []
+        for n in ids:
+            for m in ids:
+                for gap in range(self.window):
+                    count = length - n - gap - m + 1
+                    if count <= 0:
+                        continue
+                    a = ids[n][:count]
+                    b = ids[m][n + gap:n + gap + count]
+                    valid = (a >= 0) & (b >= 0)
+                    a, b = a[valid], b[valid]
+                    if not len(a):
+                        continue
+                    endpoints.extend((a, b))
+                    self._buffer.append(np.minimum(a, b) * self.vocab_size + np.maximum(a, b))
+                    self._buffered += len(a)
+        if endpoints:
+            self.marginals += np.bincount(np.concatenate(endpoints), minlength=self.vocab_size)
+
+        if self._buffered >= self.max_pairs:
+            self.flush()
+
+    def flush(self):
+        """Merges buffered pairs into the store, pruning rare pairs over budget."""
+        if not self._buffer:
+            return
+        new_keys, new_counts = np.unique(np.concatenate(self._buffer), return_counts=True)
+        self._buffer = []
+        self._buffered = 0
+
+        keys, inverse = np.unique(np.concatenate([self.keys, new_keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, new_counts]), minlength=len(keys))
+        self.keys, self.counts = keys, counts.astype(np.int64)
+
+        while len(self.keys) > self.max_pairs:
+            self.prune_threshold += 1
+            keep = self.counts > self.prune_threshold
+            self.keys, self.counts = self.keys[keep], self.counts[keep]
+
+    def context_counts(self, seed_ids):
+        """
+        Co-occurrence counts of every term with any of `seed_ids`. Returns
+        (term ids, counts) for the terms with at least one co-occurrence.
+        """
+        self.flush()
+        seed_ids = np.asarray(sorted(seed_ids), dtype=np.int64)
+        low, high = self.keys // self.vocab_size, self.keys % self.vocab_size
+        totals = np.zeros(self.vocab_size, dtype=np.int64)
+        high_is_seed = np.isin(high, seed_ids)
+        low_is_seed = np.isin(low, seed_ids)
+        np.add.at(totals, low[high_is_seed], self.counts[high_is_seed])
+        np.add.at(totals, high[low_is_seed], self.counts[low_is_seed])
+        terms = np.flatnonzero(totals)
+        return terms, totals[terms]
+
+    def seed_ids(self, seeds):
+        """Hashed ids of seed token tuples (longer than max_ngram are skipped)."""
+        ids = set()
+        for seed in seeds:
+            if len(seed) <= self.max_ngram:
+                term = self.term_ids(list(seed))[len(seed)]
+                if len(term) and term[0] >= 0:
+                    ids.add(int(term[0]))
+        return ids
+
+def read_documents(input_file, text_column=DEFAULT_TEXT_COLUMN, batch_words=BATCH_WORDS):
+    """
+    Yields batches of token lists from `text_column`. Without a
+    Normalized_Text column, the raw description is normalized (but not
+    typo-corrected).
+    """
+    with open(input_file, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.DictReader(f)
+        column = text_column
+        if column not in (reader.fieldnames or []):
+            print(f"Warning: {input_file} has no '{text_column}' column; using uncorrected Concat_site_variables.")
+            column = 'Concat_site_variables'
+
+        batch = []
+        words = 0
+        for row in reader:
+            tokens = classify_sites.tokenize(row.get(column) or '')
+            batch.append(tokens)
+            words += len(tokens)
+            if words >= batch_words:
+                yield batch
+                batch = []
+                words = 0
+        if batch:
+            yield batch
+
+def resolve_terms(input_file, matrix, wanted, text_column=DEFAULT_TEXT_COLUMN, samples=RESOLVE_SAMPLES):
+    """
+    Second pass: the most frequent phrase behind each wanted term id, from
+    its first `samples` occurrences. Stops reading once every id is resolved.
+    """
+    pending = set(wanted)
+    names = defaultdict(Counter)
+    for batch in read_documents(input_file, text_column):
+        if not pending:
+            break
+        tokens = []
+        for doc in batch:
+            tokens.extend(doc)
+            tokens.append(None)
+        for n, ids in matrix.term_ids(tokens).items():
+            for i in np.flatnonzero(np.isin(ids, list(pending))):
+                term = int(ids[i])
+                if term not in pending:
+                    continue
+                names[term][" ".join(tokens[i:i + n])] += 1
+                if sum(names[term].values()) >= samples:
+                    pending.discard(term)
+    return {term: counter.most_common(1)[0][0] for term, counter in names.items()}
+
+def _is_seed_fragment(candidate, seeds):
+    padded = f" {candidate} "
+    return any(padded in f" {' '.join(seed)} " for seed in seeds)
+
+def mine_synonyms(input_file, text_column=DEFAULT_TEXT_COLUMN, window=DEFAULT_WINDOW, max_ngram=DEFAULT_MAX_NGRAM,
+                  hash_bits=DEFAULT_HASH_BITS, memory_mb=DEFAULT_MEMORY_MB, min_count=DEFAULT_MIN_COUNT, top=DEFAULT_TOP,
+                  seeds=None):
+    """
+    Ranks candidate synonyms for each class by pointwise mutual information
+    with the class's seed keywords:
+
+        PMI(t, S) = log( C(t, S) * N / (C(t) * C(S)) )
+
+    where C(t, S) counts windowed co-occurrences of term t with any seed
+    term, C(x) are pair marginals and N is twice the number of pairs.
+    Terms that are seeds of any class, or fragments of a seed of the
+    class, are not candidates. Returns {class: [(term, pmi, C(t, S), C(t))]}.
+    """
+    if seeds is None:
+        seeds = seed_keywords()
+
+    matrix = CooccurrenceMatrix(window, max_ngram, hash_bits, memory_mb)
+    for batch in read_documents(input_file, text_column):
+        matrix.add_documents(batch)
+    matrix.flush()
+    print(f"Counted {int(matrix.counts.sum())} co-occurrences of {len(matrix.keys)} distinct term pairs "
+          f"in {matrix.documents} descriptions.")
+    if matrix.prune_threshold:
+        print(f"Memory budget reached: pairs seen {matrix.prune_threshold} times or fewer were dropped.")
+
+    total = int(matrix.marginals.sum())
+    seed_ids = {label: matrix.seed_ids(class_seeds) for label, class_seeds in seeds.items()}
+    all_seed_ids = set().union(*seed_ids.values()) if seed_ids else set()
+
+    ranked = {}
+    for label, ids in seed_ids.items():
+        seed_total = int(matrix.marginals[list(ids)].sum()) if ids else 0
+        if not seed_total:
+            ranked[label] = []
+            continue
+        terms, joint = matrix.context_counts(ids)
+        keep = (joint >= min_count) & ~np.isin(terms, list(all_seed_ids))
+        terms, joint = terms[keep], joint[keep]
+        pmi = np.log(joint * total / (matrix.marginals[terms] * seed_total))
+        # Over-fetch so dropping seed fragments still leaves `top` candidates
+        order = np.argsort(-pmi, kind='stable')[:top * 3]
+        ranked[label] = [(int(terms[i]), float(pmi[i]), int(joint[i]), int(matrix.marginals[terms[i]])) for i in order]
+
+    names = resolve_terms(input_file, matrix, {t for rows in ranked.values() for t, _, _, _ in rows}, text_column)
+    results = {}
+    for label, rows in ranked.items():
+        results[label] = [(names[t], pmi, joint, count) for t, pmi, joint, count in rows
+                          if t in names and not _is_seed_fragment(names[t], seeds[label])][:top]
+    return results
+
+def write_scores(results, output_file=DEFAULT_OUTPUT_FILE):
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Class', 'Candidate', 'PMI', 'Co_occurrences', 'Candidate_Pairs'])
+        for label, rows in results.items():
+            for term, pmi, joint, count in rows:
+                writer.writerow([label, term, f"{pmi:.4f}", joint, count])
+
+def main(input_file=DEFAULT_INPUT_FILE, output_file=DEFAULT_OUTPUT_FILE, text_column=DEFAULT_TEXT_COLUMN,
+         window=DEFAULT_WINDOW, hash_bits=DEFAULT_HASH_BITS, memory_mb=DEFAULT_MEMORY_MB,
+         min_count=DEFAULT_MIN_COUNT, top=DEFAULT_TOP):
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        return None
+
+    print(f"Mining synonym candidates from {input_file}...")
+    results = mine_synonyms(input_file, text_column, window, DEFAULT_MAX_NGRAM, hash_bits, memory_mb, min_count, top)
+    write_scores(results, output_file)
+    for label, rows in results.items():
+        preview = ", ".join(term for term, _, _, _ in rows[:5])
+        print(f"  {label}: {len(rows)} candidates{': ' + preview if preview else ''}")
+    print(f"Synonym candidates written to {output_file}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank candidate synonyms for each class's keywords by PMI.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT_FILE, help="Classified CSV (uses its Normalized_Text column).")
+    parser.add_argument("output", nargs="?", default=DEFAULT_OUTPUT_FILE, help="CSV of scored candidates.")
+    parser.add_argument("--text-column", default=DEFAULT_TEXT_COLUMN, help="Column holding the description text.")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Words between two co-occurring terms.")
+    parser.add_argument("--hash-bits", type=int, default=DEFAULT_HASH_BITS, help="Terms are hashed into 2**bits ids.")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="Memory budget for the pair counts; rare pairs are dropped beyond it.")
+    parser.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT,
+                        help="Co-occurrences with a class's seeds needed to rank a candidate.")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Candidates written per class.")
+    args = parser.parse_args()
+
+    main(args.input, args.output, args.text_column, args.window, args.hash_bits, args.memory_mb, args.min_count, args.top)
@@ -0,0 +1,93 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bin_sites
+
+class TestBinning(unittest.TestCase):
+    def test_square_bin(self):
+        x = np.array([0.5, 999.0, 1000.0, -0.5])
+        y = np.array([0.5, 0.0, 2500.0, -0.5])
+        i, j = bin_sites.square_bin(x, y, 1000.0)
+        self.assertEqual(i.tolist(), [0, 0, 1, -1])
+        self.assertEqual(j.tolist(), [0, 0, 2, -1])
+
+    def test_hex_bin_round_trips_centers(self):
+        q = np.array([0, 1, -2, 3, 0])
+        r = np.array([0, 0, 1, -4, 5])
+        cx, cy = bin_sites.hex_centers(q, r, 250.0)
+        # Points jittered well inside the inscribed circle stay in their cell
+        bq, br = bin_sites.hex_bin(cx + 50.0, cy - 50.0, 250.0)
+        self.assertEqual(bq.tolist(), q.tolist())
+        self.assertEqual(br.tolist(), r.tolist())
+
+    def test_period_field_name(self):
+        self.assertEqual(bin_sites.period_field_name("Late Prehistoric II (Toyah Phase)"), "period_Late_Prehistoric_II_Toyah_Phase")
+
+class TestBinSitesMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'classified.csv')
+        rows = [
+            {'POINT_X': '10', 'POINT_Y': '10', 'Class_1_Found': 'True', 'Class_2_Found': 'False', 'Class_3_Found': 'True', 'Burned_Clay_Found': 'False', 'Learned_Time_Period': 'Archaic; Woodland'},
+            {'POINT_X': '20', 'POINT_Y': '30', 'Class_1_Found': 'False', 'Class_2_Found': 'False', 'Class_3_Found': 'True', 'Burned_Clay_Found': 'True', 'Learned_Time_Period': 'Archaic'},
+            {'POINT_X': '150', 'POINT_Y': '10', 'Class_1_Found': 'False', 'Class_2_Found': 'True', 'Class_3_Found': 'False', 'Burned_Clay_Found': 'False', 'Learned_Time_Period': ''},
+            {'POINT_X': '', 'POINT_Y': '', 'Class_1_Found': 'True', 'Class_2_Found': 'False', 'Class_3_Found': 'False', 'Burned_Clay_Found': 'False', 'Learned_Time_Period': 'Archaic'},
+        ]
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _main(self, *args, **kwargs):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            return bin_sites.main(self.input_file, self.tmp_dir, *args, **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+
+    def test_square_counts(self):
+        # These small test coordinates would pass for degrees
+        outputs = self._main('square', [100.0], units='projected')
+
+        with open(outputs[0], 'r', encoding='utf-8') as f:
+            cells = {(r['cell_i'], r['cell_j']): r for r in csv.DictReader(f)}
+
+        self.assertEqual(len(cells), 2)
+        first = cells[('0', '0')]
+        self.assertEqual(first['total'], '2')
+        self.assertEqual(first['class_1'], '1')
+        self.assertEqual(first['class_3'], '2')
+        self.assertEqual(first['burned_clay'], '1')
+        self.assertEqual(first['period_Archaic'], '2')
+        self.assertEqual(first['period_Woodland'], '1')
+        self.assertEqual(first['center_x'], '50.000000')
+
+        second = cells[('1', '0')]
+        self.assertEqual(second['total'], '1')
+        self.assertEqual(second['class_2'], '1')
+        self.assertEqual(second['period_Unknown'], '1')
+
+    def test_degree_coordinates_need_explicit_units(self):
+        with self.assertRaises(SystemExit):
+            self._main('square')
+        outputs = self._main('square', units='degrees')
+        self.assertEqual([os.path.basename(path) for path in outputs], ['bins_square_0.01.csv', 'bins_square_0.05.csv'])
+        with open(outputs[0], 'r', encoding='utf-8') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import http.client
+import threading
+import unittest
+import urllib.error
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import classify_service
+
+class TestClassificationService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = classify_service.create_server(port=0, instances=2, artifact_db={"perdiz": "Late Prehistoric II (Toyah Phase)"})
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.client = classify_service.ClassificationClient(port=cls.server.server_address[1], batch_size=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_health(self):
+        self.assertTrue(self.client.is_alive())
+
+    def test_classify_descriptions_in_batches(self):
+        results = self.client.classify([
+            'site has fire-cracked rock and a hearth feature',
+            'no artifacts were found here',
+            'recovered a perdiz point',
+        ])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[0]['Class_1_Found'])
+        self.assertTrue(results[0]['Class_2_Found'])
+        self.assertFalse(results[1]['Class_1_Found'])
+        self.assertEqual(results[2]['Learned_Time_Period'], 'Late Prehistoric II (Toyah Phase)')
+        self.assertEqual(set(results[0].keys()), set(classify_service.RESULT_FIELDS))
+
+    def test_classify_rows(self):
+        results = self.client.classify_rows([{'trinomial': '41AN1', 'Concat_site_variables': 'earth oven'}])
+        self.assertTrue(results[0]['Class_3_Found'])
+
+    def test_bad_request(self):
+        with self.assertRaises(OSError):
+            self.client._post({'unexpected': []})
+
+    def _error(self, payload):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.client._post(payload)
+        return raised.exception.code, json.loads(raised.exception.read().decode('utf-8'))['error']
+
+    def test_malformed_payloads_get_json_errors(self):
+        for payload in ({'descriptions': 'earth oven'}, {'descriptions': [1, 2]}, {'rows': ['earth oven']},
+                        {'rows': [{'Concat_site_variables': 5}]}, ['earth oven']):
+            code, error = self._error(payload)
+            self.assertEqual(code, 400)
+            self.assertTrue(error.startswith('invalid request'))
+        self.assertTrue(self.client.is_alive())
+
+    def test_bad_content_length_is_a_json_400(self):
+        for length in ('abc', '-5'):
+            connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=10)
+            try:
+                connection.putrequest('POST', '/classify')
+                connection.putheader('Content-Length', length)
+                connection.endheaders()
+                response = connection.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertTrue(json.loads(response.read().decode('utf-8'))['error'].startswith('invalid request'))
+            finally:
+                connection.close()
+
+    def test_classification_failure_is_a_json_500(self):
+        with patch.object(classify_service.ClassifierPool, 'classify_rows', side_effect=RuntimeError('boom')):
+            code, error = self._error({'descriptions': ['earth oven']})
+        self.assertEqual((code, error), (500, 'classification failed: boom'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,6 +39,8 @@ class TestClassifySites(unittest.TestCase):
         expected = "'hello'"
         self.assertEqual(clean_value(input_val), expected)
 # Add the parent directory to sys.path to import classify_sites
+import keyword_codes
+import match_spans
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from classify_sites import is_negated
@@ -63,9 +65,14 @@ class TestIsNegated(unittest.TestCase):
         text_before = "no evidence of any"
         self.assertFalse(is_negated(text_before, window=3))
 import csv
+import json
 import os
 import sys
+import shutil
+import tempfile
 import unittest
+from io import StringIO
+from unittest.mock import patch
 
 # Add parent directory to path to import classify_sites
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -246,5 +253,348 @@ class TestClassifySitesRefactor(unittest.TestCase):
         self.assertEqual(rows[5]['Class_2_Found'], 'False', "Row 5 should not have Class 2")
         self.assertEqual(rows[5]['Burned_Clay_Only'], 'True', "Row 5 should be Burned Clay Only")
 
+class TestPeriodHierarchy(unittest.TestCase):
+    def setUp(self):
+        self.hierarchy = classify_sites.PeriodHierarchy([
+            "Paleoindian", "Paleoindian - Early", "Paleoindian - Late",
+            "Late Prehistoric", "Late Prehistoric II", "Late Prehistoric II (Toyah Phase)",
+            "Historic", "Historic - Early Statehood (1845-1860)"
+        ])
+
+    def test_parents(self):
+        self.assertEqual(self.hierarchy.parents["Paleoindian - Early"], "Paleoindian")
+        self.assertEqual(self.hierarchy.parents["Late Prehistoric II (Toyah Phase)"], "Late Prehistoric II")
+        self.assertEqual(self.hierarchy.parents["Late Prehistoric II"], "Late Prehistoric")
+        # Unknown intermediate forms are skipped
+        self.assertEqual(self.hierarchy.parents["Historic - Early Statehood (1845-1860)"], "Historic")
+        self.assertIsNone(self.hierarchy.parents["Paleoindian"])
+
+    def test_resolve_drops_general_labels(self):
+        result = self.hierarchy.resolve(["Paleoindian", "Paleoindian - Early"])
+        self.assertEqual(result, ["Paleoindian - Early"])
+
+    def test_resolve_drops_all_ancestors(self):
+        result = self.hierarchy.resolve(["Late Prehistoric", "Late Prehistoric II (Toyah Phase)"])
+        self.assertEqual(result, ["Late Prehistoric II (Toyah Phase)"])
+
+    def test_resolve_keeps_siblings_and_unknown_labels(self):
+        result = self.hierarchy.resolve(["Paleoindian - Early", "Paleoindian - Late", "Woodland"])
+        self.assertEqual(result, ["Paleoindian - Early", "Paleoindian - Late", "Woodland"])
+
+    def test_classifier_reports_most_specific_period(self):
+        classifier = classify_sites.SiteClassifier(artifact_db={"clovis": "Paleoindian - Early"})
+        result = classifier.determine_time_period("paleoindian clovis point", False)
+        self.assertEqual(result, "Paleoindian - Early")
+
+class TestCheckpointResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'input.csv')
+        rows = [{'Concat_site_variables': f'site {i}: fire-cracked rock and a hearth, "quoted"\nline'} for i in range(7)]
+        rows[3] = {'Concat_site_variables': 'earth oven with burned rock midden'}
+        create_dummy_csv(self.input_file, rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, output_file, **kwargs):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            classify_sites.main(self.input_file, output_file, **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+        with open(output_file, 'rb') as f:
+            return f.read()
+
+    def test_resume_after_crash_produces_identical_output(self):
+        expected = self._run(os.path.join(self.tmp_dir, 'clean.csv'))
+
+        output_file = os.path.join(self.tmp_dir, 'resumed.csv')
+        original = classify_sites.process_single_row
+        calls = {'n': 0}
+
+        def crash_on_sixth_row(row, classifier, *args):
+            calls['n'] += 1
+            if calls['n'] == 6:
+                raise MemoryError("simulated crash")
+            return original(row, classifier, *args)
+
+        with patch('classify_sites.process_single_row', crash_on_sixth_row):
+            with self.assertRaises(MemoryError):
+                self._run(output_file, checkpoint_every=2)
+
+        self.assertTrue(os.path.exists(output_file + '.checkpoint'))
+        self.assertEqual(self._run(output_file, resume=True), expected)
+        self.assertFalse(os.path.exists(output_file + '.checkpoint'))
+
+class TestKeywordBitmasks(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'input.csv')
+        self.output_file = os.path.join(self.tmp_dir, 'output.csv')
+        create_dummy_csv(self.input_file, [
+            {'Concat_site_variables': 'fire-cracked rock, burned rock and a hearth with chert flakes'},
+            {'Concat_site_variables': 'nothing here'},
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bitmask_columns_decode_to_keywords(self):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            classify_sites.main(self.input_file, self.output_file, keyword_bitmasks=True)
+        finally:
+            sys.stdout = saved_stdout
+
+        dictionary = keyword_codes.load_sidecar(keyword_codes.sidecar_path(self.output_file))
+        with open(self.output_file, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+        decode = keyword_codes.decode_keywords
+        self.assertEqual(decode(rows[0]['Class_1_Keywords'], dictionary['Class_1_Keywords']), ['burned rock', 'fire cracked rock'])
+        self.assertEqual(decode(rows[0]['Class_2_Keywords'], dictionary['Class_2_Keywords']), ['hearth'])
+        self.assertEqual(decode(rows[0]['Prehistoric_Evidence'], dictionary['Prehistoric_Evidence']), ['chert', 'flake'])
+        self.assertEqual(rows[1]['Class_1_Keywords'], '0')
+
+class TestClassificationCache(unittest.TestCase):
+    def test_lru_eviction_and_hit_rate(self):
+        cache = classify_sites.ClassificationCache(maxsize=2, policy='lru')
+        a, b, c = (cache.key(t) for t in ('a', 'b', 'c'))
+        cache.put(a, {'v': 1})
+        cache.put(b, {'v': 2})
+        self.assertEqual(cache.get(a), {'v': 1})  # a becomes most recent
+        cache.put(c, {'v': 3})                    # evicts b
+        self.assertIsNone(cache.get(b))
+        self.assertEqual(cache.get(c), {'v': 3})
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (2, 1, 1))
+        self.assertAlmostEqual(cache.hit_rate(), 2 / 3)
+
+    def test_fifo_eviction_ignores_recency(self):
+        cache = classify_sites.ClassificationCache(maxsize=2, policy='fifo')
+        a, b, c = (cache.key(t) for t in ('a', 'b', 'c'))
+        cache.put(a, {'v': 1})
+        cache.put(b, {'v': 2})
+        cache.get(a)
+        cache.put(c, {'v': 3})                    # evicts a, the oldest
+        self.assertIsNone(cache.get(a))
+
+    def test_text_budget_evicts_and_skips_oversized_records(self):
+        cache = classify_sites.ClassificationCache(maxsize=10, max_chars=100)
+        a, b, c = (cache.key(t) for t in ('a', 'b', 'c'))
+        cache.put(a, {'v': 1}, 60)
+        cache.put(b, {'v': 2}, 30)
+        cache.put(c, {'v': 3}, 40)                # over 100 chars, evicts a
+        self.assertIsNone(cache.get(a))
+        self.assertEqual((len(cache.entries), cache.chars, cache.evictions), (2, 70, 1))
+        cache.put(a, {'v': 1}, 101)               # larger than the whole budget
+        self.assertIsNone(cache.get(a))
+        self.assertEqual(cache.chars, 70)
+
+    def test_cached_rows_match_uncached(self):
+        classifier = classify_sites.SiteClassifier(artifact_db={})
+        cache = classify_sites.ClassificationCache()
+        row = {'trinomial': '41AN1', 'Concat_site_variables': 'type_site: Burned rock midden;'}
+        first, _ = classify_sites.process_single_row(row, classifier, cache=cache)
+        second, words = classify_sites.process_single_row(dict(row, trinomial='41AN2'), classifier, cache=cache)
+        uncached, uncached_words = classify_sites.process_single_row(dict(row, trinomial='41AN2'), classifier)
+        self.assertEqual(second, uncached)
+        self.assertEqual(words, uncached_words)
+        self.assertEqual(cache.chars, len(first['Normalized_Text']))
+        self.assertEqual(first['trinomial'], '41AN1')
+        self.assertEqual(cache.hits, 1)
+
+class TestDocument(unittest.TestCase):
+    def test_tokens_offsets_and_correction(self):
+        doc = classify_sites.Document.from_text("Burned-Rock  HERTH; (fcr)")
+        self.assertEqual(doc.tokens, ['burned', 'rock', 'herth', 'fcr'])
+        self.assertEqual(doc.normalized, "burned rock herth fcr")
+        self.assertEqual(doc.corrected_tokens, ['burned', 'rock', 'hearth', 'fcr'])
+        self.assertEqual(doc.text, "burned rock hearth fcr")
+        self.assertEqual(doc.starts, [0, 7, 12, 19])
+
+    def test_normalize_text_matches_regex_passes(self):
+        for text in ["It's a  Burned-rock\n\tmidden!", "\xa0caf\xe9 42 \u0130", "", "---"]:
+            expected = re.sub(r'\s+', ' ', re.sub(r'[^a-z0-9\s]', ' ', text.lower())).strip()
+            self.assertEqual(classify_sites.normalize_text(text), expected)
+
+    def test_is_negated_at_matches_sliced_text(self):
+        text = "xnot much here but snot a hearth and no evidence of any clear oven or not burned rock"
+        doc = classify_sites.Document.from_corrected_text(text)
+        for start in doc.starts:
+            expected = classify_sites.is_negated(text[max(0, start-30):start])
+            self.assertEqual(doc.is_negated_at(start), expected, text[max(0, start-30):start])
+
+    def test_negation_rank_covers_smaller_windows(self):
+        doc = classify_sites.Document.from_corrected_text("no charcoal or ash near the burned rock")
+        rock = doc.starts[-1]
+        self.assertEqual(doc.negation_rank(rock, chars=60, window=8), 6)
+        self.assertIsNone(doc.negation_rank(rock, chars=20, window=8))
+        for window in range(1, 9):
+            self.assertEqual(doc.is_negated_at(rock, chars=60, window=window), window > 6)
+
+class TestCorrectionsTable(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'input.csv')
+        self.output_file = os.path.join(self.tmp_dir, 'output.csv')
+        self.table_file = os.path.join(self.tmp_dir, 'corrections.json')
+        create_dummy_csv(self.input_file, [
+            {'Concat_site_variables': 'a herth with burnedd rokc'},
+            {'Concat_site_variables': 'the herth was near an ovan'},
+        ])
+
+    def tearDown(self):
+        classify_sites.set_corrections_table(None)
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, output_file, **kwargs):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            classify_sites.main(self.input_file, output_file, **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+        with open(output_file, 'rb') as f:
+            return f.read()
+
+    def test_collect_vocabulary(self):
+        self.assertEqual(classify_sites.collect_vocabulary(self.input_file), {'herth', 'burnedd', 'rokc', 'with', 'near', 'ovan'})
+
+    def test_vocab_pass_saves_table_and_matches_plain_run(self):
+        expected = self._run(os.path.join(self.tmp_dir, 'plain.csv'))
+        result = self._run(self.output_file, corrections_file=self.table_file, vocab_pass=True)
+        self.assertEqual(result, expected)
+
+        table = classify_sites.load_corrections_table(self.table_file)
+        self.assertEqual(table['herth'], 'hearth')
+        self.assertEqual(table['burnedd'], 'burned')
+        self.assertEqual(table['near'], 'near')
+        self.assertIsNone(classify_sites.CORRECTIONS_TABLE)
+
+    def test_table_is_used_for_lookups(self):
+        classify_sites.set_corrections_table({'herth': 'oven'})
+        self.assertEqual(classify_sites.correct_typos("herth burnedd"), "oven burned")
+
+    def test_table_with_other_signature_is_ignored(self):
+        with open(self.table_file, 'w', encoding='utf-8') as f:
+            json.dump({'signature': {'targets': ['x'], 'cutoff': 0.5}, 'corrections': {'herth': 'x'}}, f)
+        self.assertEqual(classify_sites.load_corrections_table(self.table_file), {})
+
+class TestMatchSpanSidecar(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'input.csv')
+        self.output_file = os.path.join(self.tmp_dir, 'output.csv')
+        create_dummy_csv(self.input_file, [
+            {'Concat_site_variables': 'no burned rock was seen on the surface today but an earth oven near a hearth'},
+            {'Concat_site_variables': 'nothing here'},
+            {'Concat_site_variables': 'a hearth of limestone and a kitchen stove oven'},
+            {'Concat_site_variables': 'no burned rock was seen on the surface today but an earth oven near a hearth'},
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, output_file, **kwargs):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            classify_sites.main(self.input_file, output_file, **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+        with open(output_file, 'r', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_spans_record_outcomes_and_offsets(self):
+        rows = self._run(self.output_file, write_spans=True)
+        self.assertEqual(rows, self._run(os.path.join(self.tmp_dir, 'plain.csv')))
+
+        with match_spans.SpanReader(self.output_file) as reader:
+            self.assertEqual(reader.rows, 4)
+            spans = reader.spans(0)
+            outcomes = {(s['keyword'], s['class']): s['outcome'] for s in spans}
+            self.assertEqual(outcomes[('burned rock', 'Class 1')], 'negated')
+            self.assertEqual(outcomes[('earth oven', 'Class 3')], 'accepted')
+            self.assertEqual(outcomes[('hearth', 'Class 2')], 'dependency')
+            text = rows[0]['Normalized_Text']
+            for s in spans:
+                self.assertEqual(text[s['start']:s['end']], s['keyword'])
+            # Cached duplicate rows get the same spans
+            self.assertEqual(reader.spans(3), spans)
+            self.assertEqual(reader.spans(1), [])
+
+            outcomes = {(s['keyword'], s['class']): s['outcome'] for s in reader.spans(2)}
+            self.assertEqual(outcomes[('hearth', 'Class 2')], 'accepted')
+            self.assertEqual(outcomes[('limestone', 'Rock Material')], 'accepted')
+            self.assertEqual(outcomes[('oven', 'Class 3')], 'excluded')
+
+    def test_spans_are_rejected_with_checkpoints(self):
+        for kwargs in ({'checkpoint_every': 2}, {'resume': True}):
+            with self.assertRaises(SystemExit):
+                self._run(self.output_file, write_spans=True, **kwargs)
+            self.assertFalse(os.path.exists(self.output_file))
+            self.assertFalse(os.path.exists(match_spans.spans_path(self.output_file)))
+
+    def test_span_collection_matches_plain_classification(self):
+        classifier = classify_sites.SiteClassifier(artifact_db={})
+        for text in ["no rock here but an earth oven and a stove oven and a hearth",
+                     "fire cracked rock and sandstone hearths with a burned rock midden"]:
+            doc = classify_sites.Document.from_text(text)
+            spans = []
+            self.assertEqual(classifier.find_classes_robust(doc, spans), classifier.find_classes_robust(doc))
+            self.assertTrue(spans)
+
+class TestChunkedScanning(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.artifact_db = {'pedernales': 'Archaic - Middle', 'clovis': 'Paleoindian - Early'}
+        cls.whole = classify_sites.SiteClassifier(artifact_db=cls.artifact_db)
+        cls.windowed = classify_sites.SiteClassifier(artifact_db=cls.artifact_db, window_chars=24)
+
+    def test_windows_overlap_by_longest_pattern(self):
+        text = "x" * 100
+        windows = self.windowed.scan_windows(text)
+        self.assertEqual(windows[0], (0, 24, 24 + self.windowed.window_overlap))
+        self.assertEqual(windows[-1][1:], (100, 100))
+        self.assertEqual(self.whole.scan_windows(text), [(0, 100, 100)])
+
+    def test_windowed_scan_matches_whole_text(self):
+        texts = [
+            "a burned rock midden near a hearth with no fire cracked rock and a dutch oven",
+            "sandstone slab then late prehistoric ii toyah sherds and a pedernales dart point with burned clay",
+            "no rock here but an earth oven and a stove oven and clovis chert flakes " * 5,
+            "historic trash scatter with a fireplace hearth and some limestone",
+        ]
+        for text in texts:
+            doc = classify_sites.Document.from_text(text)
+            self.assertEqual(
+                classify_sites.classify_document(doc, self.windowed),
+                classify_sites.classify_document(doc, self.whole),
+                text)
+
+    def test_tokenize_rejoins_tokens_across_chunks(self):
+        text = "Burned-Rock MIDDEN; hearth basin, 41AN12 and an oven"
+        expected = classify_sites.tokenize(text)
+        with patch.object(classify_sites, 'TOKENIZE_CHUNK_CHARS', 5):
+            self.assertEqual(classify_sites.tokenize(text), expected)
+
+    def test_oversized_description_is_truncated_with_warning(self):
+        classifier = classify_sites.SiteClassifier(artifact_db=self.artifact_db, max_text_chars=20)
+        row = {'trinomial': '41AN1', 'Concat_site_variables': 'burned rock midden and an earth oven'}
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            clean_row, _ = classify_sites.process_single_row(row, classifier)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = saved_stdout
+        self.assertIn('Warning: Description of 41AN1', output)
+        self.assertEqual(clean_row['Normalized_Text'], 'burned rock midden')
+        self.assertEqual(clean_row['Concat_site_variables'], row['Concat_site_variables'])
+        self.assertEqual(clean_row['Class_3_Keywords'], 'burned rock midden')
+
 if __name__ == '__main__':
     unittest.main()
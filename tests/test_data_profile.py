@@ -0,0 +1,116 @@
+import os
+import sys
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_profile
+import process_sites
+
+def profile_rows(rows):
+    profiler = data_profile.DataProfiler(process_sites.SKIP_VALUES)
+    for row in rows:
+        profiler.add_row(row)
+    return profiler
+
+def sample_rows(start, stop):
+    return [{'trinomial': f'41AN{i}', 'explain': 'No Data' if i % 4 == 0 else f'burned rock {i % 50}',
+             'materials': '' if i % 2 else 'chert'} for i in range(start, stop)]
+
+class TestSketches(unittest.TestCase):
+    def test_hyperloglog_estimates(self):
+        small, large = data_profile.HyperLogLog(), data_profile.HyperLogLog()
+        for i in range(100):
+            small.add(f'value {i}')
+            small.add(f'value {i}')
+        for i in range(50000):
+            large.add(f'41TV{i}')
+        self.assertAlmostEqual(small.estimate(), 100, delta=3)
+        self.assertAlmostEqual(large.estimate(), 50000, delta=50000 * 0.05)
+        self.assertEqual(data_profile.HyperLogLog().estimate(), 0)
+
+    def test_hyperloglog_merge_is_union(self):
+        a, b, both = data_profile.HyperLogLog(), data_profile.HyperLogLog(), data_profile.HyperLogLog()
+        for i in range(3000):
+            (a if i % 2 else b).add(str(i))
+            both.add(str(i))
+        a.merge(b)
+        self.assertEqual(a.registers, both.registers)
+
+    def test_heavy_hitters_keep_frequent_values(self):
+        hitters = data_profile.HeavyHitters(size=8)
+        for i in range(1000):
+            hitters.add('No Data' if i % 2 else f'unique {i}')
+            if i % 5 == 0:
+                hitters.add('False')
+        top = dict(hitters.top(2))
+        self.assertEqual(list(top), ['No Data', 'False'])
+        # Undercounts by at most items / (size + 1)
+        self.assertGreaterEqual(top['No Data'], 500 - 1200 // 9)
+        self.assertLessEqual(top['No Data'], 500)
+        self.assertGreaterEqual(top['False'], 200 - 1200 // 9)
+
+class TestDataProfiler(unittest.TestCase):
+    def test_column_summary(self):
+        summary = profile_rows(sample_rows(0, 400)).summary()
+        self.assertEqual(summary['rows'], 400)
+        explain = summary['columns']['explain']
+        self.assertEqual((explain['filled'], explain['skipped']), (400, 100))
+        self.assertEqual(explain['skip_rate'], 0.25)
+        value, count = explain['top_values'][0]
+        self.assertEqual(value, 'No Data')
+        self.assertTrue(100 - 400 // 33 <= count <= 100)
+        self.assertAlmostEqual(explain['distinct'], 51, delta=2)
+        materials = summary['columns']['materials']
+        self.assertEqual((materials['fill_rate'], materials['skip_rate']), (0.5, 0.5))
+        self.assertEqual(materials['length_histogram'], {'0': 200, '4-7': 200})
+        self.assertEqual(materials['distinct'], 1)
+        self.assertFalse(any(column['possible_truncation'] for column in summary['columns'].values()))
+
+    def test_merged_ranges_match_one_pass(self):
+        whole = profile_rows(sample_rows(0, 900))
+        merged = profile_rows(sample_rows(0, 300))
+        merged.merge(profile_rows(sample_rows(300, 900)))
+        merged, whole = merged.summary(), whole.summary()
+        # Everything but the approximate top value counts is identical
+        for summary in (merged, whole):
+            for column in summary['columns'].values():
+                column['top_values'] = [value for value, _ in column['top_values'][:1]]
+        self.assertEqual(merged, whole)
+
+    def test_late_columns_count_earlier_rows_as_empty(self):
+        profiler = profile_rows([{'a': 'x'}, {'a': 'y', 'b': 'z'}])
+        other = profile_rows([{'c': 'w'}])
+        profiler.merge(other)
+        columns = profiler.summary()['columns']
+        self.assertEqual([columns[name]['filled'] for name in 'abc'], [2, 1, 1])
+        self.assertEqual([columns[name]['skipped'] for name in 'abc'], [1, 2, 2])
+
+    def test_truncation_needs_different_values_at_the_longest_length(self):
+        repeated = [{'explain': 'x' * 30} for _ in range(50)] + [{'explain': 'short'}] * 50
+        self.assertFalse(profile_rows(repeated).summary()['columns']['explain']['possible_truncation'])
+        cut = [{'explain': f'burned rock midden number {i} with a long description'[:40]} for i in range(100)]
+        summary = profile_rows(cut).summary()['columns']['explain']
+        self.assertTrue(summary['possible_truncation'])
+        self.assertEqual(summary['max_length'], 40)
+
+class TestDrift(unittest.TestCase):
+    def test_unchanged_export_has_no_drift(self):
+        previous = profile_rows(sample_rows(0, 1000)).summary()
+        current = profile_rows(sample_rows(1000, 2100)).summary()
+        self.assertEqual(data_profile.compare_profiles(previous, current), [])
+
+    def test_drift_messages(self):
+        previous = profile_rows(sample_rows(0, 1000)).summary()
+        rows = [{'explain': 'No Data', 'materials': 'quartzite', 'site_size': '10 m'} for i in range(1000)]
+        drift = data_profile.compare_profiles(previous, profile_rows(rows).summary())
+        self.assertIn("trinomial: column is missing", drift)
+        self.assertIn("site_size: new column", drift)
+        self.assertIn("explain: every value is now empty or skipped (was 25%)", drift)
+        self.assertIn("explain: about 51 -> 1 distinct values", drift)
+        self.assertIn("materials: filled values 50% -> 100%", drift)
+        self.assertIn("materials: most common value is now 'quartzite' (100% of rows, was 'chert')", drift)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import diff_runs
+import keyword_codes
+
+FIELDS = ['trinomial', 'Class_3_Found', 'Learned_Time_Period', 'Class_3_Keywords']
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+class TestDiffRuns(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_file = os.path.join(self.tmp_dir, 'old.csv')
+        self.new_file = os.path.join(self.tmp_dir, 'new.csv')
+        self.output_dir = os.path.join(self.tmp_dir, 'diff')
+        self.columns = ['Class_3_Found', 'Learned_Time_Period', 'Class_3_Keywords']
+
+        write_csv(self.old_file, [
+            {'trinomial': '41TV5', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'oven'},
+            {'trinomial': '41AN1', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'earth oven'},
+            {'trinomial': '41BX2', 'Class_3_Found': 'TRUE', 'Learned_Time_Period': 'Unknown', 'Class_3_Keywords': 'oven'},
+            {'trinomial': '41HY9', 'Class_3_Found': 'False', 'Learned_Time_Period': 'Unknown', 'Class_3_Keywords': ''},
+            {'trinomial': '', 'Class_3_Found': 'False', 'Learned_Time_Period': 'Unknown', 'Class_3_Keywords': ''},
+        ])
+        write_csv(self.new_file, [
+            {'trinomial': '41BX2', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Unknown', 'Class_3_Keywords': 'oven'},
+            {'trinomial': '41AN1', 'Class_3_Found': 'False', 'Learned_Time_Period': 'Late Prehistoric II', 'Class_3_Keywords': ''},
+            {'trinomial': '41TV5', 'Class_3_Found': 'False', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': ''},
+            {'trinomial': '41ZZ1', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'oven'},
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _changes(self):
+        with open(os.path.join(self.output_dir, diff_runs.CHANGES_FILE), newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_transitions_and_changed_rows(self):
+        summary = diff_runs.diff_runs(self.old_file, self.new_file, self.output_dir, columns=self.columns)
+
+        self.assertEqual((summary['matched'], summary['changed'], summary['added'], summary['removed']), (3, 2, 1, 1))
+        self.assertEqual(summary['skipped'], 1)
+        self.assertEqual(summary['transitions']['Class_3_Found'][('True', 'False')], 2)
+        self.assertEqual(summary['transitions']['Learned_Time_Period'][('Archaic', 'Late Prehistoric II')], 1)
+
+        changes = self._changes()
+        self.assertEqual([(r['trinomial'], r['Change'], r['Column']) for r in changes], [
+            ('41AN1', 'changed', 'Class_3_Found'),
+            ('41AN1', 'changed', 'Learned_Time_Period'),
+            ('41AN1', 'changed', 'Class_3_Keywords'),
+            ('41HY9', 'removed', ''),
+            ('41TV5', 'changed', 'Class_3_Found'),
+            ('41TV5', 'changed', 'Class_3_Keywords'),
+            ('41ZZ1', 'added', ''),
+        ])
+
+    def test_external_sort_matches_in_memory(self):
+        in_memory = diff_runs.diff_runs(self.old_file, self.new_file, self.output_dir, columns=self.columns)
+        expected = self._changes()
+        spilled = diff_runs.diff_runs(self.old_file, self.new_file, self.output_dir, columns=self.columns, chunk_rows=1)
+        self.assertEqual(self._changes(), expected)
+        self.assertEqual(spilled['transitions'], in_memory['transitions'])
+
+    def test_duplicate_keys_pair_in_file_order(self):
+        old = [('41AN1', 'a'), ('41AN1', 'b'), ('41BX2', 'c')]
+        new = [('41AN1', 'a'), ('41BX2', 'c'), ('41BX2', 'd')]
+        joined = list(diff_runs.merge_join(iter(old), iter(new)))
+        self.assertEqual(joined, [
+            ('41AN1', ('41AN1', 'a'), ('41AN1', 'a')),
+            ('41AN1', ('41AN1', 'b'), None),
+            ('41BX2', ('41BX2', 'c'), ('41BX2', 'c')),
+            ('41BX2', None, ('41BX2', 'd')),
+        ])
+
+    def test_keyword_bitmasks_are_decoded(self):
+        dictionary = {'Class_3_Keywords': ['earth oven', 'oven']}
+        write_csv(self.new_file, [
+            {'trinomial': '41TV5', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': '2'},
+        ])
+        write_csv(self.old_file, [
+            {'trinomial': '41TV5', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'oven'},
+        ])
+        keyword_codes.write_sidecar(keyword_codes.sidecar_path(self.new_file), dictionary)
+        summary = diff_runs.diff_runs(self.old_file, self.new_file, self.output_dir, columns=self.columns)
+        self.assertEqual(summary['changed'], 0)
+
+    def test_keyword_order_is_ignored(self):
+        write_csv(self.old_file, [
+            {'trinomial': '41TV5', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'oven; earth oven; hearth'},
+        ])
+        write_csv(self.new_file, [
+            {'trinomial': '41TV5', 'Class_3_Found': 'True', 'Learned_Time_Period': 'Archaic', 'Class_3_Keywords': 'earth oven; hearth; oven'},
+        ])
+        summary = diff_runs.diff_runs(self.old_file, self.new_file, self.output_dir, columns=self.columns)
+        self.assertEqual(summary['changed'], 0)
+
+    def test_main_writes_summary(self):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            diff_runs.main(self.old_file, self.new_file, self.output_dir, columns=self.columns)
+        finally:
+            sys.stdout = saved_stdout
+        with open(os.path.join(self.output_dir, diff_runs.SUMMARY_FILE), encoding='utf-8') as f:
+            self.assertIn("True -> False: 2", f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, diff_runs.TRANSITIONS_FILE)))
+
+if __name__ == '__main__':
+    unittest.main()
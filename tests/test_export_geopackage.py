@@ -0,0 +1,105 @@
+import csv
+import os
+import sys
+import shutil
+import sqlite3
+import struct
+import tempfile
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export_geopackage
+import keyword_codes
+
+FIELDS = ['trinomial', 'Longitude', 'Latitude', 'Class_1_Found', 'Class_3_Found', 'Class_3_Keywords',
+          'Learned_Time_Period', 'Concat_site_variables']
+
+class TestExportGeoPackage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'classified.csv')
+        self.output_file = os.path.join(self.tmp_dir, 'sites.gpkg')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerow({'trinomial': '41AN1', 'Longitude': '-97.5', 'Latitude': '30.25', 'Class_1_Found': 'True',
+                             'Class_3_Found': 'False', 'Class_3_Keywords': '0', 'Learned_Time_Period': 'Archaic',
+                             'Concat_site_variables': 'materials: fcr;'})
+            writer.writerow({'trinomial': '41BX2', 'Longitude': '-98.5', 'Latitude': '29.5', 'Class_1_Found': 'FALSE',
+                             'Class_3_Found': 'True', 'Class_3_Keywords': '3', 'Learned_Time_Period': 'Unknown',
+                             'Concat_site_variables': 'features: earth oven;'})
+            writer.writerow({'trinomial': '41HY9', 'Longitude': '', 'Latitude': '', 'Class_1_Found': 'False',
+                             'Class_3_Found': 'False', 'Class_3_Keywords': '0', 'Learned_Time_Period': 'Unknown',
+                             'Concat_site_variables': ''})
+        keyword_codes.write_sidecar(keyword_codes.sidecar_path(self.input_file),
+                                    {'Class_3_Keywords': ['earth oven', 'oven']})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, **kwargs):
+        result = export_geopackage.write_geopackage(self.input_file, self.output_file, batch_size=2, **kwargs)
+        conn = sqlite3.connect(self.output_file)
+        self.addCleanup(conn.close)
+        return result, conn
+
+    def test_layer_and_metadata(self):
+        result, conn = self._write()
+        self.assertEqual(result, {'features': 3, 'no_geometry': 1, 'srs_id': 4326})
+        self.assertEqual(conn.execute("PRAGMA application_id").fetchone()[0], export_geopackage.GPKG_APPLICATION_ID)
+        self.assertEqual(conn.execute("SELECT data_type, min_x, min_y, max_x, max_y, srs_id FROM gpkg_contents").fetchone(),
+                         ('features', -98.5, 29.5, -97.5, 30.25, 4326))
+        self.assertEqual(conn.execute("SELECT geometry_type_name, srs_id FROM gpkg_geometry_columns").fetchone(), ('POINT', 4326))
+        self.assertEqual(conn.execute("SELECT extension_name FROM gpkg_extensions").fetchone()[0], 'gpkg_rtree_index')
+        triggers = conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0]
+        self.assertEqual(triggers, 6)
+
+    def test_typed_columns_and_geometry(self):
+        _, conn = self._write()
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(burned_rock_sites)")}
+        self.assertEqual(columns['Class_1_Found'], 'BOOLEAN')
+        self.assertEqual(columns['Longitude'], 'DOUBLE')
+        self.assertNotIn('Concat_site_variables', columns)
+
+        rows = conn.execute("SELECT trinomial, geom, Class_1_Found, Class_3_Found, Class_3_Keywords "
+                            "FROM burned_rock_sites ORDER BY fid").fetchall()
+        self.assertEqual([row[2:] for row in rows], [(1, 0, ''), (0, 1, 'earth oven; oven'), (0, 0, '')])
+        magic, version, flags, srs_id = struct.unpack('<2sBBi', rows[0][1][:8])
+        self.assertEqual((magic, flags, srs_id), (b'GP', 1, 4326))
+        self.assertEqual(struct.unpack('<BIdd', rows[0][1][8:]), (1, 1, -97.5, 30.25))
+        self.assertIsNone(rows[2][1])
+
+    def test_rtree_index_answers_bbox_queries(self):
+        _, conn = self._write()
+        ids = conn.execute("SELECT id FROM rtree_burned_rock_sites_geom "
+                           "WHERE maxx >= -98 AND minx <= -97 AND maxy >= 30 AND miny <= 31").fetchall()
+        self.assertEqual(ids, [(1,)])
+        self.assertEqual(conn.execute("SELECT count(*) FROM rtree_burned_rock_sites_geom").fetchone()[0], 2)
+
+    def test_projected_srs_and_text_columns(self):
+        result, conn = self._write(srs_id=32614, include_text=True, srs_wkt='PROJCS["WGS 84 / UTM zone 14N"]')
+        self.assertEqual(result['srs_id'], 32614)
+        self.assertEqual(conn.execute("SELECT definition FROM gpkg_spatial_ref_sys WHERE srs_id = 32614").fetchone()[0],
+                         'PROJCS["WGS 84 / UTM zone 14N"]')
+        self.assertEqual(conn.execute("SELECT Concat_site_variables FROM burned_rock_sites WHERE fid = 2").fetchone()[0],
+                         'features: earth oven;')
+
+    def test_column_names_differing_by_case_are_kept(self):
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Site', 'site', 'X', 'Y', 'x', 'fid', 'Geom'])
+            writer.writerow(['A', 'a', '500000', '3300000', 'lower', '7', 'g'])
+        self.assertEqual(export_geopackage.layer_column_names([('a', 'TEXT'), ('A', 'TEXT'), ('A_2', 'TEXT')]),
+                         ['a', 'A_2', 'A_2_2'])
+
+        result, conn = self._write(x_col='X', y_col='Y', srs_id=32614)
+        self.assertEqual(result['features'], 1)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(burned_rock_sites)")]
+        self.assertEqual(columns, ['fid', 'geom', 'Site', 'site_2', 'X', 'Y', 'x_2', 'src_fid', 'src_Geom'])
+        self.assertEqual(conn.execute("SELECT Site, site_2, X, x_2, src_fid FROM burned_rock_sites").fetchone(),
+                         ('A', 'a', 500000.0, 'lower', '7'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,9 @@ import unittest
 import sys
 import os
 import csv
+import json
+import tempfile
+from io import StringIO
 from unittest.mock import patch, mock_open, MagicMock
 
 # Adjust sys.path to allow importing from the parent directory
@@ -108,18 +111,27 @@ class TestGenerateReport(unittest.TestCase):
             self.assertTrue(any('class_distribution.png' in str(c) for c in calls))
 
     def test_generate_charts_unavailable(self):
-        """Test that charts are skipped when PLOTTING_AVAILABLE is False."""
-        stats = {}
+        """Test that SVG charts are written instead when PLOTTING_AVAILABLE is False."""
+        stats = {
+            'c1': 10, 'c2': 5, 'c3': 5,
+            'c3_prehistoric': 3, 'c3_historic_only': 2,
+            'time_periods': generate_report.Counter({'A': 10, 'B': 5})
+        }
 
         # We still mock plt to ensure it is NOT called
         mock_plt = MagicMock()
 
-        with patch('generate_report.plt', mock_plt, create=True), \
-             patch('generate_report.PLOTTING_AVAILABLE', False):
+        with tempfile.TemporaryDirectory() as output_dir, \
+             patch('generate_report.plt', mock_plt, create=True), \
+             patch('generate_report.PLOTTING_AVAILABLE', False), \
+             patch('sys.stdout', new=StringIO()):
 
-            generate_report.generate_charts(stats, "output_dir")
+            generate_report.generate_charts(stats, output_dir)
 
             mock_plt.savefig.assert_not_called()
+            self.assertEqual(sorted(os.listdir(output_dir)), ['class3_prehistoric_breakdown.svg',
+                                                              'class_distribution.svg',
+                                                              'time_period_distribution.svg'])
 
     def test_write_text_report(self):
         """Test that the text report is written with correct content."""
@@ -183,6 +195,7 @@ class TestGenerateReport(unittest.TestCase):
 
 if __name__ == '__main__':
     unittest.main()
+import math
 import pytest
 from generate_report import clean_value
 
@@ -215,3 +228,198 @@ def test_clean_value_non_string_truthy():
         clean_value(123)
     with pytest.raises(AttributeError):
         clean_value([1, 2, 3])
+
+def test_analyze_spatial_nearest_and_radius():
+    """Test spatial co-occurrence statistics on a small projected dataset."""
+    csv_content = (
+        "POINT_X,POINT_Y,Class_1_Found,Class_2_Found,Class_3_Found,Burned_Clay_Found,Burned_Clay_Only,Is_Prehistoric,Learned_Time_Period\n"
+        "0,0,False,True,False,False,False,False,\n"
+        "5000,0,False,True,False,False,False,False,\n"
+        "300,400,False,False,True,False,False,False,\n"
+    )
+    with patch('builtins.open', mock_open(read_data=csv_content)):
+        stats = generate_report.analyze_data("dummy.csv")
+
+    spatial = generate_report.analyze_spatial(stats, radii=[1000.0])
+    nearest = spatial['nearest'][('c2', 'c3')]
+    assert nearest['n'] == 2
+    assert nearest['median'] == pytest.approx((500.0 + (4700.0 ** 2 + 400.0 ** 2) ** 0.5) / 2)
+    within = spatial['within'][('c2', 'c3', 1000.0)]
+    assert within['with_any'] == 1
+    assert spatial['nearest'][('c3', 'c2')]['mean'] == pytest.approx(500.0)
+
+def test_analyze_spatial_detects_degrees_in_point_columns():
+    """Test that POINT_X/POINT_Y holding degrees are projected to metres, unless overridden."""
+    csv_content = (
+        "POINT_X,POINT_Y,Class_1_Found,Class_2_Found,Class_3_Found,Burned_Clay_Found,Burned_Clay_Only,Is_Prehistoric,Learned_Time_Period\n"
+        "-98.00,30.0,False,True,False,False,False,False,\n"
+        "-98.01,30.0,False,False,True,False,False,False,\n"
+    )
+    with patch('builtins.open', mock_open(read_data=csv_content)):
+        stats = generate_report.analyze_data("dummy.csv")
+
+    with patch('sys.stdout', new=StringIO()) as out:
+        spatial = generate_report.analyze_spatial(stats, radii=[1000.0])
+    assert "treated as longitude/latitude" in out.getvalue()
+    assert spatial['units'] == 'm'
+    assert spatial['nearest'][('c2', 'c3')]['mean'] == pytest.approx(0.01 * 111320.0 * math.cos(math.radians(30.0)))
+    assert spatial['within'][('c2', 'c3', 1000.0)]['with_any'] == 1
+
+    spatial = generate_report.analyze_spatial(stats, radii=[1000.0], units='projected')
+    assert spatial['units'] == 'units'
+    assert spatial['nearest'][('c2', 'c3')]['mean'] == pytest.approx(0.01)
+
+def test_analyze_spatial_single_collinear_sites():
+    """Test that far-apart single sites on a line do not stall the nearest search."""
+    csv_content = (
+        "POINT_X,POINT_Y,Class_1_Found,Class_2_Found,Class_3_Found,Burned_Clay_Found,Burned_Clay_Only,Is_Prehistoric,Learned_Time_Period\n"
+        "0,0,False,True,False,False,False,False,\n"
+        "20000,0,False,False,True,False,False,False,\n"
+    )
+    with patch('builtins.open', mock_open(read_data=csv_content)):
+        stats = generate_report.analyze_data("dummy.csv")
+
+    spatial = generate_report.analyze_spatial(stats, radii=[1000.0])
+    assert spatial['nearest'][('c2', 'c3')]['mean'] == pytest.approx(20000.0)
+    assert spatial['nearest'][('c3', 'c2')]['mean'] == pytest.approx(20000.0)
+
+def test_period_matrix_cross_tabulates_classes():
+    """Test class and burned clay counts per individual time period."""
+    csv_content = (
+        "Class_1_Found,Class_2_Found,Class_3_Found,Burned_Clay_Found,Burned_Clay_Only,Is_Prehistoric,Learned_Time_Period\n"
+        "False,False,True,False,False,True,Late Prehistoric II (Toyah Phase)\n"
+        "True,False,True,True,False,True,Archaic; Late Prehistoric II (Toyah Phase)\n"
+        "False,True,False,False,False,False,Archaic\n"
+        "False,False,False,True,True,False,\n"
+    )
+    with patch('builtins.open', mock_open(read_data=csv_content)):
+        stats = generate_report.analyze_data("dummy.csv")
+
+    matrix = stats['period_matrix']
+    toyah = matrix['periods'].index('Late Prehistoric II (Toyah Phase)')
+    archaic = matrix['periods'].index('Archaic')
+    unknown = matrix['periods'].index('Unknown')
+    assert matrix['rows']['Class 3'][toyah] == 2
+    assert matrix['rows']['Class 3'][archaic] == 1
+    assert matrix['rows']['Class 2'][archaic] == 1
+    assert matrix['rows']['Class 1'][toyah] == 1
+    assert matrix['rows']['Burned Clay'][toyah] == 1
+    assert matrix['rows']['Burned Clay Only'][unknown] == 1
+    assert matrix['sites'][toyah] == 2 and matrix['sites'][unknown] == 1
+
+def test_sampled_report_has_confidence_intervals(tmp_path):
+    """Test sampled estimates: a full sample reproduces the counts exactly."""
+    input_file = tmp_path / "classified.csv"
+    lines = ["trinomial,Class_1_Found,Class_2_Found,Class_3_Found,Burned_Clay_Found,Burned_Clay_Only,Is_Prehistoric,Learned_Time_Period"]
+    for i in range(40):
+        lines.append(f"41AN{i},True,False,{i % 4 == 0},False,False,{i % 2 == 0},Archaic")
+    for i in range(60):
+        lines.append(f"41BX{i},False,False,{i % 3 == 0},True,False,True,\"Late Prehistoric II (Toyah Phase)\"")
+    input_file.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+    full = generate_report.analyze_data(str(input_file))
+    stats = generate_report.analyze_sample(str(input_file), fraction=1.0, stratify=True, seed=1)
+    assert stats['sample']['strata'] == 2 and stats['sample']['size'] == 100
+    for key in generate_report.ESTIMATED_COUNTS:
+        assert stats[key] == full[key]
+        assert stats['intervals'][key] == (full[key], full[key])
+    assert stats['time_periods'] == full['time_periods']
+
+    sampled = generate_report.analyze_sample(str(input_file), sample_size=30, seed=2)
+    assert sampled['total'] == 100 and sampled['sample']['size'] == 30
+    low, high = sampled['intervals']['c1']
+    assert low <= sampled['c1'] <= high
+
+    generate_report.write_text_report(sampled, str(tmp_path))
+    report = (tmp_path / 'Burned_Rock_Analysis_Report.txt').read_text(encoding='utf-8')
+    assert "SAMPLED ESTIMATE: 30 of 100 rows (reservoir)" in report
+    assert f"Class 1 (Scatters): {sampled['c1']} sites" in report
+    assert "[95% CI" in report
+
+
+def _grouped_rows():
+    rows = []
+    for i in range(30):
+        rows.append({'trinomial': f"41an{i}", 'Class_1_Found': 'True', 'Class_3_Found': str(i % 3 == 0),
+                     'Is_Prehistoric': str(i % 2 == 0), 'Learned_Time_Period': 'Archaic; Late Prehistoric',
+                     'Class_1_Keywords': 'burned rock; fcr' if i % 2 else 'fcr', 'Site_Type': 'Campsite'})
+    for i in range(20):
+        rows.append({'trinomial': f"41BX{i}", 'Class_2_Found': 'True', 'Burned_Clay_Found': str(i % 4 == 0),
+                     'Learned_Time_Period': 'Historic', 'Site_Type': 'Homestead' if i % 2 else 'Campsite'})
+    rows.append({'trinomial': 'unrecorded', 'Burned_Clay_Only': 'True'})
+    return rows
+
+
+def test_county_groups_match_separate_runs():
+    rows = _grouped_rows()
+    stats = generate_report.analyze_rows(rows, ['trinomial', 'Site_Type'], group_by=generate_report.COUNTY_GROUP)
+    assert stats['group_by'] == 'County'
+    assert list(stats['groups']) == ['41AN', '41BX', 'Unknown']
+    assert sum(group['total'] for group in stats['groups'].values()) == stats['total'] == 51
+    for county, subset in (('41AN', rows[:30]), ('41BX', rows[30:50]), ('Unknown', rows[50:])):
+        alone = generate_report.analyze_rows(subset, [])
+        for key in ('sites_xy', 'geographic'):
+            alone.pop(key, None)
+        assert stats['groups'][county] == alone
+
+
+def test_group_by_column_writes_summary_and_matrix(tmp_path):
+    stats = generate_report.analyze_rows(_grouped_rows(), ['trinomial', 'Site_Type'], group_by='Site_Type')
+    assert {key: group['total'] for key, group in stats['groups'].items()} == {'Campsite': 40, 'Homestead': 10,
+                                                                              'Unknown': 1}
+    with patch('sys.stdout', new=StringIO()):
+        generate_report.write_group_report(stats, str(tmp_path))
+    with open(tmp_path / 'Site_Type_Summary.csv', encoding='utf-8', newline='') as f:
+        summary = list(csv.DictReader(f))
+    assert summary[0]['Site_Type'] == 'Campsite'
+    assert (summary[0]['Sites'], summary[0]['Class_1'], summary[0]['Class_2']) == ('40', '30', '10')
+    assert summary[0]['Top_Time_Period'] == 'Archaic'
+    with open(tmp_path / 'Site_Type_Period_Matrix.csv', encoding='utf-8', newline='') as f:
+        matrix = list(csv.reader(f))
+    assert matrix[0] == ['Site_Type', 'Time_Period', 'Sites', 'Class 1', 'Class 2', 'Class 3', 'Burned Clay',
+                         'Burned Clay Only']
+    assert ['Campsite', 'Late Prehistoric', '30', '30', '0', '10', '0', '0'] in matrix
+    assert ['Homestead', 'Historic', '10', '0', '10', '0', '0', '0'] in matrix
+
+    report = generate_report.format_text_report(stats)
+    # No spatial section, so grouping takes its number
+    assert "7. RESULTS BY SITE_TYPE" in report
+    assert report.index("7. RESULTS BY") < report.index("8. KEY FINDINGS")
+
+    del stats['groups']
+    assert "\n7. KEY FINDINGS" in generate_report.format_text_report(stats)
+
+
+def test_svg_charts_without_matplotlib(tmp_path):
+    stats = {'c1': 10, 'c2': 5, 'c3': 5, 'c3_prehistoric': 3, 'c3_historic_only': 2,
+             'time_periods': generate_report.Counter({'A': 10, 'B': 5})}
+    with patch('generate_report.PLOTTING_AVAILABLE', False), patch('sys.stdout', new=StringIO()):
+        generate_report.generate_charts(stats, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['class3_prehistoric_breakdown.svg', 'class_distribution.svg',
+                                            'time_period_distribution.svg']
+    svg = (tmp_path / 'class_distribution.svg').read_text(encoding='utf-8')
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg"')
+    assert '<title>Class 1 (Scatter): 10</title>' in svg
+
+
+def test_html_report_embeds_sections_charts_and_data(tmp_path):
+    csv_content = (
+        "trinomial,Class_1_Found,Class_2_Found,Class_3_Found,Is_Prehistoric,Burned_Clay_Found,Burned_Clay_Only,Learned_Time_Period\n"
+        "41TR1,True,False,True,True,False,False,Archaic\n"
+        "41TR2,False,True,False,False,True,False,Historic; Archaic\n"
+    )
+    with patch('builtins.open', mock_open(read_data=csv_content)):
+        stats = generate_report.analyze_data("dummy.csv")
+    with patch('sys.stdout', new=StringIO()):
+        generate_report.write_html_report(stats, str(tmp_path))
+    page = (tmp_path / 'Burned_Rock_Report.html').read_text(encoding='utf-8')
+
+    assert '<h2>1. DATASET OVERVIEW</h2>' in page
+    assert 'Total Sites Processed: 2' in page
+    assert page.count('<svg ') == 4
+    assert '<summary>Methodology Summary</summary>' in page
+    data = json.loads(page.split('id="report-data">')[1].split('</script>')[0])
+    assert data['c1'] == 1
+    assert data['time_periods'] == {'Archaic': 1, 'Historic; Archaic': 1}
+    assert data['period_matrix']['periods'][0] == 'Archaic'
+    assert 'sites_xy' not in data
@@ -0,0 +1,28 @@
+import os
+import sys
+import unittest
+from collections import Counter
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keyword_codes
+
+class TestKeywordCodes(unittest.TestCase):
+    def setUp(self):
+        self.keywords = ['burned rock', 'fcr', 'hearth', 'oven']
+        self.bits = keyword_codes.build_bit_index(self.keywords)
+
+    def test_round_trip(self):
+        mask = keyword_codes.encode_keywords({'oven', 'fcr'}, self.bits)
+        self.assertEqual(mask, 0b1010)
+        self.assertEqual(keyword_codes.decode_keywords(mask, self.keywords), ['fcr', 'oven'])
+        self.assertEqual(keyword_codes.decode_keywords('10', self.keywords), ['fcr', 'oven'])
+        self.assertEqual(keyword_codes.decode_keywords(0, self.keywords), [])
+
+    def test_count_mask_bits(self):
+        hits = keyword_codes.count_mask_bits(Counter({0b0011: 5, 0b0010: 2, 0: 10}), self.keywords)
+        self.assertEqual(hits, Counter({'fcr': 7, 'burned rock': 5}))
+
+if __name__ == '__main__':
+    unittest.main()
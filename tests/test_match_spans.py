@@ -0,0 +1,46 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import match_spans
+
+class TestMatchSpans(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'classified.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip_and_random_access(self):
+        rows = [
+            [(3, 'earth oven', 10, 20, match_spans.ACCEPTED), (1, 'burned rock', 0, 11, match_spans.NEGATED)],
+            [],
+            [(2, 'hearth', 5, 11, match_spans.DEPENDENCY)],
+        ]
+        with match_spans.SpanWriter(self.csv_path, {'earth oven', 'burned rock', 'hearth'}) as writer:
+            for spans in rows:
+                writer.write_row(spans)
+
+        with match_spans.SpanReader(self.csv_path) as reader:
+            self.assertEqual(reader.rows, 3)
+            self.assertEqual(reader.spans(2), [{'keyword': 'hearth', 'class': 'Class 2', 'outcome': 'dependency',
+                                                'start': 5, 'end': 11}])
+            self.assertEqual(reader.spans(1), [])
+            # Spans of a row come back ordered by start offset
+            self.assertEqual([(s['keyword'], s['outcome']) for s in reader.spans(0)],
+                             [('burned rock', 'negated'), ('earth oven', 'accepted')])
+            self.assertEqual(reader.raw_spans(0)[1], (1, 3, match_spans.ACCEPTED, 10, 20))
+            with self.assertRaises(IndexError):
+                reader.spans(3)
+
+        self.assertEqual(os.path.getsize(match_spans.spans_path(self.csv_path)),
+                         len(match_spans.MAGIC) + 3 * match_spans.RECORD.size)
+
+if __name__ == '__main__':
+    unittest.main()
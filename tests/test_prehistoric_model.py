@@ -0,0 +1,140 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import classify_sites
+import prehistoric_model
+
+PREHISTORIC_TEXTS = ["lithic scatter with dart point", "debitage and a biface", "chert flakes and a mano",
+                     "burned rock midden with dart point"]
+HISTORIC_TEXTS = ["glass and nails near a chimney", "ceramic sherds and bottle glass", "homestead with nails",
+                  "chimney fall and a cistern"]
+
+def write_csv(path, fieldnames, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+class TestHashingVectorizer(unittest.TestCase):
+    def test_word_hashes_depend_only_on_the_word(self):
+        vectorizer = prehistoric_model.HashingVectorizer()
+        hashes, rows = vectorizer.word_hashes(["rock oven rock", "", "x rock"])
+        self.assertEqual(rows.tolist(), [0, 0, 0, 2, 2])
+        self.assertEqual(hashes[0], hashes[2])
+        self.assertEqual(hashes[0], hashes[4])
+        self.assertEqual(len(set(hashes.tolist())), 3)
+        # Same hashes in a later batch with a different layout
+        again, _ = vectorizer.word_hashes(["oven", "rock"])
+        self.assertEqual(again.tolist(), [hashes[1], hashes[0]])
+
+    def test_ngrams_stay_inside_documents(self):
+        vectorizer = prehistoric_model.HashingVectorizer(hash_bits=20)
+        rows, features, values = vectorizer.transform(["burned rock", "hearth"])
+        # Two unigrams + one bigram, then one unigram
+        self.assertEqual(rows.tolist(), [0, 0, 1, 0])
+        np.testing.assert_allclose(values, [3 ** -0.5, 3 ** -0.5, 1.0, 3 ** -0.5])
+        single, _, _ = vectorizer.transform(["burned rock hearth"])
+        self.assertEqual(len(single), 5)
+
+class TestPrehistoricModel(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _fit(self):
+        model = prehistoric_model.PrehistoricModel(hash_bits=12)
+        texts = [classify_sites.normalize_text(t) for t in PREHISTORIC_TEXTS + HISTORIC_TEXTS]
+        loss = model.fit(texts, [True] * 4 + [False] * 4, epochs=200)
+        return model, texts, loss
+
+    def test_fit_separates_training_texts(self):
+        model, texts, loss = self._fit()
+        self.assertLess(loss, 0.2)
+        p = model.predict_proba(texts + ["a dart point", "bottle glass", ""])
+        self.assertTrue((p[:4] > 0.5).all() and (p[4:8] < 0.5).all())
+        self.assertGreater(p[8], 0.5)
+        self.assertLess(p[9], 0.5)
+
+    def test_save_and_load_keep_only_used_weights(self):
+        model, texts, _ = self._fit()
+        path = os.path.join(self.tmp_dir, 'model.npz')
+        model.save(path)
+        loaded = prehistoric_model.PrehistoricModel.load(path)
+        np.testing.assert_allclose(loaded.predict_proba(texts), model.predict_proba(texts), rtol=1e-6)
+        with np.load(path) as data:
+            self.assertEqual(len(data['ids']), np.count_nonzero(model.weights))
+            self.assertEqual(data['values'].dtype, np.float32)
+
+class TestScoring(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.classified = os.path.join(self.tmp_dir, 'classified.csv')
+        self.labels = os.path.join(self.tmp_dir, 'expert.csv')
+        self.model_file = os.path.join(self.tmp_dir, 'model.npz')
+        texts = PREHISTORIC_TEXTS + HISTORIC_TEXTS
+        write_csv(self.classified, ['trinomial', 'Normalized_Text', 'Is_Prehistoric', 'Learned_Time_Period'],
+                  [[f'41TR{i}', classify_sites.normalize_text(t), str(i in (0, 1, 2)), 'Unknown']
+                   for i, t in enumerate(texts)] + [['41XX1', 'lithic debris', 'True', 'Unknown']])
+        write_csv(self.labels, ['trinomial', 'Is_Prehistoric', 'Refined_Context'],
+                  [[f'41tr{i}', 'TRUE' if i < 4 else 'FALSE', ''] for i in range(len(texts))] + [['41XX1', '', '']])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_train_reports_holdout_against_rule_flag(self):
+        with patch('sys.stdout', new=StringIO()) as out:
+            model, metrics = prehistoric_model.train(self.classified, self.labels, self.model_file,
+                                                     hash_bits=12, holdout=0.5, seed=1)
+        self.assertEqual(metrics['holdout'], 4)
+        self.assertIn('rule_accuracy', metrics)
+        self.assertIn("Training on 8 labeled sites (4 prehistoric)", out.getvalue())
+        self.assertTrue(os.path.exists(self.model_file))
+
+    def test_main_writes_score_next_to_flag(self):
+        with patch('sys.stdout', new=StringIO()):
+            prehistoric_model.main(self.classified, model_file=self.model_file, do_train=True, labels_file=self.labels,
+                                   hash_bits=12, holdout=0)
+            first = read_csv(self.classified)
+            # Rescoring replaces the column instead of adding another
+            prehistoric_model.main(self.classified, model_file=self.model_file)
+        rows = read_csv(self.classified)
+        self.assertEqual(rows, first)
+        self.assertEqual(rows[0], ['trinomial', 'Normalized_Text', 'Is_Prehistoric', 'Prehistoric_Score',
+                                   'Learned_Time_Period'])
+        scores = [float(row[3]) for row in rows[1:]]
+        self.assertTrue(all(s > 0.5 for s in scores[:4]) and all(s < 0.5 for s in scores[4:8]))
+
+    def test_classify_sites_option(self):
+        with patch('sys.stdout', new=StringIO()):
+            prehistoric_model.train(self.classified, self.labels, self.model_file, hash_bits=12, holdout=0)
+        concatenated = os.path.join(self.tmp_dir, 'concatenated.csv')
+        output = os.path.join(self.tmp_dir, 'out.csv')
+        write_csv(concatenated, ['trinomial', 'Concat_site_variables'],
+                  [['41AB1', 'Dart point and debitage'], ['41AB2', 'bottle glass, nails']])
+        with patch('sys.stdout', new=StringIO()):
+            classify_sites.main(concatenated, output, prehistoric_model=self.model_file)
+        rows = read_csv(output)
+        score = rows[0].index('Prehistoric_Score')
+        self.assertEqual(rows[0][score - 1], 'Is_Prehistoric')
+        self.assertGreater(float(rows[1][score]), 0.5)
+        self.assertLess(float(rows[2][score]), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
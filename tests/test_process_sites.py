@@ -1,10 +1,17 @@
+import csv
+import json
 import unittest
 import sys
 import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import process_sites
 from process_sites import clean_value
 
 class TestProcessSites(unittest.TestCase):
@@ -33,5 +40,148 @@ class TestProcessSites(unittest.TestCase):
         expected = "'hello'"
         self.assertEqual(clean_value(input_val), expected)
 
+class TestPipelinedMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'export.csv')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trinomial', 'type_site', 'explain'])
+            for i in range(2503):
+                explain = 'No Data' if i % 3 == 0 else f'burned rock\nline "{i}"'
+                writer.writerow([f'41AN{i}', 'open campsite', explain])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, output_name, **kwargs):
+        output_file = os.path.join(self.tmp_dir, output_name)
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            process_sites.main(self.input_file, output_file, config_file=os.path.join(self.tmp_dir, 'missing.json'), **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+        with open(output_file, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_pipelined_output_matches_sequential(self):
+        sequential = self._run('sequential.csv')
+        pipelined = self._run('pipelined.csv', pipelined=True, batch_size=100, queue_depth=2)
+        self.assertEqual(sequential, pipelined)
+        self.assertIn("type_site: open campsite; explain: burned rock line '1';", pipelined)
+
+    def test_parallel_output_matches_sequential(self):
+        sequential = self._run('sequential.csv')
+        parallel = self._run('parallel.csv', workers=3)
+        self.assertEqual(sequential, parallel)
+        self.assertEqual([name for name in os.listdir(self.tmp_dir) if name.startswith('process_sites_')], [])
+
+    def test_record_boundaries_respect_quoted_newlines(self):
+        with open(self.input_file, 'rb') as f:
+            data = f.read()
+        header_end = data.index(b'\n') + 1
+        with patch('process_sites.BOUNDARY_SCAN_BYTES', 64):
+            ranges = process_sites.record_boundaries(self.input_file, header_end, 40, 3)
+
+        self.assertGreater(len(ranges), 30)
+        self.assertEqual(ranges[0][0], header_end)
+        self.assertEqual(ranges[-1][1], len(data))
+        sites = []
+        for (start, end), (next_start, _) in zip(ranges, ranges[1:] + [(len(data), None)]):
+            self.assertEqual(end, next_start)
+            rows = list(csv.reader(StringIO(data[start:end].decode('utf-8'), newline='')))
+            self.assertTrue(all(row[0].startswith('41AN') and len(row) == 3 for row in rows))
+            sites.extend(row[0] for row in rows)
+        self.assertEqual(sites, [f'41AN{i}' for i in range(2503)])
+
+    def test_record_boundaries_survive_a_stray_quote(self):
+        # The 5 inch" in an unquoted field makes the quote count odd for the
+        # rest of the file, so parity alone would split inside quoted fields
+        with open(self.input_file, 'w', encoding='utf-8', newline='') as f:
+            f.write('trinomial,type_site,explain\n')
+            for i in range(2503):
+                explain = '5 inch" hearth' if i == 7 else f'"burned rock\nline ""{i}"""'
+                f.write(f'41AN{i},open campsite,{explain}\n')
+        with open(self.input_file, 'rb') as f:
+            data = f.read()
+        header_end = data.index(b'\n') + 1
+        with patch('process_sites.BOUNDARY_SCAN_BYTES', 64):
+            ranges = process_sites.record_boundaries(self.input_file, header_end, 40, 3)
+
+        self.assertGreater(len(ranges), 30)
+        rows = []
+        for start, end in ranges:
+            rows.extend(csv.reader(StringIO(data[start:end].decode('utf-8'), newline='')))
+        self.assertEqual(rows, list(csv.reader(StringIO(data[header_end:].decode('utf-8'), newline=''))))
+        self.assertEqual(self._run('parallel.csv', workers=3), self._run('sequential.csv'))
+
+    def test_run_pipelined_propagates_errors(self):
+        def transform(row):
+            if row == 57:
+                raise ValueError("bad row")
+            return row
+
+        with self.assertRaises(ValueError):
+            process_sites.run_pipelined(iter(range(1000)), transform, lambda batch: None, batch_size=10, queue_depth=1)
+
+    def test_profile_is_written_and_compared_with_previous_run(self):
+        profile_file = os.path.join(self.tmp_dir, 'out.csv.profile.json')
+        self._run('out.csv', profile=profile_file)
+        with open(profile_file, 'r', encoding='utf-8') as f:
+            first = json.load(f)
+        self.assertEqual(first['rows'], 2503)
+        self.assertEqual(first['columns']['explain']['skipped'], 835)
+        self.assertEqual(first['columns']['type_site']['top_values'], [['open campsite', 2503]])
+        self.assertNotIn('drift', first)
+
+        # Byte ranges profiled in workers merge to the same counts
+        parallel_file = os.path.join(self.tmp_dir, 'parallel.profile.json')
+        self._run('parallel.csv', workers=3, profile=parallel_file)
+        with open(parallel_file, 'r', encoding='utf-8') as f:
+            parallel = json.load(f)
+        for name, column in first['columns'].items():
+            self.assertEqual(parallel['columns'][name]['distinct'], column['distinct'])
+            self.assertEqual(parallel['columns'][name]['length_histogram'], column['length_histogram'])
+
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trinomial', 'type_site', 'explain'])
+            for i in range(2503):
+                writer.writerow([f'41AN{i}', 'open campsite', 'No Data'])
+        self._run('out.csv', profile=profile_file)
+        with open(profile_file, 'r', encoding='utf-8') as f:
+            second = json.load(f)
+        self.assertEqual(second['baseline'], profile_file)
+        self.assertIn("explain: every value is now empty or skipped (was 33%)", second['drift'])
+
+    def test_incompatible_options_are_rejected(self):
+        for kwargs in ({'workers': 2, 'checkpoint_every': 10}, {'workers': 2, 'pipelined': True},
+                       {'workers': 2, 'resume': True}, {'pipelined': True, 'checkpoint_every': 10},
+                       {'pipelined': True, 'resume': True}, {'profile': '', 'resume': True}):
+            with self.assertRaises(ValueError):
+                self._run('rejected.csv', **kwargs)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'rejected.csv')))
+
+    def test_resume_after_crash_produces_identical_output(self):
+        expected = self._run('clean.csv')
+
+        output_file = os.path.join(self.tmp_dir, 'resumed.csv')
+        original = process_sites.concat_row
+        calls = {'n': 0}
+
+        def crash_midway(row, columns):
+            calls['n'] += 1
+            if calls['n'] == 1234:
+                raise OSError("share disconnected")
+            return original(row, columns)
+
+        with patch('process_sites.concat_row', crash_midway):
+            with self.assertRaises(OSError):
+                self._run('resumed.csv', checkpoint_every=500)
+
+        self.assertEqual(self._run('resumed.csv', resume=True), expected)
+        self.assertFalse(os.path.exists(output_file + '.checkpoint'))
+
 if __name__ == '__main__':
     unittest.main()
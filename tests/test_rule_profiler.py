@@ -0,0 +1,93 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import classify_sites
+import rule_profiler
+
+ARTIFACT_DB = {'pedernales': 'Archaic - Middle'}
+
+class TestRuleProfiler(unittest.TestCase):
+    def setUp(self):
+        self.plain = classify_sites.SiteClassifier(artifact_db=ARTIFACT_DB)
+        self.profiled = classify_sites.SiteClassifier(artifact_db=ARTIFACT_DB)
+        self.profiled.profiler = rule_profiler.RuleProfiler()
+
+    def classify(self, text):
+        document = classify_sites.Document.from_text(text)
+        expected = classify_sites.classify_document(document, self.plain)
+        self.assertEqual(classify_sites.classify_document(document, self.profiled), expected)
+        return self.profiled.profiler
+
+    def test_counts_rejections_per_rule(self):
+        profiler = self.classify("no oven here. later on a dutch oven was found in the collapsed house "
+                                 "and farther along the creek bank an earth oven with a hearth")
+        oven = profiler.rules[('class_3', 'oven')]
+        self.assertEqual((oven.matches, oven.negated, oven.excluded, oven.accepted), (3, 1, 1, 1))
+        # No rock context, so the hearth fails the dependency check
+        hearth = profiler.rules[('class_2', 'hearth')]
+        self.assertEqual((hearth.dependency, hearth.accepted), (1, 0))
+        self.assertEqual(profiler.rules[('exclusion', 'oven')].accepted, 1)
+
+    def test_period_and_evidence_rules(self):
+        profiler = self.classify("toyah phase and a pedernales dart point of chert")
+        self.assertEqual(profiler.rules[('period', 'toyah')].accepted, 1)
+        self.assertEqual(profiler.rules[('artifact', 'pedernales')].accepted, 1)
+        self.assertEqual(profiler.rules[('prehistoric', 'chert')].accepted, 1)
+        self.assertEqual(profiler.rules[('prehistoric', 'flint')].accepted, 0)
+        self.assertIn(('prehistoric', 'flint'), profiler.dead_rules())
+        self.assertEqual(set(profiler.stage_seconds), {'classes', 'burned_clay', 'prehistoric', 'time_period'})
+
+    def test_report_is_sorted_by_time(self):
+        profiler = rule_profiler.RuleProfiler()
+        profiler.rule('class_1', 'fcr').seconds = 0.5
+        profiler.rule('class_3', 'oven').seconds = 2.0
+        profiler.rule('period', 'toyah').seconds = 1.0
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'profile.csv')
+            profiler.write_report(path)
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual([row['Rule'] for row in rows], ['oven', 'toyah', 'fcr'])
+
+    def test_main_writes_report_and_stage_profiles(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            input_file = os.path.join(tmp_dir, 'input.csv')
+            with open(input_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['Concat_site_variables'])
+                writer.writeheader()
+                for _ in range(3):
+                    writer.writerow({'Concat_site_variables': 'burned rock midden with a hearth'})
+            report = os.path.join(tmp_dir, 'rules.csv')
+            dump_dir = os.path.join(tmp_dir, 'stages')
+
+            saved_stdout = sys.stdout
+            try:
+                sys.stdout = StringIO()
+                classify_sites.main(input_file, os.path.join(tmp_dir, 'output.csv'),
+                                    profile_rules=report, profile_dump=dump_dir)
+            finally:
+                sys.stdout = saved_stdout
+
+            self.assertTrue(os.path.exists(report))
+            self.assertIn('classes.prof', os.listdir(dump_dir))
+            # The cache is off while profiling, so repeated rows are all counted
+            with open(report, 'r', encoding='utf-8') as f:
+                accepted = {(row['Kind'], row['Rule']): int(row['Accepted']) for row in csv.DictReader(f)}
+            self.assertEqual(accepted[('class_2', 'hearth')], 3)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import csv
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from io import StringIO
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_pipeline
+
+class TestRunDag(unittest.TestCase):
+    def test_dependencies_and_concurrency(self):
+        order = []
+        both_running = threading.Barrier(2, timeout=5)
+
+        def leaf(name):
+            def run():
+                both_running.wait()
+                order.append(name)
+            return run
+
+        run_pipeline.run_dag({
+            'analyze': ([], lambda: order.append('analyze')),
+            'charts': (['analyze'], leaf('charts')),
+            'text': (['analyze'], leaf('text')),
+            'done': (['charts', 'text'], lambda: order.append('done')),
+        }, jobs=2)
+        self.assertEqual(order[0], 'analyze')
+        self.assertEqual(sorted(order[1:3]), ['charts', 'text'])
+        self.assertEqual(order[3], 'done')
+
+    def test_failure_is_raised(self):
+        ran = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            run_pipeline.run_dag({'a': ([], fail), 'b': (['a'], lambda: ran.append('b'))})
+        self.assertEqual(ran, [])
+
+class TestPipelineCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.saved_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        with open('export.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trinomial', 'type_site', 'explain'])
+            writer.writerow(['41AN1', 'open campsite', 'burned rock midden with\na hearth of limestone'])
+            writer.writerow(['41BX2', 'historic', 'No Data'])
+        self._write_config({'output_file': 'concatenated.csv', 'columns_to_concat': ['type_site', 'explain']})
+
+    def tearDown(self):
+        os.chdir(self.saved_cwd)
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_config(self, config, indent=None):
+        with open('config.json', 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=indent)
+
+    def _run(self, **kwargs):
+        saved_stdout = sys.stdout
+        try:
+            sys.stdout = StringIO()
+            return run_pipeline.main('export.csv', 'config.json', **kwargs)
+        finally:
+            sys.stdout = saved_stdout
+
+    def test_unchanged_stages_are_skipped(self):
+        self.assertEqual(self._run(), ['process', 'classify', 'report'])
+        report = os.path.join(run_pipeline.generate_report.REPORT_DIR, 'Burned_Rock_Analysis_Report.txt')
+        self.assertTrue(os.path.exists(report))
+        self.assertEqual(self._run(), [])
+
+        # Same concatenated output from a reformatted config: downstream stays cached
+        self._write_config({'output_file': 'concatenated.csv', 'columns_to_concat': ['type_site', 'explain']}, indent=2)
+        self.assertEqual(self._run(), ['process'])
+
+        # A report-only rerun leaves process and classify alone
+        self.assertEqual(self._run(force={'report'}), ['report'])
+
+    def test_missing_outputs_are_restored_from_cache(self):
+        self._run()
+        with open('p3_points_classified.csv', 'rb') as f:
+            expected = f.read()
+        os.remove('p3_points_classified.csv')
+        self.assertEqual(self._run(), [])
+        with open('p3_points_classified.csv', 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_report_rerun_keeps_other_files_in_the_report_dir(self):
+        self._run()
+        report_dir = run_pipeline.generate_report.REPORT_DIR
+        written = set(os.listdir(report_dir))
+        self.assertTrue(written <= set(run_pipeline.REPORT_OUTPUTS), written - set(run_pipeline.REPORT_OUTPUTS))
+
+        notes = os.path.join(report_dir, 'my_notes.txt')
+        with open(notes, 'w', encoding='utf-8') as f:
+            f.write('keep me')
+        self.assertEqual(self._run(force={'report'}), ['report'])
+        with open(notes, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'keep me')
+        cache = run_pipeline.StageCache()
+        for entry in cache.manifest['stages']['report'].values():
+            self.assertNotIn(notes, entry['outputs'])
+
+    def test_input_change_reruns_downstream(self):
+        self._run()
+        time.sleep(0.01)
+        with open('export.csv', 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(['41HY9', 'open campsite', 'earth oven'])
+        self.assertEqual(self._run(), ['process', 'classify', 'report'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import math
+import os
+import sys
+import random
+import unittest
+from collections import Counter
+from io import StringIO
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sampling
+
+class TestSampling(unittest.TestCase):
+    def test_county_code(self):
+        self.assertEqual(sampling.county_code('41AN101'), '41AN')
+        self.assertEqual(sampling.county_code(' 41bx2'), '41BX')
+        self.assertEqual(sampling.county_code('unrecorded'), sampling.UNKNOWN_COUNTY)
+        self.assertEqual(sampling.county_code(None), sampling.UNKNOWN_COUNTY)
+
+    def test_raw_records_keep_embedded_newlines(self):
+        f = StringIO('trinomial,Notes\n41AN1,"line one\nline two"\n41BX2,plain\n')
+        records = list(sampling.iter_raw_records(f))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sampling.parse_record(records[1]), ['41AN1', 'line one\nline two'])
+        self.assertEqual(sampling.record_field(records[2], 0), '41BX2')
+        self.assertEqual(sampling.record_field(records[1], 1), 'line one\nline two')
+
+    def test_reservoir_sample_is_uniform(self):
+        rng = random.Random(7)
+        counts = Counter()
+        for _ in range(4000):
+            sample, seen = sampling.reservoir_sample(range(10), 3, rng)
+            self.assertEqual((len(sample), seen), (3, 10))
+            self.assertEqual(len(set(sample)), 3)
+            counts.update(sample)
+        # Each record is kept with probability 3/10 -> ~1200 times
+        for record in range(10):
+            self.assertTrue(1080 < counts[record] < 1320, counts)
+
+    def test_reservoir_smaller_than_size_keeps_everything(self):
+        sample, seen = sampling.reservoir_sample(iter('abc'), 5, random.Random(1))
+        self.assertEqual((sample, seen), (['a', 'b', 'c'], 3))
+
+    def test_bernoulli_sample_fraction(self):
+        sample, seen = sampling.bernoulli_sample(range(50000), 0.1, random.Random(3))
+        self.assertEqual(seen, 50000)
+        self.assertTrue(4700 < len(sample) < 5300)
+        all_rows, _ = sampling.bernoulli_sample(range(10), 1.0, random.Random(3))
+        self.assertEqual(all_rows, list(range(10)))
+
+    def test_allocation_is_proportional(self):
+        self.assertEqual(sampling.allocate({'a': 900, 'b': 90, 'c': 10}, sample_size=100), {'a': 90, 'b': 9, 'c': 1})
+        # Small strata still get one record
+        self.assertEqual(sampling.allocate({'a': 900, 'b': 90, 'c': 10}, fraction=0.05), {'a': 45, 'b': 4, 'c': 1})
+
+    def test_stratified_sample_sizes(self):
+        records = [f"41AN{i}" for i in range(60)] + [f"41BX{i}" for i in range(40)]
+        samples, populations = sampling.stratified_sample(lambda: iter(records), sampling.county_code,
+                                                          sample_size=10, rng=random.Random(5))
+        self.assertEqual(populations, {'41AN': 60, '41BX': 40})
+        self.assertEqual({h: len(s) for h, s in samples.items()}, {'41AN': 6, '41BX': 4})
+        self.assertTrue(all(r.startswith('41BX') for r in samples['41BX']))
+
+    def test_estimate_total(self):
+        estimate, low, high = sampling.estimate_total([(10, 100, 1000)])
+        self.assertAlmostEqual(estimate, 100.0)
+        self.assertTrue(low < 100 < high)
+        # A census has no sampling error
+        self.assertEqual(sampling.estimate_total([(10, 100, 100)]), (10.0, 10.0, 10.0))
+        # No hits: rule of three upper bound
+        self.assertEqual(sampling.estimate_total([(0, 100, 1000)]), (0.0, 0.0, 30.0))
+
+    def test_single_unit_strata_widen_the_interval(self):
+        # The 20-site stratum has one sampled record; its variance cannot be
+        # estimated, so the worst case is assumed rather than zero
+        estimate, low, high = sampling.estimate_total([(20, 100, 1000), (1, 1, 20)])
+        self.assertAlmostEqual(estimate, 220.0)
+        variance = 1000 * 1000 * 0.9 * (100 / 99 * 0.2 * 0.8) / 100 + 20 * 20 * 0.95 * sampling.SINGLE_UNIT_VARIANCE
+        self.assertAlmostEqual(high - estimate, sampling.Z_95 * math.sqrt(variance))
+        self.assertAlmostEqual(estimate - low, sampling.Z_95 * math.sqrt(variance))
+        # A single-site stratum is a census and adds nothing
+        self.assertEqual(sampling.estimate_total([(10, 100, 100), (1, 1, 1)]), (11.0, 11.0, 11.0))
+        ratio, low, high = sampling.estimate_ratio([(1, 1, 1, 50), (0, 1, 1, 50)])
+        self.assertEqual(ratio, 0.5)
+        self.assertTrue(low < 0.5 < high)
+
+    def test_estimate_ratio(self):
+        ratio, low, high = sampling.estimate_ratio([(5, 10, 100, 1000)])
+        self.assertAlmostEqual(ratio, 0.5)
+        self.assertTrue(0 < low < 0.5 < high < 1)
+        self.assertIsNone(sampling.estimate_ratio([(0, 0, 100, 1000)]))
+
+if __name__ == '__main__':
+    unittest.main()
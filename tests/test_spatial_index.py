@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spatial_index
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.tx = rng.uniform(0, 10000, 300)
+        self.ty = rng.uniform(0, 10000, 300)
+        self.qx = rng.uniform(-2000, 12000, 400)
+        self.qy = rng.uniform(-2000, 12000, 400)
+        self.brute = np.hypot(self.qx[:, None] - self.tx[None, :], self.qy[:, None] - self.ty[None, :])
+
+    def test_nearest_distance_matches_brute_force(self):
+        index = spatial_index.SpatialIndex(self.tx, self.ty)
+        np.testing.assert_allclose(index.nearest_distance(self.qx, self.qy), self.brute.min(axis=1))
+
+    def test_count_within_matches_brute_force(self):
+        index = spatial_index.SpatialIndex(self.tx, self.ty)
+        for radius in (250.0, 1000.0):
+            expected = (self.brute <= radius).sum(axis=1)
+            np.testing.assert_array_equal(index.count_within(self.qx, self.qy, radius), expected)
+
+    def test_empty_index(self):
+        index = spatial_index.SpatialIndex([], [])
+        self.assertTrue(np.isinf(index.nearest_distance([1.0], [1.0])).all())
+        self.assertEqual(index.count_within([1.0], [1.0], 10.0).tolist(), [0])
+
+    def test_collinear_and_single_point_sets(self):
+        line = spatial_index.SpatialIndex([0.0, 20000.0], [0.0, 0.0])
+        self.assertEqual(line.nearest_cell_size, 20000.0)
+        np.testing.assert_allclose(line.nearest_distance([5000.0, 20000.0], [0.0, 300.0]), [5000.0, 300.0])
+
+        # No extent at all: the grid falls back to 1.0 and the far query
+        # scans the occupied cells instead of walking 20000 empty rings
+        single = spatial_index.SpatialIndex([0.0], [0.0], extent_area=0)
+        self.assertEqual(single.nearest_cell_size, 1.0)
+        np.testing.assert_allclose(single.nearest_distance([20000.0, 0.5], [0.0, 0.0]), [20000.0, 0.5])
+
+        tx = np.arange(50) * 400.0
+        index = spatial_index.SpatialIndex(tx, np.zeros(50), extent_area=0)
+        brute = np.hypot(self.qx[:, None] - tx[None, :], self.qy[:, None])
+        np.testing.assert_allclose(index.nearest_distance(self.qx, self.qy), brute.min(axis=1))
+
+    def test_detect_coordinate_columns(self):
+        self.assertEqual(spatial_index.detect_coordinate_columns(['a', 'POINT_X', 'POINT_Y']), ('POINT_X', 'POINT_Y'))
+        self.assertEqual(spatial_index.detect_coordinate_columns(['Latitude', 'Longitude']), ('Longitude', 'Latitude'))
+        self.assertEqual(spatial_index.detect_coordinate_columns(['a']), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
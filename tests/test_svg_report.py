@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import svg_report
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+class TestCharts(unittest.TestCase):
+    def test_nice_ticks(self):
+        self.assertEqual(svg_report.nice_ticks(0), [0, 1])
+        self.assertEqual(svg_report.nice_ticks(3), [0, 1, 2, 3])
+        self.assertEqual(svg_report.nice_ticks(47), [0, 10, 20, 30, 40, 50])
+        self.assertEqual(svg_report.nice_ticks(1234), [0, 500, 1000, 1500])
+
+    def test_bar_chart_is_valid_svg_with_escaped_labels(self):
+        svg = svg_report.bar_chart(['Class 1\n(Scatter)', 'A & B <x>'], [10, 0], 'Sites "by" class', ylabel='Sites')
+        root = ET.fromstring(svg)
+        self.assertEqual(root.tag, SVG + 'svg')
+        self.assertEqual(root.find(SVG + 'title').text, 'Sites "by" class')
+        bars = [rect for rect in root.iter(SVG + 'rect') if rect.find(SVG + 'title') is not None]
+        self.assertEqual([bar.find(SVG + 'title').text for bar in bars], ['Class 1 (Scatter): 10', 'A & B <x>: 0'])
+        self.assertEqual(bars[1].get('height'), '0')
+
+    def test_pie_chart_skips_empty_slices(self):
+        root = ET.fromstring(svg_report.pie_chart(['Found', 'Missing'], [4, 0], 'Pie'))
+        self.assertEqual(len(list(root.iter(SVG + 'circle'))), 1)
+        self.assertEqual(len(list(root.iter(SVG + 'path'))), 0)
+        root = ET.fromstring(svg_report.pie_chart(['Found', 'Missing'], [3, 1], 'Pie'))
+        self.assertEqual(len(list(root.iter(SVG + 'path'))), 2)
+
+    def test_heatmap_cells(self):
+        self.assertEqual(svg_report.heat_color(0), '#ffffcc')
+        self.assertEqual(svg_report.heat_color(1), '#800026')
+        root = ET.fromstring(svg_report.heatmap(['Archaic', 'Historic'], ['Class 1', 'Class 2'], [[5, 0], [1, 2]], 'Heat'))
+        cells = [rect for rect in root.iter(SVG + 'rect') if rect.find(SVG + 'title') is not None]
+        self.assertEqual(len(cells), 4)
+        self.assertEqual(cells[0].get('fill'), '#800026')
+
+class TestHtmlPage(unittest.TestCase):
+    def test_page_embeds_data_safely(self):
+        page = svg_report.html_page('Report <1>', ['Sampled'], [('1. OVERVIEW', 'a < b')],
+                                    [('Chart', svg_report.bar_chart(['a'], [1], 'Chart'))],
+                                    {'note': '</script><b>'}, appendix=('Methods', 'text'))
+        self.assertIn('<title>Report &lt;1&gt;</title>', page)
+        self.assertIn('<pre>a &lt; b</pre>', page)
+        self.assertIn('<figcaption>Chart</figcaption>', page)
+        self.assertEqual(page.count('</script>'), 1)
+        payload = page.split('id="report-data">')[1].split('</script>')[0]
+        self.assertEqual(json.loads(payload), {'note': '</script><b>'})
+
+if __name__ == '__main__':
+    unittest.main()
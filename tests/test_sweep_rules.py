@@ -0,0 +1,120 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import classify_sites
+import sweep_rules
+
+TEXTS = [
+    "no sign of burned rock but a hearth with limestone",
+    "a herth and an old dutch oven near the lithic scatter",
+    "burnd rock midden with debitage",
+    "not a hearth just a chimney fall",
+    "",
+]
+
+class TestCorrections(unittest.TestCase):
+    def tearDown(self):
+        classify_sites._get_correction_cached.cache_clear()
+
+    def test_closest_targets_match_get_close_matches_at_every_cutoff(self):
+        words = ['herth', 'ovan', 'burnd', 'rokc', 'middn', 'flake', 'caliche', 'fired']
+        closest = sweep_rules.closest_targets(words, 0.6)
+        for cutoff in (0.6, 0.75, 0.85, 0.95):
+            with patch.object(classify_sites, 'TYPO_CUTOFF', cutoff):
+                expected = [classify_sites.resolve_correction(w) for w in words]
+            self.assertEqual(sweep_rules.correct_at(words, closest, cutoff), expected, cutoff)
+
+class TestMatchCache(unittest.TestCase):
+    def test_current_settings_reproduce_the_classifier(self):
+        documents = [classify_sites.tokenize(text) for text in TEXTS]
+        cache = sweep_rules.MatchCache(documents, [0.85], [(30, 5), (10, 1)], [50, 0])
+        classifier = classify_sites.SiteClassifier()
+        predictions = cache.predict(0, 0, 0)
+        for i, tokens in enumerate(documents):
+            record = classify_sites.classify_document(classify_sites.Document(tokens), classifier)
+            expected = [record['Is_Prehistoric'], record['Class_1_Found'], record['Class_2_Found'], record['Class_3_Found']]
+            self.assertEqual([bool(p) for p in predictions[:, i]], expected, TEXTS[i])
+
+    def test_settings_change_outcomes(self):
+        documents = [classify_sites.tokenize(text) for text in TEXTS]
+        cache = sweep_rules.MatchCache(documents, [0.85, 0.99], [(30, 5), (10, 1)], [50, 0])
+        # "no" is three words before "burned rock": a one-word window misses it
+        self.assertFalse(cache.predict(0, 0, 0)[1, 0])
+        self.assertTrue(cache.predict(0, 1, 0)[1, 0])
+        # Without context the exclusion term "dutch" is not seen
+        self.assertFalse(cache.predict(0, 0, 0)[3, 1])
+        self.assertTrue(cache.predict(0, 0, 1)[3, 1])
+        # At 0.99 "burnd" stays uncorrected, so neither "burned rock" nor "burned rock midden" matches
+        self.assertTrue(cache.predict(0, 0, 0)[[1, 3], 2].all())
+        self.assertFalse(cache.predict(1, 0, 0)[[1, 3], 2].any())
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'concatenated.csv')
+        self.labels_file = os.path.join(self.tmp_dir, 'expert.csv')
+        self.output_file = os.path.join(self.tmp_dir, 'sweep.csv')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trinomial', 'Concat_site_variables'])
+            for i, text in enumerate(TEXTS):
+                writer.writerow([f'41TR{i}', text])
+            writer.writerow(['41XX9', 'an unlabeled hearth'])
+        with open(self.labels_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trinomial', 'Is_Prehistoric', 'Refined_Context', 'Citation', ''])
+            writer.writerow(['41tr0', 'TRUE', 'prehistoric; FCR; hearth', '', ''])
+            writer.writerow(['41TR1', 'TRUE', '', '', ''])
+            writer.writerow(['41TR2', 'TRUE', 'burned rock midden; debitage', '', ''])
+            writer.writerow(['41TR3', 'FALSE', 'historic component', '', ''])
+            writer.writerow(['41TR3', 'TRUE', 'hearth', '', ''])
+            writer.writerow(['41TR4', '', '', '', ''])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load_labels(self):
+        labels = sweep_rules.load_labels(self.labels_file, classify_sites.SiteClassifier())
+        self.assertEqual(labels['41TR0'], [1, 1, 1, 0])
+        self.assertEqual(labels['41TR1'], [1, -1, -1, -1])
+        self.assertEqual(labels['41TR2'], [1, 1, 0, 1])
+        self.assertEqual(labels['41TR3'], [0, 0, 0, 0])
+        self.assertEqual(labels['41TR4'], [-1, -1, -1, -1])
+
+    def test_main_writes_ranked_table(self):
+        with patch('sys.stdout', new=StringIO()) as out:
+            ranked = sweep_rules.main(self.input_file, self.labels_file, self.output_file,
+                                      typo_cutoffs=[0.85, 0.95], negation_chars=[30, 60], negation_words=[1, 5],
+                                      exclusion_chars=[0, 50])
+        self.assertIn("Labeled sites found", out.getvalue())
+        with open(self.output_file, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 16)
+        self.assertEqual(rows, [{k: str(v) for k, v in row.items()} for row in ranked])
+        scores = [float(row['Score']) for row in rows]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        current = [row for row in rows if row['Current'] == 'yes']
+        self.assertEqual(len(current), 1)
+        self.assertEqual((current[0]['Typo_Cutoff'], current[0]['Negation_Chars'], current[0]['Negation_Words'],
+                          current[0]['Exclusion_Chars']), ('0.85', '30', '5', '50'))
+        # Four sites have Is_Prehistoric labels; 41TR0 has no prehistoric keyword
+        self.assertEqual(current[0]['Is_Prehistoric_Accuracy'], '0.7500')
+
+    def test_parallel_matches_serial(self):
+        kwargs = dict(typo_cutoffs=[0.85], negation_chars=[30], negation_words=[1, 5], exclusion_chars=[0, 50])
+        with patch('sys.stdout', new=StringIO()):
+            serial = sweep_rules.main(self.input_file, self.labels_file, self.output_file, **kwargs)
+            parallel = sweep_rules.main(self.input_file, self.labels_file, self.output_file, workers=2, **kwargs)
+        self.assertEqual(serial, parallel)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import csv
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synonym_miner
+
+class TestCooccurrenceMatrix(unittest.TestCase):
+    def test_windowed_pairs(self):
+        matrix = synonym_miner.CooccurrenceMatrix(window=1, max_ngram=1, hash_bits=16)
+        matrix.add_documents([['hearth', 'limestone', 'cobbles'], ['hearth', 'charcoal']])
+        matrix.flush()
+        ids = {w: int(matrix.term_ids([w])[1][0]) for w in ('hearth', 'limestone', 'cobbles', 'charcoal')}
+        terms, counts = matrix.context_counts({ids['hearth']})
+        found = dict(zip(terms.tolist(), counts.tolist()))
+        # "cobbles" is two words away and pairs never span documents
+        self.assertEqual(found, {ids['limestone']: 1, ids['charcoal']: 1})
+        self.assertEqual(int(matrix.marginals.sum()), 6)
+
+    def test_stopwords_and_separators_are_not_terms(self):
+        matrix = synonym_miner.CooccurrenceMatrix(max_ngram=2, hash_bits=16)
+        ids = matrix.term_ids(['the', 'hearth', None, 'burned', 'rock'])
+        self.assertEqual(ids[1][0], -1)
+        self.assertGreaterEqual(ids[1][1], 0)
+        self.assertEqual(ids[2][1], -1)
+        self.assertGreaterEqual(ids[2][3], 0)
+        self.assertEqual(ids[2][3], matrix.seed_ids([('burned', 'rock')]).pop())
+
+    def test_memory_budget_prunes_rare_pairs(self):
+        matrix = synonym_miner.CooccurrenceMatrix(window=2, max_ngram=1, hash_bits=16)
+        matrix.max_pairs = 5
+        docs = [['hearth', 'charcoal']] * 10 + [[f'word{i}a', f'word{i}b'] for i in range(20)]
+        matrix.add_documents(docs)
+        matrix.flush()
+        self.assertLessEqual(len(matrix.keys), 5)
+        self.assertEqual(matrix.prune_threshold, 1)
+        self.assertEqual(matrix.counts.max(), 10)
+
+class TestMineSynonyms(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, 'classified.csv')
+        texts = (['burned rock midden with rock cluster and lithic debris'] * 8 +
+                 ['lithic debris and glass near the fence line'] * 8 +
+                 ['fcr scatter on the terrace with lithic debris'] * 4)
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['trinomial', 'Normalized_Text'])
+            writer.writeheader()
+            for i, text in enumerate(texts):
+                writer.writerow({'trinomial': f'41AN{i}', 'Normalized_Text': text})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ranks_candidates_against_class_seeds(self):
+        results = synonym_miner.mine_synonyms(self.input_file, hash_bits=16, min_count=3)
+        class_3 = [term for term, _, _, _ in results['Class 3']]
+        self.assertEqual(class_3[0], 'rock cluster')
+        self.assertNotIn('burned rock midden', class_3)
+        self.assertNotIn('midden', class_3)
+        self.assertNotIn('glass', class_3)
+        self.assertEqual(results['Burned Clay'], [])
+
+    def test_main_writes_scores(self):
+        output_file = os.path.join(self.tmp_dir, 'potential_synonyms.csv')
+        synonym_miner.main(self.input_file, output_file, hash_bits=16, min_count=3)
+        with open(output_file, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertTrue(rows)
+        self.assertEqual(set(rows[0]), {'Class', 'Candidate', 'PMI', 'Co_occurrences', 'Candidate_Pairs'})
+
+if __name__ == '__main__':
+    unittest.main()